@@ -0,0 +1,216 @@
+"""
+Archivos subidos sin duplicados y con contador de referencias.
+
+Los campos ``ImagenCompartida`` (imagen principal y galería de las recetas, imagen de
+las categorías y avatar) guardan cada archivo con el sha256 de los bytes subidos como
+nombre (``AlmacenamientoPorContenido``) y lo registran en ``ArchivoMedia``. Subir
+otra vez la misma foto no escribe nada ni vuelve a reducir la imagen: la fila nueva
+apunta al archivo existente, aunque esté en el directorio de otro campo, siempre que
+se guardara igual (los bytes subidos, o reducidos al mismo ``lado_maximo``). Una foto
+que ya cabe en el lado máximo de la imagen principal se comparte con la galería.
+
+El sha256 se calcula mientras llega la subida (los upload handlers de este módulo en
+``FILE_UPLOAD_HANDLERS``), así que el archivo no se vuelve a leer para deduplicarlo.
+
+``ArchivoMedia.referencias`` cuenta las filas que usan cada archivo: se ajusta al
+guardar una fila que cambia de archivo y al borrarla. Quitar un archivo de una fila
+no lo borra del almacenamiento, porque otras pueden usarlo.
+"""
+import hashlib
+import os
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db.models import Case, F, Value, When, signals
+from django.db.models.fields.files import ImageField, ImageFieldFile
+
+from .imagenes import reducir
+from .models import ArchivoMedia
+from .storage import es_nombre_por_contenido, resumen_sha256
+
+
+class _ResumenMixin:
+    """Calcula el sha256 de cada archivo con los mismos bloques que lo guardan"""
+
+    def new_file(self, *args, **kwargs):
+        # Antes de super(): el handler en memoria corta la cadena con una excepción
+        self.resumen = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.resumen.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        archivo = super().file_complete(file_size)
+        if archivo is not None:
+            archivo.sha256 = self.resumen.hexdigest()
+        return archivo
+
+
+class MemoriaConResumenUploadHandler(_ResumenMixin, MemoryFileUploadHandler):
+    pass
+
+
+class TemporalConResumenUploadHandler(_ResumenMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def renovar(storage, nombre):
+    """
+    Pone a ahora la fecha de modificación de un archivo que se va a reutilizar, para
+    que ``limpiar_media`` (que respeta los recientes) no lo borre antes de que se
+    guarde la fila que lo usa. False si ya no existe.
+    """
+    try:
+        os.utime(storage.path(nombre))
+    except NotImplementedError:
+        return storage.exists(nombre)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def guardado_antes(storage, resumen, lado_maximo):
+    """Nombre de un archivo con esos bytes subidos guardados con ``lado_maximo`` (None: sin reducir)"""
+    nombre = ArchivoMedia.objects.filter(sha256=resumen, lado_maximo=lado_maximo).order_by(
+        'pk'
+    ).values_list('nombre', flat=True).first()
+    # Si la limpieza lo borró se vuelve a escribir
+    return nombre if nombre is not None and renovar(storage, nombre) else None
+
+
+def guardar_archivo(storage, nombre, contenido, lado_maximo=None, max_length=None):
+    """
+    Guarda ``contenido`` (reducido a ``lado_maximo`` si es una imagen más grande) y
+    devuelve su nombre. Si ya se había subido y guardado igual, en este campo o en
+    otro, no se escribe ni se procesa: se devuelve el nombre existente.
+    """
+    resumen = resumen_sha256(contenido)
+    por_contenido = hasattr(storage, 'nombre_por_contenido')
+    if por_contenido:
+        existente = guardado_antes(storage, resumen, lado_maximo)
+        if existente is not None:
+            return existente
+        nombre = storage.nombre_por_contenido(nombre, contenido)
+
+    guardado = reducir(contenido, lado_maximo) if lado_maximo else contenido
+    if guardado is not contenido:
+        # El nombre sigue siendo el de los bytes subidos, para encontrar los duplicados
+        guardado.sha256 = resumen
+    elif lado_maximo and por_contenido:
+        # Ya cabía: son los bytes subidos, que otro campo puede tener guardados
+        existente = guardado_antes(storage, resumen, None)
+        if existente is not None:
+            return existente
+    nombre = storage.save(nombre, guardado, max_length=max_length)
+    ArchivoMedia.objects.get_or_create(nombre=nombre, defaults={
+        'sha256': resumen,
+        'tamano': storage.size(nombre),
+        'lado_maximo': lado_maximo if guardado is not contenido else None,
+    })
+    return nombre
+
+
+def sumar_referencias(cambios):
+    """
+    Suma ``{nombre: incremento}`` a los contadores. Los nombres que no están en la
+    tabla (archivos anteriores a ella) se registran al referenciarlos.
+    """
+    for nombre, incremento in cambios.items():
+        if not nombre or not incremento:
+            continue
+        # Nunca por debajo de 0, sin restar en SQL de una columna sin signo
+        referencias = F('referencias') + incremento if incremento > 0 else Case(
+            When(referencias__gte=-incremento, then=F('referencias') + incremento),
+            default=Value(0),
+        )
+        if ArchivoMedia.objects.filter(nombre=nombre).update(referencias=referencias) or incremento < 0:
+            continue
+        ArchivoMedia.objects.get_or_create(nombre=nombre, defaults={
+            'referencias': incremento,
+            'sha256': os.path.splitext(os.path.basename(nombre))[0] if es_nombre_por_contenido(nombre) else '',
+        })
+
+
+class ImagenCompartidaFieldFile(ImageFieldFile):
+
+    def save(self, name, content, save=True):
+        name = self.field.generate_filename(self.instance, name)
+        self.name = guardar_archivo(
+            self.storage, name, content, self.field.lado_maximo, max_length=self.field.max_length
+        )
+        self._set_instance_attribute(self.name, content)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+    def delete(self, save=True):
+        """Quita el archivo de la fila sin borrarlo: otras filas pueden usarlo"""
+        if not self:
+            return
+        if hasattr(self, '_file'):
+            self.close()
+            del self.file
+
+        self.name = None
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = False
+
+        if save:
+            self.instance.save()
+
+    delete.alters_data = True
+
+
+class ImagenCompartida(ImageField):
+    """
+    ``ImageField`` deduplicado por contenido y contado en ``ArchivoMedia``. Con
+    ``lado_maximo`` la imagen se reduce antes de guardarla, una sola vez por archivo.
+    """
+    attr_class = ImagenCompartidaFieldFile
+
+    def __init__(self, *args, lado_maximo=None, **kwargs):
+        self.lado_maximo = lado_maximo
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.lado_maximo:
+            kwargs['lado_maximo'] = self.lado_maximo
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        if not cls._meta.abstract:
+            signals.post_init.connect(self.recordar_nombre, sender=cls)
+            signals.post_save.connect(self.actualizar_referencias, sender=cls)
+            signals.post_delete.connect(self.quitar_referencia, sender=cls)
+
+    def _guardados(self, instancia):
+        return instancia.__dict__.setdefault('_archivos_guardados', {})
+
+    def recordar_nombre(self, instance, **kwargs):
+        """El nombre con el que se cargó la fila (los archivos nuevos aún no lo tienen)"""
+        valor = instance.__dict__.get(self.attname)
+        self._guardados(instance)[self.attname] = valor if isinstance(valor, str) else None
+
+    def actualizar_referencias(self, instance, created, raw=False, update_fields=None, **kwargs):
+        if raw or (update_fields is not None and self.name not in update_fields):
+            return
+        # Campo diferido (only/defer): no ha podido cambiar
+        if self.attname not in instance.__dict__:
+            return
+        guardados = self._guardados(instance)
+        anterior = None if created else guardados.get(self.attname)
+        actual = getattr(instance, self.attname).name or None
+        guardados[self.attname] = actual
+        if actual != anterior:
+            sumar_referencias({actual: 1, anterior: -1})
+
+    def quitar_referencia(self, instance, **kwargs):
+        nombre = self._guardados(instance).get(self.attname)
+        if nombre:
+            sumar_referencias({nombre: -1})
@@ -0,0 +1,19 @@
+from django.db.backends.mysql import base
+
+from apps.core.db_pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    """
+    Backend MySQL de Django con pool de conexiones (ver apps.core.db_pool)
+    """
+
+    def verificar_conexion(self, conexion):
+        """ping() de mysqlclient es más barato que un SELECT 1"""
+        if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            return True
+        try:
+            conexion.ping()
+        except self.Database.Error:
+            return False
+        return True
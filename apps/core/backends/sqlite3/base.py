@@ -0,0 +1,9 @@
+from django.db.backends.sqlite3 import base
+
+from apps.core.db_pool import PoolMixin
+
+
+class DatabaseWrapper(PoolMixin, base.DatabaseWrapper):
+    """
+    Backend SQLite con pool de conexiones, para desarrollo y benchmarks locales
+    """
@@ -0,0 +1,110 @@
+"""
+Utilidades compartidas por los comandos de benchmark.
+"""
+import json
+import math
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import NoReverseMatch, reverse
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) por el método del rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def medir(funcion, repeticiones=20, calentamiento=2):
+    """
+    Ejecuta ``funcion`` varias veces y devuelve latencias (ms) y consultas SQL.
+
+    ``funcion`` debe devolver la respuesta HTTP; se reporta el último status.
+    """
+    for _ in range(calentamiento):
+        funcion()
+
+    latencias = []
+    consultas = 0
+    status = None
+    for _ in range(repeticiones):
+        with CaptureQueriesContext(connection) as contexto:
+            inicio = time.perf_counter()
+            respuesta = funcion()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        consultas = len(contexto.captured_queries)
+        status = getattr(respuesta, 'status_code', None)
+
+    return {
+        'status': status,
+        'consultas': consultas,
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'media_ms': round(sum(latencias) / len(latencias), 3),
+        'repeticiones': repeticiones,
+    }
+
+
+def rutas_get(router, cliente):
+    """
+    Genera (nombre, url) para cada ruta GET registrada en un router de DRF.
+
+    El pk de las rutas de detalle se toma del primer resultado del listado
+    correspondiente, de modo que siempre apunta a un objeto visible.
+    """
+    for prefijo, viewset, basename in router.registry:
+        pk = None
+        try:
+            url_listado = reverse(f'{basename}-list')
+        except NoReverseMatch:
+            url_listado = None
+
+        if url_listado:
+            yield f'{prefijo}-list', url_listado
+            respuesta = cliente.get(url_listado)
+            datos = respuesta.json() if respuesta.status_code == 200 else None
+            resultados = datos.get('results', []) if isinstance(datos, dict) else datos or []
+            if resultados:
+                pk = resultados[0].get('id')
+            if pk is not None:
+                yield f'{prefijo}-detail', reverse(f'{basename}-detail', kwargs={'pk': pk})
+
+        for accion in viewset.get_extra_actions():
+            if 'get' not in accion.mapping:
+                continue
+            if accion.detail:
+                if pk is None:
+                    continue
+                url = reverse(f'{basename}-{accion.url_name}', kwargs={'pk': pk})
+            else:
+                url = reverse(f'{basename}-{accion.url_name}')
+            yield f'{prefijo}-{accion.url_name}', url
+
+
+def guardar_resultados(ruta, resultados):
+    """Escribe los resultados en JSON con claves ordenadas para poder hacer diff"""
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, indent=2, sort_keys=True, ensure_ascii=False)
+        archivo.write('\n')
+
+
+def comparar_resultados(base, actual, campos=('p50_ms', 'p95_ms', 'consultas')):
+    """
+    Compara dos ejecuciones y devuelve filas (endpoint, campo, antes, después, delta %).
+    """
+    filas = []
+    for endpoint, medidas in sorted(actual.items()):
+        previas = base.get(endpoint)
+        if not previas:
+            continue
+        for campo in campos:
+            antes, despues = previas.get(campo), medidas.get(campo)
+            if antes is None or despues is None:
+                continue
+            delta = ((despues - antes) / antes * 100) if antes else 0.0
+            filas.append((endpoint, campo, antes, despues, round(delta, 1)))
+    return filas
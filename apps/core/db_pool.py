@@ -0,0 +1,224 @@
+"""
+Pool acotado de conexiones de base de datos compartido por los hilos de un proceso.
+
+Django abre una conexión por hilo y, con ``CONN_MAX_AGE=0``, la cierra al terminar
+cada petición. Los backends de ``apps.core.backends`` usan ``PoolMixin`` para que
+"abrir" tome una conexión libre del pool y "cerrar" la devuelva, de modo que el
+número de conexiones al servidor queda acotado por ``POOL['TAMANO']`` sin importar
+cuántos hilos (WSGI con threads o el thread pool de ASGI) atienda el worker.
+"""
+import threading
+import time
+from collections import deque
+from functools import partial
+
+# alias -> PoolConexiones del proceso actual
+pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolAgotado(Exception):
+    """No se liberó ninguna conexión dentro del tiempo de espera"""
+
+
+class PoolConexiones:
+    """
+    Conexiones DB-API reutilizables con un máximo de conexiones abiertas.
+    """
+
+    def __init__(self, tamano, espera=5.0, max_inactividad=300.0, verificar_tras=5.0):
+        self.tamano = tamano
+        self.espera = espera
+        self.max_inactividad = max_inactividad
+        self.verificar_tras = verificar_tras
+        self._libres = deque()
+        self._condicion = threading.Condition()
+
+        # Métricas
+        self.abiertas = 0
+        self.en_uso = 0
+        self.max_en_uso = 0
+        self.adquisiciones = 0
+        self.esperas = 0
+        self.agotamientos = 0
+        self.descartadas = 0
+        self.espera_total = 0.0
+
+    def adquirir(self, crear, verificar=None):
+        """
+        Devuelve una conexión libre, abre una nueva si hay cupo o espera a que se
+        libere alguna. Las conexiones inactivas demasiado tiempo se descartan y las
+        que llevan ``verificar_tras`` segundos sin uso se comprueban con ``verificar``.
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.espera
+        espero = False
+        with self._condicion:
+            while True:
+                if self._libres:
+                    conexion, liberada = self._libres.pop()
+                    break
+                if self.abiertas < self.tamano:
+                    conexion, liberada = None, None
+                    self.abiertas += 1
+                    break
+                restante = limite - time.monotonic()
+                if not espero:
+                    espero = True
+                    self.esperas += 1
+                if restante <= 0 or not self._condicion.wait(restante):
+                    if not self._libres and self.abiertas >= self.tamano:
+                        self.agotamientos += 1
+                        raise PoolAgotado(
+                            f"Sin conexiones libres tras {self.espera}s ({self.tamano} en uso)"
+                        )
+            self.en_uso += 1
+            self.adquisiciones += 1
+            self.max_en_uso = max(self.max_en_uso, self.en_uso)
+            self.espera_total += time.monotonic() - inicio
+
+        if conexion is not None:
+            inactiva = time.monotonic() - liberada
+            if inactiva > self.max_inactividad or (
+                verificar is not None and inactiva > self.verificar_tras and not verificar(conexion)
+            ):
+                self._cerrar(conexion)
+                conexion = None
+                with self._condicion:
+                    self.descartadas += 1
+
+        if conexion is None:
+            try:
+                conexion = crear()
+            except Exception:
+                with self._condicion:
+                    self.abiertas -= 1
+                    self.en_uso -= 1
+                    self._condicion.notify()
+                raise
+        return conexion
+
+    def liberar(self, conexion):
+        """Devuelve una conexión sana al pool"""
+        with self._condicion:
+            self._libres.append((conexion, time.monotonic()))
+            self.en_uso -= 1
+            self._condicion.notify()
+
+    def descartar(self, conexion):
+        """Cierra una conexión rota y libera su cupo"""
+        self._cerrar(conexion)
+        with self._condicion:
+            self.abiertas -= 1
+            self.en_uso -= 1
+            self.descartadas += 1
+            self._condicion.notify()
+
+    def vaciar(self):
+        """Cierra todas las conexiones libres"""
+        with self._condicion:
+            libres, self._libres = list(self._libres), deque()
+            self.abiertas -= len(libres)
+        for conexion, _ in libres:
+            self._cerrar(conexion)
+
+    @staticmethod
+    def _cerrar(conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def metricas(self):
+        with self._condicion:
+            return {
+                'tamano': self.tamano,
+                'abiertas': self.abiertas,
+                'en_uso': self.en_uso,
+                'libres': len(self._libres),
+                'saturacion': round(self.en_uso / self.tamano, 3) if self.tamano else 0,
+                'max_en_uso': self.max_en_uso,
+                'adquisiciones': self.adquisiciones,
+                'esperas': self.esperas,
+                'agotamientos': self.agotamientos,
+                'descartadas': self.descartadas,
+                'espera_media_ms': round(
+                    self.espera_total / self.adquisiciones * 1000, 3
+                ) if self.adquisiciones else 0,
+            }
+
+
+def obtener_pool(alias, configuracion):
+    """Pool del alias en este proceso, creado la primera vez que se pide"""
+    pool = pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = pools.get(alias)
+            if pool is None:
+                pool = pools[alias] = PoolConexiones(
+                    tamano=configuracion['TAMANO'],
+                    espera=configuracion.get('ESPERA', 5.0),
+                    max_inactividad=configuracion.get('MAX_INACTIVIDAD', 300.0),
+                    verificar_tras=configuracion.get('VERIFICAR_TRAS', 5.0),
+                )
+    return pool
+
+
+def metricas_pools():
+    return {alias: pool.metricas() for alias, pool in pools.items()}
+
+
+class PoolMixin:
+    """
+    Mixin para ``DatabaseWrapper``: las conexiones se toman y devuelven a un pool
+    cuando ``settings_dict['POOL']['TAMANO']`` es mayor que cero.
+    """
+
+    @property
+    def pool(self):
+        configuracion = self.settings_dict.get('POOL') or {}
+        if not configuracion.get('TAMANO'):
+            return None
+        return obtener_pool(self.alias, configuracion)
+
+    def verificar_conexion(self, conexion):
+        """Comprobación de salud de una conexión DB-API antes de reutilizarla"""
+        if not self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            return True
+        try:
+            cursor = conexion.cursor()
+            cursor.execute('SELECT 1')
+            cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        crear = partial(super().get_new_connection, conn_params)
+        if pool is None:
+            return crear()
+        try:
+            return pool.adquirir(crear, self.verificar_conexion)
+        except PoolAgotado as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+
+        conexion = self.connection
+        try:
+            # Nunca devolver al pool una transacción a medias
+            if self.in_atomic_block or not self.get_autocommit():
+                conexion.rollback()
+        except Exception:
+            reutilizable = False
+        else:
+            reutilizable = not self.errors_occurred or self.verificar_conexion(conexion)
+
+        if reutilizable:
+            pool.liberar(conexion)
+        else:
+            pool.descartar(conexion)
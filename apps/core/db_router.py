@@ -0,0 +1,69 @@
+"""
+Enrutamiento de lecturas a réplicas con la base de datos principal como respaldo.
+
+Las escrituras van siempre a ``default``. Las lecturas van a una réplica de
+``settings.DATABASE_REPLICAS`` salvo que la petición en curso haya fijado la
+principal (ver ``apps.core.middleware.ReplicaStickyMiddleware``), que se esté
+dentro de una transacción, o que ninguna réplica responda.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+# True mientras la petición actual deba leer de la base de datos principal
+usar_primaria = ContextVar('usar_primaria', default=False)
+
+# alias -> instante (time.monotonic) hasta el que la réplica se considera caída
+_replicas_caidas = {}
+
+
+def replica_disponible(alias):
+    """Comprueba (y recuerda durante un tiempo) si una réplica acepta conexiones"""
+    hasta = _replicas_caidas.get(alias)
+    if hasta is not None:
+        if time.monotonic() < hasta:
+            return False
+        # Sin lock: otro hilo puede haberla quitado ya
+        _replicas_caidas.pop(alias, None)
+
+    try:
+        connections[alias].ensure_connection()
+    except (ConnectionDoesNotExist, DatabaseError):
+        _replicas_caidas[alias] = time.monotonic() + getattr(settings, 'REPLICA_REINTENTO_SEGUNDOS', 30)
+        return False
+    return True
+
+
+def elegir_replica():
+    """Alias de una réplica disponible elegida al azar, o None si no hay ninguna"""
+    candidatas = list(getattr(settings, 'DATABASE_REPLICAS', []))
+    random.shuffle(candidatas)
+    for alias in candidatas:
+        if replica_disponible(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    """
+    Router de base de datos: escrituras a la principal, lecturas a réplicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        if usar_primaria.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return elegir_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Principal y réplicas contienen los mismos datos
+        alias = {DEFAULT_DB_ALIAS, *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in alias and obj2._state.db in alias:
+            return True
+        return None
@@ -0,0 +1,53 @@
+"""
+Lectura y reducción de imágenes subidas con PIL.
+
+``Image.open`` solo lee la cabecera del archivo: el formato y las dimensiones se
+conocen sin decodificar los píxeles, que se cargan únicamente al reducir la imagen (y
+los JPEG, con ``draft``, ya reducidos al decodificarlos).
+"""
+import tempfile
+
+from django.core.files import File
+from PIL import Image, UnidentifiedImageError
+
+# Formatos admitidos en las subidas y su tipo MIME
+FORMATOS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+
+
+class ImagenNoValida(ValueError):
+    pass
+
+
+def leer_cabecera(archivo):
+    """
+    (formato, ancho, alto) de una imagen de ``FORMATOS``, aunque el archivo esté
+    incompleto; None si todavía no se reconoce
+    """
+    try:
+        with Image.open(archivo, formats=list(FORMATOS)) as imagen:
+            return imagen.format, imagen.width, imagen.height
+    except Image.DecompressionBombError:
+        raise ImagenNoValida("La imagen tiene demasiados píxeles")
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError):
+        return None
+
+
+def reducir(contenido, lado):
+    """
+    ``contenido`` reducido a ``lado`` en un archivo temporal, o el mismo archivo si
+    ya cabe o no es una imagen
+    """
+    contenido.seek(0)
+    try:
+        imagen = Image.open(contenido)
+    except (UnidentifiedImageError, OSError):
+        return contenido
+    with imagen:
+        if imagen.width <= lado and imagen.height <= lado:
+            return contenido
+        formato = imagen.format
+        imagen.thumbnail((lado, lado))
+        salida = tempfile.TemporaryFile()
+        imagen.save(salida, format=formato)
+    salida.seek(0)
+    return File(salida, name=contenido.name)
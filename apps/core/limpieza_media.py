@@ -0,0 +1,149 @@
+"""
+Borrado de los archivos de media que ya no usa ninguna fila (``limpiar_media``).
+
+Los campos ``ImagenCompartida`` nunca borran archivos: al cambiar una imagen, al
+recrear la galería de una receta o al borrar recetas y usuarios en cascada el archivo
+se queda en MEDIA_ROOT. Aquí se recorren los directorios de esos campos con
+``os.scandir`` (un directorio abierto cada vez, sin listar el árbol) y cada archivo
+se compara con los nombres que usan las filas.
+
+Los nombres en uso se leen por bloques y se guardan como huellas de 8 bytes (blake2b)
+en un set de enteros. Si hay más de ``max_nombres`` se reparten en particiones por
+huella, con una pasada por partición, así que la memoria no depende del número de
+archivos. Una colisión de huellas solo puede conservar un huérfano, nunca borrar un
+archivo en uso, y cada lote de candidatos se comprueba otra vez en la base de datos
+antes de borrarlo.
+"""
+import hashlib
+import math
+import os
+import time
+
+from django.apps import apps
+from django.conf import settings
+
+from .archivos import ImagenCompartida
+from .models import ArchivoMedia
+
+
+def campos_compartidos():
+    """(modelo, campo) de cada ``ImagenCompartida`` de los modelos instalados"""
+    return [
+        (modelo, campo)
+        for modelo in apps.get_models()
+        for campo in modelo._meta.concrete_fields
+        if isinstance(campo, ImagenCompartida)
+    ]
+
+
+def huella(nombre):
+    return int.from_bytes(hashlib.blake2b(nombre.encode(), digest_size=8).digest(), 'big')
+
+
+def _con_archivo(modelo, campo):
+    # _base_manager: también las filas que los managers ocultan
+    return modelo._base_manager.exclude(**{campo.name: ''}).exclude(**{f'{campo.name}__isnull': True})
+
+
+def nombres_referenciados(campos, lote):
+    for modelo, campo in campos:
+        yield from _con_archivo(modelo, campo).values_list(campo.name, flat=True).iterator(chunk_size=lote)
+
+
+def en_uso(campos, nombres):
+    usados = set()
+    for modelo, campo in campos:
+        usados.update(
+            modelo._base_manager.filter(**{f'{campo.name}__in': nombres}).values_list(campo.name, flat=True)
+        )
+    return usados
+
+
+def directorios_raiz(campos):
+    """Los ``upload_to`` de los campos, sin los que están dentro de otro"""
+    directorios = sorted({
+        str(campo.upload_to).strip('/') for _, campo in campos if isinstance(campo.upload_to, str)
+    })
+    return [
+        directorio for directorio in directorios
+        if not any(directorio.startswith(f'{otro}/') for otro in directorios)
+    ]
+
+
+def recorrer(raiz, directorio):
+    """(nombre relativo a ``raiz``, DirEntry) de cada archivo bajo ``directorio``"""
+    pendientes = [directorio]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with os.scandir(os.path.join(raiz, actual)) as entradas:
+                for entrada in entradas:
+                    nombre = f'{actual}/{entrada.name}' if actual else entrada.name
+                    if entrada.is_dir(follow_symlinks=False):
+                        pendientes.append(nombre)
+                    elif entrada.is_file(follow_symlinks=False):
+                        yield nombre, entrada
+        except FileNotFoundError:
+            continue
+
+
+def limpiar_media(borrar=True, min_edad_horas=1, max_nombres=2_000_000, lote=1000, informar=None):
+    """
+    Borra (o con ``borrar=False`` solo cuenta) los archivos sin referencias con más
+    de ``min_edad_horas``: los recientes pueden ser de una subida cuya fila aún no se
+    ha guardado. ``informar(nombre, bytes)`` recibe cada huérfano.
+    """
+    campos = campos_compartidos()
+    raiz = str(settings.MEDIA_ROOT)
+    total = sum(_con_archivo(modelo, campo).count() for modelo, campo in campos)
+    particiones = max(1, math.ceil(total / max_nombres))
+    limite = time.time() - min_edad_horas * 3600
+    resultado = {'particiones': particiones, 'archivos': 0, 'huerfanos': 0, 'bytes': 0}
+
+    def procesar(candidatos):
+        usados = en_uso(campos, [nombre for nombre, _, _ in candidatos])
+        huerfanos = []
+        for nombre, ruta, tamano in candidatos:
+            if nombre in usados:
+                continue
+            if borrar:
+                try:
+                    # Una subida que reutiliza el archivo lo renueva antes de guardar su fila
+                    if os.stat(ruta).st_mtime > limite:
+                        continue
+                    os.remove(ruta)
+                except FileNotFoundError:
+                    continue
+            huerfanos.append(nombre)
+            resultado['huerfanos'] += 1
+            resultado['bytes'] += tamano
+            if informar:
+                informar(nombre, tamano)
+        if borrar and huerfanos:
+            ArchivoMedia.objects.filter(nombre__in=huerfanos).delete()
+
+    for particion in range(particiones):
+        referenciados = {
+            valor for valor in map(huella, nombres_referenciados(campos, lote))
+            if valor % particiones == particion
+        }
+        candidatos = []
+        for directorio in directorios_raiz(campos):
+            for nombre, entrada in recorrer(raiz, directorio):
+                valor = huella(nombre)
+                if valor % particiones != particion:
+                    continue
+                resultado['archivos'] += 1
+                if valor in referenciados:
+                    continue
+                estado = entrada.stat(follow_symlinks=False)
+                if estado.st_mtime > limite:
+                    continue
+                candidatos.append((nombre, entrada.path, estado.st_size))
+                if len(candidatos) >= lote:
+                    procesar(candidatos)
+                    candidatos = []
+        if candidatos:
+            procesar(candidatos)
+        del referenciados
+    return resultado
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.benchmark import guardar_resultados, percentil
+
+
+async def peticion(url, lectura_lenta, tamano_bloque=1024):
+    """
+    GET HTTP/1.1 sobre un socket propio. Con ``lectura_lenta`` el cliente lee la
+    respuesta en bloques con pausas, como un móvil con mala conexión, y el servidor
+    tiene que mantener la conexión abierta mientras tanto.
+    """
+    partes = urlsplit(url)
+    ruta = partes.path + (f'?{partes.query}' if partes.query else '')
+    lector, escritor = await asyncio.open_connection(partes.hostname, partes.port or 80)
+    try:
+        escritor.write(
+            f"GET {ruta} HTTP/1.1\r\nHost: {partes.netloc}\r\n"
+            f"Accept: application/json\r\nConnection: close\r\n\r\n".encode()
+        )
+        await escritor.drain()
+        estado = await lector.readline()
+        while True:
+            bloque = await lector.read(tamano_bloque)
+            if not bloque:
+                break
+            if lectura_lenta:
+                await asyncio.sleep(lectura_lenta)
+        return int(estado.split()[1])
+    finally:
+        escritor.close()
+
+
+async def cargar(url, conexiones, peticiones, lectura_lenta, espera):
+    latencias, errores = [], 0
+
+    async def cliente():
+        nonlocal errores
+        for _ in range(peticiones):
+            inicio = time.perf_counter()
+            try:
+                estado = await asyncio.wait_for(peticion(url, lectura_lenta), espera)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errores += 1
+                continue
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if estado != 200:
+                errores += 1
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(cliente() for _ in range(conexiones)))
+    duracion = time.monotonic() - inicio
+    return {
+        'url': url,
+        'peticiones': len(latencias),
+        'rps': round(len(latencias) / duracion, 1),
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p95_ms': round(percentil(latencias, 95), 3),
+        'errores': errores,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara despliegues (p. ej. gunicorn WSGI y uvicorn ASGI) con muchas "
+        "conexiones concurrentes de clientes lentos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'objetivos', nargs='+',
+            help="nombre=url, p. ej. wsgi=http://127.0.0.1:8000/api/v1/recetas/"
+        )
+        parser.add_argument('--conexiones', type=int, default=100)
+        parser.add_argument('--peticiones', type=int, default=5, help="Peticiones por conexión")
+        parser.add_argument(
+            '--lectura-lenta', type=float, default=0.0,
+            help="Segundos de pausa entre bloques de 1 KB leídos por el cliente"
+        )
+        parser.add_argument('--espera', type=float, default=30.0, help="Timeout por petición")
+        parser.add_argument('--salida', default='benchmark_concurrencia.json')
+
+    def handle(self, *args, **options):
+        resultados = {}
+        for objetivo in options['objetivos']:
+            nombre, separador, url = objetivo.partition('=')
+            if not separador:
+                raise CommandError(f"Formato esperado nombre=url: {objetivo}")
+            resultado = asyncio.run(cargar(
+                url, options['conexiones'], options['peticiones'],
+                options['lectura_lenta'], options['espera']
+            ))
+            resultados[nombre] = resultado
+            self.stdout.write(
+                f"{nombre:10} {resultado['rps']:8} req/s  p50={resultado['p50_ms']:.1f}ms "
+                f"p95={resultado['p95_ms']:.1f}ms errores={resultado['errores']}"
+            )
+
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
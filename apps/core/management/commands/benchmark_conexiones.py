@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import RequestFactory
+
+from apps.core.benchmark import guardar_resultados, percentil
+from apps.core.db_pool import PoolMixin, pools
+
+MODOS = ('sin_persistencia', 'persistente', 'pool')
+
+
+class Command(BaseCommand):
+    help = (
+        "Peticiones por segundo de un endpoint barato con conexiones cerradas por "
+        "petición, persistentes por hilo y con pool acotado"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', default='/api/v1/ingredientes/')
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--segundos', type=float, default=5.0)
+        parser.add_argument('--tamano-pool', type=int, default=4)
+        parser.add_argument('--modos', nargs='*', default=list(MODOS), choices=MODOS)
+        parser.add_argument('--salida', default='benchmark_conexiones.json')
+
+    def configurar(self, modo, tamano_pool):
+        """Ajusta en caliente el settings_dict compartido por las conexiones de todos los hilos"""
+        config = connections.settings[DEFAULT_DB_ALIAS]
+        config['CONN_MAX_AGE'] = 60 if modo == 'persistente' else 0
+        config['POOL'] = {'TAMANO': tamano_pool} if modo == 'pool' else {}
+        pools.pop(DEFAULT_DB_ALIAS, None)
+
+    def ejecutar(self, ruta, hilos, segundos):
+        handler = WSGIHandler()
+        factory = RequestFactory()
+        latencias, errores = [], []
+        fin = time.monotonic() + segundos
+
+        def trabajador():
+            propias, fallos = [], 0
+            try:
+                while time.monotonic() < fin:
+                    environ = factory._base_environ(
+                        PATH_INFO=ruta, REQUEST_METHOD='GET', HTTP_HOST='localhost'
+                    )
+                    estado = []
+                    inicio = time.perf_counter()
+                    respuesta = handler(environ, lambda status, headers: estado.append(status))
+                    b''.join(respuesta)
+                    # Como un servidor WSGI: close() dispara request_finished
+                    respuesta.close()
+                    propias.append((time.perf_counter() - inicio) * 1000)
+                    if not estado[0].startswith('200'):
+                        fallos += 1
+            finally:
+                connections.close_all()
+                latencias.extend(propias)
+                errores.append(fallos)
+
+        threads = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        inicio = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duracion = time.monotonic() - inicio
+
+        return {
+            'peticiones': len(latencias),
+            'rps': round(len(latencias) / duracion, 1),
+            'p50_ms': round(percentil(latencias, 50), 3),
+            'p95_ms': round(percentil(latencias, 95), 3),
+            'errores': sum(errores),
+        }
+
+    def handle(self, *args, **options):
+        if not isinstance(connections[DEFAULT_DB_ALIAS], PoolMixin) and 'pool' in options['modos']:
+            self.stdout.write(self.style.WARNING(
+                "El ENGINE no es un backend de apps.core.backends; se omite el modo pool "
+                "(define DB_POOL_SIZE para usarlo)"
+            ))
+            options['modos'] = [modo for modo in options['modos'] if modo != 'pool']
+        connections.close_all()
+
+        resultados = {}
+        for modo in options['modos']:
+            self.configurar(modo, options['tamano_pool'])
+            resultado = self.ejecutar(options['ruta'], options['hilos'], options['segundos'])
+            if modo == 'pool':
+                resultado['pool'] = pools[DEFAULT_DB_ALIAS].metricas()
+                pools[DEFAULT_DB_ALIAS].vaciar()
+            resultados[modo] = resultado
+            self.stdout.write(
+                f"{modo:18} {resultado['rps']:8} req/s  p50={resultado['p50_ms']:.2f}ms "
+                f"p95={resultado['p95_ms']:.2f}ms errores={resultado['errores']}"
+            )
+
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
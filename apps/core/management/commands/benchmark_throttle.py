@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+from apps.core.benchmark import guardar_resultados, medir, percentil
+from apps.core.throttling import _cache_caida, consumir, cubetas_locales
+
+
+def carga(hilos, operaciones, clave_compartida, capacidad, periodo):
+    """
+    ``hilos`` clientes consumiendo a la vez de la cubeta compartida o de una por
+    hilo. Devuelve operaciones por segundo, latencias y peticiones permitidas.
+    """
+    latencias, permitidas = [], []
+    lock = threading.Lock()
+
+    def cliente(numero):
+        clave = 'benchmark:compartida' if clave_compartida else f'benchmark:{numero}'
+        propias, aceptadas = [], 0
+        for _ in range(operaciones):
+            inicio = time.perf_counter()
+            aceptadas += consumir(clave, 1, capacidad, periodo)[0]
+            propias.append((time.perf_counter() - inicio) * 1_000_000)
+        with lock:
+            latencias.extend(propias)
+            permitidas.append(aceptadas)
+
+    trabajadores = [threading.Thread(target=cliente, args=(numero,)) for numero in range(hilos)]
+    inicio = time.perf_counter()
+    for trabajador in trabajadores:
+        trabajador.start()
+    for trabajador in trabajadores:
+        trabajador.join()
+    duracion = time.perf_counter() - inicio
+    return {
+        'ops_s': round(len(latencias) / duracion),
+        'p50_us': round(percentil(latencias, 50), 1),
+        'p95_us': round(percentil(latencias, 95), 1),
+        'permitidas': sum(permitidas),
+        # Fichas iniciales más las recargadas durante la prueba
+        'permitidas_maximas': min(
+            len(latencias), (1 if clave_compartida else hilos) * (capacidad + int(duracion * capacidad / periodo))
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Coste del throttling por cubeta de fichas: una decisión aislada, bajo carga "
+        "concurrente y en una petición completa"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', default='/api/v1/categorias/')
+        parser.add_argument('--repeticiones', type=int, default=200)
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--operaciones', type=int, default=5000, help="Decisiones por hilo")
+        parser.add_argument('--capacidad', type=int, default=1000, help="Fichas de la cubeta en la prueba de carga")
+        parser.add_argument('--salida', default='benchmark_throttle.json')
+
+    def limpiar(self):
+        caches[self.alias].clear()
+        cubetas_locales.clear()
+        _cache_caida['hasta'] = 0.0
+
+    def handle(self, *args, **options):
+        resultados = {}
+        self.alias = settings.THROTTLE_CACHE
+        capacidad = options['capacidad']
+
+        # Una decisión, con la caché configurada y con las cubetas del proceso
+        self.limpiar()
+        resultados['consumir_cache'] = medir(
+            lambda: consumir('benchmark:aislada', 1, 10 ** 6, 60), repeticiones=options['repeticiones']
+        )
+        with override_settings(THROTTLE_CACHE='inexistente'):
+            self.limpiar()
+            resultados['consumir_local'] = medir(
+                lambda: consumir('benchmark:aislada', 1, 10 ** 6, 60), repeticiones=options['repeticiones']
+            )
+        self.limpiar()
+
+        for compartida in (True, False):
+            nombre = 'carga_cubeta_compartida' if compartida else 'carga_cubeta_por_hilo'
+            self.limpiar()
+            resultados[nombre] = carga(options['hilos'], options['operaciones'], compartida, capacidad, 60)
+
+        # Petición completa con y sin throttle (tasa alta: nunca responde 429)
+        tasas = {ambito: '1000000/min' for ambito in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']}
+        cliente = Client(HTTP_HOST='localhost')
+        for activo in (False, True):
+            with override_settings(
+                THROTTLE_ACTIVO=activo,
+                REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': tasas},
+            ):
+                self.limpiar()
+                resultados['peticion_con_throttle' if activo else 'peticion_sin_throttle'] = dict(
+                    url=options['ruta'],
+                    **medir(lambda: cliente.get(options['ruta']), repeticiones=options['repeticiones'])
+                )
+        self.limpiar()
+
+        for nombre, medidas in resultados.items():
+            if 'ops_s' in medidas:
+                self.stdout.write(
+                    f"{nombre:24} {medidas['ops_s']:8} ops/s p50={medidas['p50_us']:7.1f}us "
+                    f"p95={medidas['p95_us']:7.1f}us permitidas={medidas['permitidas']}"
+                    f"/{medidas['permitidas_maximas']}"
+                )
+            else:
+                self.stdout.write(
+                    f"{nombre:24} p50={medidas['p50_ms']:8.3f}ms p95={medidas['p95_ms']:8.3f}ms"
+                )
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.limpieza_media import limpiar_media
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra de MEDIA_ROOT las imágenes que no usa ninguna receta, galería, categoría "
+        "ni avatar (con --dry-run solo las cuenta)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="No borra nada; informa de lo que borraría")
+        parser.add_argument(
+            '--min-edad', type=float, default=1,
+            help="Horas: los archivos más recientes se conservan (subidas en curso)"
+        )
+        parser.add_argument(
+            '--max-nombres', type=int, default=2_000_000,
+            help="Nombres en uso en memoria por pasada; con más se hacen varias"
+        )
+        parser.add_argument('--lote', type=int, default=1000, help="Filas por consulta y candidatos por comprobación")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        informar = None
+        if options['verbosity'] >= 2:
+            def informar(nombre, tamano):
+                self.stdout.write(f"{nombre} ({tamano} bytes)")
+
+        resultado = limpiar_media(
+            borrar=not options['dry_run'], min_edad_horas=options['min_edad'],
+            max_nombres=options['max_nombres'], lote=options['lote'], informar=informar,
+        )
+        accion = "se borrarían" if options['dry_run'] else "borrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['archivos']} archivos revisados en {resultado['particiones']} pasadas: "
+            f"{resultado['huerfanos']} huérfanos {accion} ({resultado['bytes'] / 1024 / 1024:.1f} MB) "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        ))
@@ -0,0 +1,260 @@
+import hashlib
+import math
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+from .db_router import usar_primaria
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def clave_cliente(request, response=None):
+    """
+    Identifica al cliente por su token o cookie de sesión (sin guardarlos en claro).
+
+    Si la respuesta establece una sesión nueva (login) se usa esa cookie.
+    """
+    credencial = request.META.get('HTTP_AUTHORIZATION')
+    if not credencial:
+        nombre = settings.SESSION_COOKIE_NAME
+        nueva = response.cookies.get(nombre) if response is not None else None
+        credencial = nueva.value if nueva is not None else request.COOKIES.get(nombre)
+    if not credencial:
+        return None
+    return 'db_primaria:' + hashlib.sha256(credencial.encode()).hexdigest()
+
+
+# Cookie firmada (con fecha) que marca al cliente que acaba de escribir
+COOKIE_PRIMARIA = 'db_primaria'
+
+
+def leyo_escritura(request):
+    """Si la cookie de ``COOKIE_PRIMARIA`` tiene firma válida y no ha caducado"""
+    valor = request.get_signed_cookie(
+        COOKIE_PRIMARIA, default=None, salt=COOKIE_PRIMARIA,
+        max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 5),
+    )
+    return valor is not None
+
+
+def marcar_escritura(response):
+    segundos = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+    if segundos > 0:
+        response.set_signed_cookie(
+            COOKIE_PRIMARIA, '1', salt=COOKIE_PRIMARIA, max_age=segundos,
+            secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax',
+        )
+
+
+class ReplicaStickyMiddleware:
+    """
+    Fija la base de datos principal para las peticiones de escritura y, durante
+    ``REPLICA_STICKY_SECONDS``, para las lecturas del mismo cliente, de modo que
+    tras ``valorar`` o ``toggle_favorito`` el usuario lea lo que acaba de escribir
+    aunque la réplica vaya con retraso.
+
+    La marca viaja en una cookie firmada, que vale en cualquier proceso. Para los
+    clientes que no guardan cookies (apps con token) se anota también en la caché
+    por defecto, que solo sirve entre procesos si es compartida.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        escritura = request.method not in SAFE_METHODS
+        clave = clave_cliente(request)
+        primaria = escritura or leyo_escritura(request) or (clave is not None and cache.get(clave) is not None)
+
+        token = usar_primaria.set(primaria)
+        try:
+            response = self.get_response(request)
+        finally:
+            usar_primaria.reset(token)
+
+        if escritura and response.status_code < 400:
+            marcar_escritura(response)
+            clave = clave_cliente(request, response)
+            if clave is not None:
+                cache.set(clave, True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+        return response
+
+    async def __acall__(self, request):
+        """Misma lógica bajo ASGI, sin saltar a un hilo (la ContextVar llega al ORM)"""
+        escritura = request.method not in SAFE_METHODS
+        clave = clave_cliente(request)
+        primaria = escritura or leyo_escritura(request) or (clave is not None and await cache.aget(clave) is not None)
+
+        token = usar_primaria.set(primaria)
+        try:
+            response = await self.get_response(request)
+        finally:
+            usar_primaria.reset(token)
+
+        if escritura and response.status_code < 400:
+            marcar_escritura(response)
+            clave = clave_cliente(request, response)
+            if clave is not None:
+                await cache.aset(clave, True, getattr(settings, 'REPLICA_STICKY_SECONDS', 5))
+        return response
+
+
+def cabeceras_cuota(request, response):
+    cuota = getattr(request, 'cuota_throttle', None)
+    if cuota is not None:
+        capacidad, restantes, reinicio = cuota
+        response['X-RateLimit-Limit'] = str(capacidad)
+        response['X-RateLimit-Remaining'] = str(restantes)
+        response['X-RateLimit-Reset'] = str(math.ceil(reinicio))
+    return response
+
+
+class CabecerasCuotaMiddleware:
+    """
+    Cabeceras X-RateLimit-* (capacidad de la cubeta, fichas restantes y segundos
+    hasta llenarse) en las respuestas que pasaron por ``CubetaFichasThrottle``.
+    El 429 lleva además ``Retry-After``, que pone DRF.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return cabeceras_cuota(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return cabeceras_cuota(request, await self.get_response(request))
+
+
+# Tipos que ya van comprimidos
+NO_COMPRIMIBLES = ('image/', 'video/', 'audio/', 'font/woff', 'application/zip', 'application/gzip')
+
+
+def elegir_codificacion(accept_encoding, disponibles):
+    """
+    La codificación de ``disponibles`` (en orden de preferencia) con mayor q en
+    ``Accept-Encoding``, o None si el cliente no acepta ninguna
+    """
+    calidades = {}
+    for parte in accept_encoding.split(','):
+        nombre, _, parametros = parte.partition(';')
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        calidades[nombre.strip().lower()] = calidad
+
+    elegida, mejor = None, 0.0
+    for codificacion in disponibles:
+        calidad = calidades.get(codificacion, calidades.get('*', 0.0))
+        if calidad > mejor:
+            elegida, mejor = codificacion, calidad
+    return elegida
+
+
+def compresor(codificacion):
+    """(comprimir, vaciar, terminar) de un flujo brotli o gzip"""
+    if codificacion == 'br':
+        flujo = brotli.Compressor(quality=getattr(settings, 'COMPRESION_CALIDAD_BROTLI', 4))
+        return flujo.process, flujo.flush, flujo.finish
+    # El nivel de compress_string de Django; wbits 31 = formato gzip
+    flujo = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return flujo.compress, lambda: flujo.flush(zlib.Z_SYNC_FLUSH), flujo.flush
+
+
+def comprimir_flujo(codificacion, bloques):
+    """Cada bloque sale comprimido en cuanto llega (vaciado síncrono), sin esperar al final"""
+    comprimir, vaciar, terminar = compresor(codificacion)
+    for bloque in bloques:
+        datos = comprimir(bloque) + vaciar()
+        if datos:
+            yield datos
+    yield terminar()
+
+
+async def acomprimir_flujo(codificacion, bloques):
+    comprimir, vaciar, terminar = compresor(codificacion)
+    async for bloque in bloques:
+        datos = comprimir(bloque) + vaciar()
+        if datos:
+            yield datos
+    yield terminar()
+
+
+class CompresionMiddleware(MiddlewareMixin):
+    """
+    Comprime con brotli (si está instalado) o gzip según ``Accept-Encoding`` las
+    respuestas de al menos ``COMPRESION_MIN_BYTES``. Las respuestas en streaming se
+    comprimen bloque a bloque. Como ``GZipMiddleware``, añade ``Vary:
+    Accept-Encoding``, debilita el ETag y en gzip rellena la cabecera con bytes
+    aleatorios contra BREACH.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESION_MIN_BYTES', 1024):
+            return response
+        if response.get('Content-Type', '').startswith(NO_COMPRIMIBLES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        codificacion = elegir_codificacion(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), ('br', 'gzip') if brotli else ('gzip',)
+        )
+        if codificacion is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acomprimir_flujo(codificacion, response.streaming_content)
+            else:
+                response.streaming_content = comprimir_flujo(codificacion, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if codificacion == 'br':
+                comprimido = brotli.compress(
+                    response.content, quality=getattr(settings, 'COMPRESION_CALIDAD_BROTLI', 4)
+                )
+            else:
+                comprimido = compress_string(response.content, max_random_bytes=GZipMiddleware.max_random_bytes)
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacion
+        return response
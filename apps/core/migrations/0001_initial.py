@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(help_text='Nombre en el almacenamiento (con el sha256 de los bytes subidos)', max_length=255, unique=True)),
+                ('sha256', models.CharField(blank=True, db_index=True, help_text='Resumen de los bytes subidos (antes de reducir la imagen)', max_length=64)),
+                ('tamano', models.PositiveBigIntegerField(blank=True, help_text='Bytes guardados; vacío en los archivos anteriores a esta tabla', null=True)),
+                ('referencias', models.PositiveIntegerField(default=0, help_text='Filas que usan el archivo')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Archivo de media',
+                'verbose_name_plural': 'Archivos de media',
+                'indexes': [models.Index(fields=['referencias', 'fecha_creacion'], name='core_archiv_referen_392ba0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+import os
+from collections import Counter
+
+from django.db import migrations
+
+from apps.core.storage import es_nombre_por_contenido
+
+CAMPOS = [
+    ('recetas', 'Receta', 'imagen_principal'),
+    ('recetas', 'ImagenReceta', 'imagen'),
+    ('recetas', 'Categoria', 'imagen'),
+    ('usuarios', 'Usuario', 'avatar'),
+]
+
+
+def contar_referencias(apps, schema_editor):
+    """Registra los archivos que ya usan las filas existentes, con sus referencias"""
+    ArchivoMedia = apps.get_model('core', 'ArchivoMedia')
+    referencias = Counter()
+    for app, modelo, campo in CAMPOS:
+        nombres = apps.get_model(app, modelo).objects.exclude(**{campo: ''}).exclude(
+            **{f'{campo}__isnull': True}
+        ).values_list(campo, flat=True)
+        referencias.update(nombres.iterator(chunk_size=2000))
+    ArchivoMedia.objects.bulk_create(
+        [
+            ArchivoMedia(
+                nombre=nombre,
+                referencias=total,
+                sha256=os.path.splitext(os.path.basename(nombre))[0] if es_nombre_por_contenido(nombre) else '',
+            )
+            for nombre, total in referencias.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('recetas', '0012_imagenes_compartidas'),
+        ('usuarios', '0003_avatar_compartido'),
+    ]
+
+    operations = [
+        migrations.RunPython(contar_referencias, migrations.RunPython.noop),
+    ]
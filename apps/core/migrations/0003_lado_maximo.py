@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:07
+
+from django.db import migrations, models
+
+# Directorios de los campos que reducen la imagen y su lado máximo
+REDUCIDOS = [
+    ('recetas/principales/', 800),
+    ('avatares/', 300),
+]
+
+
+def marcar_reducidos(apps, schema_editor):
+    """Los archivos existentes de esos campos pueden estar reducidos: no son los bytes subidos"""
+    ArchivoMedia = apps.get_model('core', 'ArchivoMedia')
+    for directorio, lado in REDUCIDOS:
+        ArchivoMedia.objects.filter(nombre__startswith=directorio).update(lado_maximo=lado)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_referencias_existentes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivomedia',
+            name='lado_maximo',
+            field=models.PositiveIntegerField(blank=True, help_text='Lado al que se redujo la imagen; vacío si se guardaron los bytes subidos', null=True),
+        ),
+        migrations.AlterField(
+            model_name='archivomedia',
+            name='sha256',
+            field=models.CharField(blank=True, help_text='Resumen de los bytes subidos (antes de reducir la imagen)', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='archivomedia',
+            index=models.Index(fields=['sha256', 'lado_maximo'], name='core_archiv_sha256_64c7f8_idx'),
+        ),
+        migrations.RunPython(marcar_reducidos, migrations.RunPython.noop),
+    ]
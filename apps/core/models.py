@@ -1,3 +1,50 @@
 from django.db import models
 
-# Create your models here.
+
+class ArchivoMedia(models.Model):
+    """
+    Archivo subido y guardado una sola vez aunque lo usen varias filas: la imagen
+    principal y la galería de las recetas, las categorías y los avatares. Lo
+    mantiene ``apps.core.archivos``.
+    """
+    nombre = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Nombre en el almacenamiento (con el sha256 de los bytes subidos)"
+    )
+
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text="Resumen de los bytes subidos (antes de reducir la imagen)"
+    )
+
+    tamano = models.PositiveBigIntegerField(
+        blank=True,
+        null=True,
+        help_text="Bytes guardados; vacío en los archivos anteriores a esta tabla"
+    )
+
+    referencias = models.PositiveIntegerField(
+        default=0,
+        help_text="Filas que usan el archivo"
+    )
+
+    lado_maximo = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        help_text="Lado al que se redujo la imagen; vacío si se guardaron los bytes subidos"
+    )
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Archivo de media"
+        verbose_name_plural = "Archivos de media"
+        indexes = [
+            models.Index(fields=['referencias', 'fecha_creacion']),
+            models.Index(fields=['sha256', 'lado_maximo']),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias})"
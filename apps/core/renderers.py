@@ -0,0 +1,148 @@
+"""
+Renderers y parsers de la API: JSON sobre orjson y MessagePack.
+
+orjson serializa en C dicts, listas, cadenas, números y UUID, varias veces más rápido
+que ``json`` con el ``JSONEncoder`` de DRF; el resto (fechas, Decimal, cadenas
+traducibles, querysets...) pasa por ``JSONEncoder.default`` de DRF, así que la salida
+es la misma. Si orjson no está instalado, o se pide ``indent``, se usa la
+implementación de DRF.
+
+MessagePack (``application/msgpack``, si msgpack está instalado) lleva los mismos
+datos en binario, con los UUID como extensión de 16 bytes y las fechas como Timestamp
+de MessagePack (el instante, sin la zona horaria del texto). Solo se convierten los
+valores de ``UUIDField`` y ``DateTimeField`` del serializer que los generó; el texto
+de los usuarios sigue siendo texto aunque lo parezca.
+"""
+import datetime
+import uuid
+
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_encoder = JSONEncoder()
+# Las fechas con el formato de DRF (...Z) y claves no str como json.dumps
+OPCIONES = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class JSONRapidoRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(data, default=_encoder.default, option=OPCIONES)
+        except orjson.JSONEncodeError:
+            # Enteros de más de 64 bits, p. ej.
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class JSONRapidoParser(JSONParser):
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+# Código de extensión de MessagePack para los UUID (los negativos están reservados)
+EXT_UUID = 1
+
+
+def _compactar_cadena(campo, cadena):
+    """Los serializers ya han convertido UUID y fechas en texto: se deshace aquí"""
+    if isinstance(campo, serializers.UUIDField):
+        try:
+            return msgpack.ExtType(EXT_UUID, uuid.UUID(cadena).bytes)
+        except ValueError:
+            return cadena
+    if isinstance(campo, serializers.DateTimeField):
+        fecha = parse_datetime(cadena)
+        if fecha is not None and fecha.tzinfo is not None:
+            return msgpack.Timestamp.from_datetime(fecha)
+    return cadena
+
+
+def compactar_campo(campo, valor):
+    """``valor`` tal como lo representó ``campo`` (un serializer o uno de sus campos)"""
+    if valor is None:
+        return None
+    if isinstance(campo, serializers.ListSerializer):
+        return [compactar_campo(campo.child, elemento) for elemento in valor]
+    if isinstance(campo, serializers.Serializer) and isinstance(valor, dict):
+        campos = campo.fields
+        return {clave: compactar_campo(campos.get(clave), elemento) for clave, elemento in valor.items()}
+    if isinstance(campo, serializers.ListField):
+        return [compactar_campo(campo.child, elemento) for elemento in valor]
+    if isinstance(valor, str):
+        return _compactar_cadena(campo, valor)
+    return compactar(valor)
+
+
+def compactar(valor):
+    """Recorre la respuesta; ``serializer.data`` se convierte según sus campos"""
+    serializer = getattr(valor, 'serializer', None)
+    if serializer is not None:
+        return compactar_campo(serializer, valor)
+    if isinstance(valor, dict):
+        return {clave: compactar(elemento) for clave, elemento in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [compactar(elemento) for elemento in valor]
+    return valor
+
+
+def _msgpack_default(valor):
+    if isinstance(valor, uuid.UUID):
+        return msgpack.ExtType(EXT_UUID, valor.bytes)
+    if isinstance(valor, datetime.datetime) and valor.tzinfo is not None:
+        return msgpack.Timestamp.from_datetime(valor)
+    return compactar(_encoder.default(valor))
+
+
+def _msgpack_ext(codigo, datos):
+    if codigo == EXT_UUID:
+        # En texto, como en JSON: CharField y los campos de id no aceptan uuid.UUID
+        return str(uuid.UUID(bytes=datos))
+    return msgpack.ExtType(codigo, datos)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(compactar(data), default=_msgpack_default)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Los UUID llegan como texto y los Timestamp como datetime con zona, que
+    ``DateTimeField`` acepta igual que su forma ISO
+    """
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), timestamp=3, ext_hook=_msgpack_ext)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {exc}')
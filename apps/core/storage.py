@@ -0,0 +1,68 @@
+"""
+Almacenamiento de archivos subidos con nombres derivados de su contenido.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+# <directorio de upload_to>/ab/<sha256>.<ext>
+NOMBRE_POR_CONTENIDO = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}\.[a-z0-9]+$')
+
+
+def es_nombre_por_contenido(nombre):
+    return NOMBRE_POR_CONTENIDO.search(nombre) is not None
+
+
+def resumen_sha256(contenido):
+    """
+    sha256 de un archivo. Las subidas ya lo traen calculado mientras llegaban
+    (``apps.core.archivos``); si no, se lee una vez y se guarda en el objeto.
+    """
+    resumen = getattr(contenido, 'sha256', None)
+    if resumen is None:
+        # chunks() vuelve al principio del archivo, también al guardarlo después
+        calculo = hashlib.sha256()
+        for bloque in contenido.chunks():
+            calculo.update(bloque)
+        resumen = calculo.hexdigest()
+        try:
+            contenido.sha256 = resumen
+        except AttributeError:
+            pass
+    return resumen
+
+
+class AlmacenamientoPorContenido(FileSystemStorage):
+    """
+    Guarda cada archivo con el sha256 de su contenido como nombre, dentro del
+    directorio de ``upload_to`` (``recetas/principales/3f/3fa9….jpg``). La URL cambia
+    cuando cambia la imagen, así que puede cachearse para siempre, y volver a subir
+    el mismo archivo no lo escribe otra vez. Si el contenido trae ``sha256`` (el de
+    los bytes subidos de una imagen que luego se ha reducido) se usa ese.
+
+    Un mismo archivo puede estar referenciado por varias filas: nunca se borra al
+    borrar una de ellas.
+    """
+
+    def nombre_por_contenido(self, nombre, contenido):
+        clave = resumen_sha256(contenido)
+        directorio, extension = os.path.split(nombre)[0], os.path.splitext(nombre)[1].lower()
+        if os.path.basename(nombre).startswith(clave) and os.path.basename(directorio) == clave[:2]:
+            # Ya es el nombre por contenido (apps.core.archivos lo calcula antes de guardar)
+            return nombre
+        if not re.fullmatch(r'\.[a-z0-9]{1,10}', extension):
+            extension = '.bin'
+        return '/'.join(filter(None, [directorio, clave[:2], clave + extension]))
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        nombre = self.nombre_por_contenido(name, content)
+        if self.exists(nombre):
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
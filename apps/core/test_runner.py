@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    La suite hace cientos de peticiones desde la misma IP: sin throttling salvo en
+    las pruebas que lo activan con ``override_settings(THROTTLE_ACTIVO=True)``. Sin
+    manifiesto de estáticos, que solo existe tras ``collectstatic``. Y sin volcar el
+    registro de vistas a mitad de una prueba: insertaría vistas de recetas que otra
+    prueba ya ha revertido.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._entorno = override_settings(
+            THROTTLE_ACTIVO=False,
+            VISTAS_VOLCADO_SEGUNDOS=10 ** 9,
+            VISTAS_VOLCADO_MAX=10 ** 9,
+            STORAGES={
+                **settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+        )
+        self._entorno.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._entorno.disable()
+        super().teardown_test_environment(**kwargs)
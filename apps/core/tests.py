@@ -1,3 +1,599 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from apps.recetas.models import Categoria, ImagenReceta, Receta
+from .archivos import guardar_archivo, reducir
+from .limpieza_media import limpiar_media
+from .db_pool import PoolAgotado, PoolConexiones
+from .db_router import ReplicaRouter, _replicas_caidas, replica_disponible, usar_primaria
+from .models import ArchivoMedia
+from .middleware import COOKIE_PRIMARIA, CompresionMiddleware, ReplicaStickyMiddleware, elegir_codificacion
+from .renderers import JSONRapidoParser, JSONRapidoRenderer
+from .storage import AlmacenamientoPorContenido, es_nombre_por_contenido
+from .throttling import _cache_caida, consumir, cubetas_locales
+
+User = get_user_model()
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    """Decisiones del router sin necesidad de una réplica real"""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+        _replicas_caidas.clear()
+
+    def test_escrituras_van_a_la_principal(self):
+        self.assertEqual(self.router.db_for_write(Receta), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=['replica_inexistente'])
+    def test_replica_no_disponible_usa_la_principal(self):
+        self.assertEqual(self.router.db_for_read(Receta), DEFAULT_DB_ALIAS)
+        self.assertIn('replica_inexistente', _replicas_caidas)
+
+    @override_settings(DATABASE_REPLICAS=['replica_inexistente'])
+    def test_lecturas_fijadas_a_la_principal(self):
+        token = usar_primaria.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(Receta), DEFAULT_DB_ALIAS)
+        finally:
+            usar_primaria.reset(token)
+        self.assertNotIn('replica_inexistente', _replicas_caidas)
+
+    def test_caducidad_vista_por_dos_hilos(self):
+        class YaQuitada(dict):
+            # El otro hilo leyó la misma espera caducada y la quitó antes
+            def get(self, clave, defecto=None):
+                return 0.0
+
+        with mock.patch('apps.core.db_router._replicas_caidas', YaQuitada()):
+            self.assertFalse(replica_disponible('replica_inexistente'))
+
+
+class ReplicaStickyMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.primaria = None
+
+        def vista(request):
+            self.primaria = usar_primaria.get()
+            return HttpResponse()
+
+        self.middleware = ReplicaStickyMiddleware(vista)
+
+    def peticion(self, metodo, token='abc'):
+        request = getattr(self.factory, metodo)('/', HTTP_AUTHORIZATION=f'Token {token}')
+        self.middleware(request)
+        return self.primaria
+
+    def test_escritura_fija_la_principal(self):
+        self.assertTrue(self.peticion('post'))
+        self.assertFalse(usar_primaria.get())
+
+    def test_lecturas_tras_escribir_usan_la_principal(self):
+        self.assertFalse(self.peticion('get'))
+        self.peticion('post')
+        self.assertTrue(self.peticion('get'))
+        self.assertFalse(self.peticion('get', token='otro-cliente'))
+
+    @override_settings(REPLICA_STICKY_SECONDS=0)
+    def test_sin_ventana_de_lectura_tras_escritura(self):
+        self.peticion('post')
+        self.assertFalse(self.peticion('get'))
+
+    def test_la_cookie_firmada_vale_en_otro_proceso(self):
+        cookie = self.middleware(self.factory.post('/')).cookies[COOKIE_PRIMARIA]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        # Otro proceso: su caché no sabe nada de la escritura
+        cache.clear()
+        request = self.factory.get('/')
+        request.COOKIES[COOKIE_PRIMARIA] = cookie.value
+        self.middleware(request)
+        self.assertTrue(self.primaria)
+
+        request = self.factory.get('/')
+        request.COOKIES[COOKIE_PRIMARIA] = '1'
+        self.middleware(request)
+        self.assertFalse(self.primaria)
+
+
+def tasas(**tasas):
+    return override_settings(
+        THROTTLE_ACTIVO=True,
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': tasas},
+    )
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        caches['throttle'].clear()
+        cubetas_locales.clear()
+        _cache_caida['hasta'] = 0.0
+
+    @tasas(lectura_anonimo='3/min')
+    def test_agota_la_cubeta_con_retry_after(self):
+        restantes = [
+            self.client.get('/api/v1/categorias/')['X-RateLimit-Remaining'] for _ in range(3)
+        ]
+        self.assertEqual(restantes, ['2', '1', '0'])
+        respuesta = self.client.get('/api/v1/categorias/')
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(respuesta['Retry-After'], '20')
+        self.assertEqual(respuesta['X-RateLimit-Limit'], '3')
+
+    @tasas(lectura_anonimo='10/min')
+    def test_las_busquedas_cuestan_mas(self):
+        url = '/api/v1/recetas/buscar_por_ingredientes/?ingredientes=sal'
+        self.assertEqual(self.client.get(url)['X-RateLimit-Remaining'], '5')
+        self.assertEqual(self.client.get('/api/v1/recetas/?search=sopa')['X-RateLimit-Remaining'], '0')
+        self.assertEqual(self.client.get('/api/v1/categorias/').status_code, 429)
+
+    @tasas(lectura_anonimo='1/min', lectura_usuario='5/min')
+    def test_cubetas_por_usuario_y_por_ip(self):
+        self.client.get('/api/v1/categorias/')
+        self.assertEqual(self.client.get('/api/v1/categorias/').status_code, 429)
+        otra_ip = self.client.get('/api/v1/categorias/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(otra_ip.status_code, 200)
+        self.client.force_login(User.objects.create_user(username='cliente', password='x'))
+        self.assertEqual(self.client.get('/api/v1/categorias/')['X-RateLimit-Remaining'], '4')
+
+    @tasas(lectura_anonimo='1/min')
+    def test_x_forwarded_for_del_cliente_no_cuenta(self):
+        self.client.get('/api/v1/categorias/', HTTP_X_FORWARDED_FOR='1.1.1.1')
+        otra = self.client.get('/api/v1/categorias/', HTTP_X_FORWARDED_FOR='2.2.2.2')
+        self.assertEqual(otra.status_code, 429)
+
+    @override_settings(THROTTLE_ACTIVO=True, REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK, 'NUM_PROXIES': 1, 'DEFAULT_THROTTLE_RATES': {'lectura_anonimo': '1/min'},
+    })
+    def test_ip_del_ultimo_proxy(self):
+        self.client.get('/api/v1/categorias/', HTTP_X_FORWARDED_FOR='9.9.9.9, 1.1.1.1')
+        mismo = self.client.get('/api/v1/categorias/', HTTP_X_FORWARDED_FOR='8.8.8.8, 1.1.1.1')
+        self.assertEqual(mismo.status_code, 429)
+        otro = self.client.get('/api/v1/categorias/', HTTP_X_FORWARDED_FOR='9.9.9.9, 2.2.2.2')
+        self.assertEqual(otro.status_code, 200)
+
+    @tasas(lectura_anonimo='10/min')
+    def test_las_busquedas_asincronas_cuestan_lo_mismo(self):
+        for ruta in ('/api/v1/async/recetas/?search=sopa', '/api/v1/async/recetas/?ingredientes=sal'):
+            caches['throttle'].clear()
+            self.assertEqual(self.client.get(ruta)['X-RateLimit-Remaining'], '5', ruta)
+
+    @tasas(lectura_anonimo='2/min')
+    @override_settings(THROTTLE_CACHE='inexistente')
+    def test_sin_cache_usa_cubetas_del_proceso(self):
+        self.client.get('/api/v1/categorias/')
+        self.client.get('/api/v1/categorias/')
+        self.assertEqual(self.client.get('/api/v1/categorias/').status_code, 429)
+        self.assertGreater(_cache_caida['hasta'], 0)
+
+    @tasas()
+    def test_sin_tasa_no_limita(self):
+        respuesta = self.client.get('/api/v1/categorias/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('X-RateLimit-Limit', respuesta)
+
+    def test_consumo_concurrente_atomico(self):
+        # Con la cubeta ya en uso todas las peticiones pasan por incr
+        consumir('concurrente', 1, 100, 86400)
+        permitidas = []
+
+        def cliente():
+            for _ in range(50):
+                if consumir('concurrente', 1, 100, 86400)[0]:
+                    permitidas.append(1)
+
+        hilos = [threading.Thread(target=cliente) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(permitidas), 99)
+
+
+class RenderizadoTests(SimpleTestCase):
+
+    def test_misma_salida_que_drf(self):
+        datos = {
+            'id': uuid.uuid4(),
+            'fecha': datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+            'precio': Decimal('1.50'),
+            'texto': gettext_lazy('Ñoquis con salsa'),
+            'lista': [1, 2.5, None, True],
+            3: 'clave entera',
+        }
+        self.assertEqual(JSONRapidoRenderer().render(datos), JSONRenderer().render(datos))
+
+    def test_parser(self):
+        parser = JSONRapidoParser()
+        self.assertEqual(parser.parse(io.BytesIO('{"a": [1, "ñ"]}'.encode())), {'a': [1, 'ñ']})
+        with self.assertRaises(ParseError):
+            parser.parse(io.BytesIO(b'{"a": '))
+
+
+class CompresionMiddlewareTests(SimpleTestCase):
+    contenido = b'{"titulo": "Tortilla de patatas"}' * 100
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def responder(self, respuesta, accept_encoding='gzip, deflate'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompresionMiddleware(lambda request: respuesta)(request)
+
+    def test_elegir_codificacion(self):
+        self.assertEqual(elegir_codificacion('gzip, br', ('br', 'gzip')), 'br')
+        self.assertEqual(elegir_codificacion('gzip, br;q=0.5', ('br', 'gzip')), 'gzip')
+        self.assertEqual(elegir_codificacion('br', ('gzip',)), None)
+        self.assertEqual(elegir_codificacion('gzip;q=0', ('gzip',)), None)
+        self.assertEqual(elegir_codificacion('*', ('br', 'gzip')), 'br')
+        self.assertEqual(elegir_codificacion('', ('gzip',)), None)
+
+    def test_comprime_respuestas_grandes(self):
+        respuesta = self.responder(HttpResponse(self.contenido, content_type='application/json'))
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        self.assertEqual(int(respuesta['Content-Length']), len(respuesta.content))
+        self.assertEqual(gzip.decompress(respuesta.content), self.contenido)
+
+    def test_no_comprime_pequenas_ni_sin_accept_encoding(self):
+        pequena = self.responder(HttpResponse(b'{}', content_type='application/json'))
+        self.assertFalse(pequena.has_header('Content-Encoding'))
+        sin_cabecera = self.responder(HttpResponse(self.contenido), accept_encoding='identity')
+        self.assertFalse(sin_cabecera.has_header('Content-Encoding'))
+        self.assertEqual(sin_cabecera.content, self.contenido)
+
+    def test_streaming(self):
+        bloques = [b'[', *[b'{"id": %d},' % numero for numero in range(200)], b'{}]']
+        respuesta = self.responder(StreamingHttpResponse(iter(bloques), content_type='application/json'))
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(respuesta.streaming_content)), b''.join(bloques))
+
+
+class MediaTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media, SERVIDOR_ARCHIVOS='nginx')
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.almacen = AlmacenamientoPorContenido()
+        self.autor = User.objects.create_user(username='autor', password='x')
+
+    def receta_con_imagen(self, publicada):
+        nombre = self.almacen.save('recetas/principales/foto.JPG', ContentFile(b'imagen %d' % publicada))
+        receta = Receta.objects.create(
+            titulo='Con foto', descripcion='-', instrucciones='-', autor=self.autor,
+            tiempo_preparacion=10, publicada=publicada
+        )
+        Receta.objects.filter(pk=receta.pk).update(imagen_principal=nombre)
+        return nombre
+
+    def test_nombres_por_contenido(self):
+        nombre = self.almacen.save('avatares/yo.png', ContentFile(b'contenido'))
+        self.assertTrue(nombre.startswith('avatares/'))
+        self.assertTrue(nombre.endswith('.png'))
+        self.assertTrue(es_nombre_por_contenido(nombre))
+        self.assertEqual(self.almacen.save('avatares/otra.png', ContentFile(b'contenido')), nombre)
+        self.assertNotEqual(self.almacen.save('avatares/yo.png', ContentFile(b'otro')), nombre)
+        self.assertEqual(len(self.almacen.listdir(nombre.rsplit('/', 2)[0])[0]), 2)
+
+    def test_delega_el_envio_al_servidor_web(self):
+        nombre = self.receta_con_imagen(publicada=True)
+        respuesta = self.client.get(f'/media/{nombre}')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['X-Accel-Redirect'], f'/interno/media/{nombre}')
+        self.assertEqual(respuesta['Content-Type'], 'image/jpeg')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(respuesta.content, b'')
+
+    def test_imagen_compartida_con_un_avatar_o_una_categoria(self):
+        # Los mismos bytes subidos como foto de receta y luego como avatar o categoría
+        nombre = self.receta_con_imagen(publicada=False)
+        self.assertEqual(self.client.get(f'/media/{nombre}').status_code, 404)
+        User.objects.filter(pk=self.autor.pk).update(avatar=nombre)
+        self.assertEqual(self.client.get(f'/media/{nombre}')['Cache-Control'].split(',')[0], 'public')
+        User.objects.filter(pk=self.autor.pk).update(avatar=None)
+        Categoria.objects.create(nombre='Postres', imagen=nombre)
+        self.assertEqual(self.client.get(f'/media/{nombre}').status_code, 200)
+
+    def test_imagen_de_borrador_solo_para_el_autor(self):
+        nombre = self.receta_con_imagen(publicada=False)
+        self.assertEqual(self.client.get(f'/media/{nombre}').status_code, 404)
+        self.client.force_login(self.autor)
+        respuesta = self.client.get(f'/media/{nombre}')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Cache-Control'].startswith('private'))
+
+    def test_rutas_fuera_de_media(self):
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/avatares/%2e%2e/%2e%2e/x').status_code, 404)
+
+    @override_settings(SERVIDOR_ARCHIVOS='')
+    def test_sin_servidor_lo_envia_django(self):
+        nombre = self.almacen.save('avatares/yo.png', ContentFile(b'contenido'))
+        respuesta = self.client.get(f'/media/{nombre}')
+        self.assertEqual(b''.join(respuesta.streaming_content), b'contenido')
+        self.assertEqual(self.client.get('/media/avatares/no-existe.png').status_code, 404)
+
+    def test_estaticos(self):
+        respuesta = self.client.get('/static/css/styles.css')
+        self.assertEqual(respuesta['X-Accel-Redirect'], '/interno/static/css/styles.css')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=3600')
+
+
+class ConexionFalsa:
+    cerrada = False
+
+    def close(self):
+        self.cerrada = True
+
+
+class PoolConexionesTests(SimpleTestCase):
+
+    def test_reutiliza_conexiones_liberadas(self):
+        pool = PoolConexiones(tamano=2)
+        conexion = pool.adquirir(ConexionFalsa)
+        pool.liberar(conexion)
+        self.assertIs(pool.adquirir(ConexionFalsa), conexion)
+        self.assertEqual(pool.metricas()['abiertas'], 1)
+
+    def test_no_supera_el_tamano(self):
+        pool = PoolConexiones(tamano=1, espera=0.01)
+        pool.adquirir(ConexionFalsa)
+        with self.assertRaises(PoolAgotado):
+            pool.adquirir(ConexionFalsa)
+        metricas = pool.metricas()
+        self.assertEqual(metricas['saturacion'], 1)
+        self.assertEqual(metricas['agotamientos'], 1)
+
+    def test_descarta_conexiones_que_no_pasan_la_verificacion(self):
+        pool = PoolConexiones(tamano=1, verificar_tras=0)
+        rota = pool.adquirir(ConexionFalsa)
+        pool.liberar(rota)
+        nueva = pool.adquirir(ConexionFalsa, verificar=lambda conexion: False)
+        self.assertIsNot(nueva, rota)
+        self.assertTrue(rota.cerrada)
+        self.assertEqual(pool.metricas()['descartadas'], 1)
+
+    def test_descartar_libera_el_cupo(self):
+        pool = PoolConexiones(tamano=1, espera=0.01)
+        pool.descartar(pool.adquirir(ConexionFalsa))
+        self.assertIsInstance(pool.adquirir(ConexionFalsa), ConexionFalsa)
+
+
+@skipUnless('replica1' in settings.DATABASES, "Requiere DB_REPLICAS (p. ej. un segundo archivo SQLite)")
+class ReplicaSQLiteTests(TransactionTestCase):
+    """
+    Con dos bases SQLite sin replicación entre ellas, lo que solo existe en la
+    principal es invisible para las lecturas enrutadas a la réplica.
+    """
+    databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        _replicas_caidas.clear()
+        self.autor = autor = User.objects.create_user(username='autor', password='x')
+        Receta.objects.create(
+            titulo='Solo en la principal', descripcion='-', instrucciones='-',
+            autor=autor, tiempo_preparacion=10, publicada=True
+        )
+
+    def total_recetas(self):
+        return self.client.get('/api/v1/recetas/').json()['count']
+
+    def test_lecturas_van_a_la_replica(self):
+        self.assertEqual(self.total_recetas(), 0)
+
+    def test_lecturas_tras_escribir_van_a_la_principal(self):
+        self.client.force_login(self.autor)
+        self.client.post('/')
+        self.assertEqual(self.total_recetas(), 1)
+
+
+class ArchivosCompartidosTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.autor = User.objects.create_user(username='autor', password='x')
+
+    def jpeg(self, ancho=1000, alto=750):
+        salida = io.BytesIO()
+        Image.effect_noise((ancho, alto), 64).convert('RGB').save(salida, 'JPEG')
+        return salida.getvalue()
+
+    def receta(self, contenido=None):
+        receta = Receta(
+            titulo='Con foto', descripcion='-', instrucciones='-', autor=self.autor, tiempo_preparacion=10
+        )
+        if contenido is None:
+            receta.save()
+        else:
+            receta.imagen_principal.save('foto.jpg', SimpleUploadedFile('foto.jpg', contenido))
+        return receta
+
+    def test_misma_foto_se_guarda_y_reduce_una_vez(self):
+        contenido = self.jpeg()
+        with mock.patch('apps.core.archivos.reducir', wraps=reducir) as reducir_:
+            primera, segunda = self.receta(contenido), self.receta(contenido)
+        self.assertEqual(reducir_.call_count, 1)
+
+        nombre = primera.imagen_principal.name
+        self.assertEqual(segunda.imagen_principal.name, nombre)
+        # El nombre es el de los bytes subidos; lo guardado, la imagen reducida
+        self.assertIn(hashlib.sha256(contenido).hexdigest(), nombre)
+        with Image.open(primera.imagen_principal.path) as imagen:
+            self.assertEqual(imagen.size, (800, 600))
+        self.assertEqual(len(os.listdir(os.path.dirname(primera.imagen_principal.path))), 1)
+        self.assertEqual(ArchivoMedia.objects.get(nombre=nombre).referencias, 2)
+
+    def test_referencias(self):
+        contenido = self.jpeg(400, 300)
+        receta = self.receta(contenido)
+        otra = self.receta(contenido)
+        galeria = ImagenReceta(receta=receta)
+        galeria.imagen.save('foto.jpg', SimpleUploadedFile('foto.jpg', contenido))
+        principal, en_galeria = receta.imagen_principal.name, galeria.imagen.name
+
+        def referencias(nombre):
+            return ArchivoMedia.objects.get(nombre=nombre).referencias
+
+        # Cabe en los 800 px de la imagen principal: el mismo archivo que la galería
+        self.assertEqual(en_galeria, principal)
+        self.assertEqual(referencias(principal), 3)
+        # Borrar la receta quita sus referencias y las de su galería (en cascada)
+        receta.delete()
+        self.assertEqual(referencias(principal), 1)
+
+        # Cambiar de imagen y quitarla
+        otra = Receta.objects.get(pk=otra.pk)
+        otra.imagen_principal.save('otra.jpg', SimpleUploadedFile('otra.jpg', self.jpeg(200, 150)))
+        nueva = otra.imagen_principal.name
+        self.assertEqual((referencias(principal), referencias(nueva)), (0, 1))
+        otra.imagen_principal.delete()
+        self.assertEqual(referencias(nueva), 0)
+        # El archivo no se borra: lo recoge la limpieza de media
+        self.assertTrue(os.path.exists(os.path.join(self.media, nueva)))
+
+    def test_misma_foto_en_varios_campos(self):
+        contenido = self.jpeg()
+        receta = self.receta(contenido)
+        galerias = [ImagenReceta(receta=receta) for _ in range(2)]
+        for galeria in galerias:
+            galeria.imagen.save('foto.jpg', SimpleUploadedFile('foto.jpg', contenido))
+        categoria = Categoria(nombre='Con foto', slug='con-foto')
+        categoria.imagen.save('foto.jpg', SimpleUploadedFile('foto.jpg', contenido))
+
+        # La principal está reducida; la galería y la categoría guardan los bytes subidos una vez
+        self.assertNotEqual(galerias[0].imagen.name, receta.imagen_principal.name)
+        self.assertEqual({galerias[1].imagen.name, categoria.imagen.name}, {galerias[0].imagen.name})
+        self.assertEqual(
+            dict(ArchivoMedia.objects.values_list('lado_maximo', 'referencias')), {800: 1, None: 3}
+        )
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_resumen_mientras_llega_la_subida(self):
+        contenido = self.jpeg(300, 200)
+        self.client.force_login(self.autor)
+        # El almacenamiento no vuelve a leer el archivo: usa el resumen del upload handler
+        with mock.patch('apps.core.storage.hashlib') as hashlib_:
+            respuesta = self.client.post('/api/v1/categorias/', {
+                'nombre': 'Postres', 'slug': 'postres', 'imagen': SimpleUploadedFile('postre.jpg', contenido),
+            })
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        hashlib_.sha256.assert_not_called()
+        nombre = ArchivoMedia.objects.get().nombre
+        self.assertEqual(nombre, f'categorias/{hashlib.sha256(contenido).hexdigest()[:2]}/{hashlib.sha256(contenido).hexdigest()}.jpg')
+
+
+class LimpiezaMediaTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.autor = User.objects.create_user(username='autor', password='x')
+        self.almacen = AlmacenamientoPorContenido()
+
+    def archivo(self, nombre, contenido, horas=2):
+        nombre = self.almacen.save(nombre, ContentFile(contenido))
+        antiguedad = time.time() - horas * 3600
+        os.utime(os.path.join(self.media, nombre), (antiguedad, antiguedad))
+        return nombre
+
+    def existe(self, nombre):
+        return os.path.exists(os.path.join(self.media, nombre))
+
+    def test_borra_solo_los_huerfanos(self):
+        receta = Receta.objects.create(
+            titulo='Con foto', descripcion='-', instrucciones='-', autor=self.autor, tiempo_preparacion=10
+        )
+        principal = self.archivo('recetas/principales/a.jpg', b'principal')
+        galeria = self.archivo('recetas/galeria/b.jpg', b'galeria')
+        avatar = self.archivo('avatares/c.png', b'avatar')
+        Receta.objects.filter(pk=receta.pk).update(imagen_principal=principal)
+        ImagenReceta.objects.create(receta=receta, imagen=galeria)
+        User.objects.filter(pk=self.autor.pk).update(avatar=avatar)
+
+        huerfanos = [
+            self.archivo('recetas/galeria/d.jpg', b'sin receta'),
+            self.archivo('avatares/antiguo.png', b'sin usuario'),
+        ]
+        reciente = self.archivo('recetas/principales/e.jpg', b'subiendo', horas=0)
+        # Fuera de los directorios de las imágenes: no se toca
+        os.makedirs(os.path.join(self.media, 'otros'))
+        with open(os.path.join(self.media, 'otros', 'x.txt'), 'w') as otro:
+            otro.write('x')
+
+        salida = io.StringIO()
+        call_command('limpiar_media', '--dry-run', stdout=salida)
+        self.assertIn('2 huérfanos se borrarían', salida.getvalue())
+        self.assertTrue(all(self.existe(nombre) for nombre in huerfanos))
+
+        # Varias pasadas con pocos nombres en memoria: el mismo resultado
+        resultado = limpiar_media(max_nombres=1, lote=1)
+        self.assertEqual(resultado['particiones'], 3)
+        self.assertEqual((resultado['archivos'], resultado['huerfanos']), (6, 2))
+        self.assertFalse(any(self.existe(nombre) for nombre in huerfanos))
+        self.assertTrue(all(self.existe(nombre) for nombre in (principal, galeria, avatar, reciente)))
+        self.assertTrue(os.path.exists(os.path.join(self.media, 'otros', 'x.txt')))
+        self.assertFalse(ArchivoMedia.objects.filter(nombre__in=huerfanos).exists())
+
+    def test_no_borra_un_archivo_reutilizado(self):
+        contenido = b'foto ya subida'
+        nombre = guardar_archivo(self.almacen, 'recetas/galeria/foto.jpg', ContentFile(contenido))
+        antiguedad = time.time() - 2 * 3600
+        os.utime(os.path.join(self.media, nombre), (antiguedad, antiguedad))
+
+        # Otra subida de la misma foto, cuya fila aún no se ha guardado
+        self.assertEqual(guardar_archivo(self.almacen, 'recetas/galeria/otra.jpg', ContentFile(contenido)), nombre)
+        self.assertEqual(limpiar_media()['huerfanos'], 0)
+        self.assertTrue(self.existe(nombre))
+
+        # Y si la limpieza ya lo había borrado, se vuelve a escribir
+        os.utime(os.path.join(self.media, nombre), (antiguedad, antiguedad))
+        self.assertEqual(limpiar_media()['huerfanos'], 1)
+        self.assertEqual(guardar_archivo(self.almacen, 'recetas/galeria/otra.jpg', ContentFile(contenido)), nombre)
+        self.assertTrue(self.existe(nombre))
+        self.assertTrue(ArchivoMedia.objects.filter(nombre=nombre).exists())
+
+    def test_comprueba_los_candidatos_antes_de_borrar(self):
+        nombre = self.archivo('avatares/c.png', b'avatar')
+        # Referenciado después de leer los nombres en uso
+        with mock.patch('apps.core.limpieza_media.nombres_referenciados', return_value=iter([])):
+            User.objects.filter(pk=self.autor.pk).update(avatar=nombre)
+            self.assertEqual(limpiar_media()['huerfanos'], 0)
+        self.assertTrue(self.existe(nombre))
@@ -0,0 +1,153 @@
+"""
+Limitación de peticiones por cubeta de fichas (token bucket).
+
+Cada cliente (el usuario autenticado o, si es anónimo, su IP) tiene una cubeta por
+ámbito, lectura o escritura, con ``n`` fichas que se rellenan a ``n / periodo`` por
+segundo según las tasas ``'n/periodo'`` de ``DEFAULT_THROTTLE_RATES``. Cada petición
+gasta las fichas que indique la vista (``costes_throttle`` o ``coste_throttle()``):
+las búsquedas y agregaciones caras gastan más que un detalle.
+
+La cubeta se guarda como un solo entero (GCRA): el instante, en microsegundos, en que
+volvería a estar llena. Gastar fichas es sumarle ``coste * intervalo`` con
+``cache.incr``, atómico en Redis y memcached y dentro del proceso en LocMemCache, de
+modo que las peticiones simultáneas de un cliente no se pisan. Solo la primera
+petición tras llenarse la cubeta la reescribe con ``set``. Si la caché de
+``THROTTLE_CACHE`` falla, durante ``THROTTLE_REINTENTO_SEGUNDOS`` se usan cubetas en
+memoria del proceso: el límite pasa a ser por proceso, pero la API ni queda sin
+límite ni falla por ello.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODOS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Instante (time.monotonic) hasta el que la caché de throttling se considera caída
+_cache_caida = {'hasta': 0.0}
+
+
+@lru_cache(maxsize=32)
+def parsear_tasa(tasa):
+    """'120/min' -> (120 fichas, 60 segundos)"""
+    numero, periodo = tasa.split('/')
+    return int(numero), PERIODOS[periodo[0]]
+
+
+class CubetasLocales:
+    """Cubetas en memoria del proceso, acotadas en número (se olvidan las menos usadas)"""
+
+    def __init__(self, tamano=10000):
+        self.tamano = tamano
+        self._cubetas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consumir(self, clave, incremento, tolerancia, ahora):
+        with self._lock:
+            lleno = max(self._cubetas.pop(clave, ahora), ahora)
+            permitida = lleno + incremento - ahora <= tolerancia
+            if permitida:
+                lleno += incremento
+            self._cubetas[clave] = lleno
+            while len(self._cubetas) > self.tamano:
+                self._cubetas.popitem(last=False)
+            return permitida, lleno
+
+    def clear(self):
+        with self._lock:
+            self._cubetas.clear()
+
+
+cubetas_locales = CubetasLocales(getattr(settings, 'THROTTLE_CUBETAS_LOCALES', 10000))
+
+
+def consumir_en_cache(cache, clave, incremento, tolerancia, ahora, timeout):
+    lleno = cache.get(clave)
+    if lleno is None or lleno <= ahora:
+        # Cubeta llena: no hay deuda que conservar. Dos peticiones a la vez aquí
+        # pueden perder un incremento, nunca más de una cubeta llena
+        cache.set(clave, ahora + incremento, timeout)
+        return True, ahora + incremento
+    try:
+        lleno = cache.incr(clave, incremento)
+    except ValueError:
+        # Caducó entre get e incr
+        cache.set(clave, ahora + incremento, timeout)
+        return True, ahora + incremento
+    if lleno - ahora > tolerancia:
+        cache.decr(clave, incremento)
+        return False, lleno - incremento
+    # incr no renueva la caducidad y la clave debe durar hasta que la cubeta se llene
+    cache.touch(clave, timeout)
+    return True, lleno
+
+
+def consumir(clave, coste, capacidad, periodo):
+    """
+    Gasta ``coste`` fichas de la cubeta ``clave``. Devuelve (permitida, fichas
+    restantes, segundos hasta poder pagar ``coste``, segundos hasta llenarse).
+    """
+    intervalo = max(periodo * 1_000_000 // capacidad, 1)
+    incremento = min(coste, capacidad) * intervalo
+    tolerancia = capacidad * intervalo
+    ahora = int(time.time() * 1_000_000)
+
+    if time.monotonic() >= _cache_caida['hasta']:
+        try:
+            cache = caches[getattr(settings, 'THROTTLE_CACHE', 'default')]
+            permitida, lleno = consumir_en_cache(cache, clave, incremento, tolerancia, ahora, periodo + 1)
+        except Exception:
+            _cache_caida['hasta'] = time.monotonic() + getattr(settings, 'THROTTLE_REINTENTO_SEGUNDOS', 30)
+            permitida, lleno = cubetas_locales.consumir(clave, incremento, tolerancia, ahora)
+    else:
+        permitida, lleno = cubetas_locales.consumir(clave, incremento, tolerancia, ahora)
+
+    deuda = max(lleno - ahora, 0)
+    restantes = (tolerancia - deuda) // intervalo
+    espera = 0.0 if permitida else (deuda + incremento - tolerancia) / 1_000_000
+    return permitida, restantes, espera, deuda / 1_000_000
+
+
+class CubetaFichasThrottle(BaseThrottle):
+    """
+    Throttle de DRF sobre ``consumir``. Ámbitos de ``DEFAULT_THROTTLE_RATES``:
+    ``lectura_anonimo``, ``lectura_usuario``, ``escritura_anonimo`` y
+    ``escritura_usuario``; un ámbito sin tasa no se limita. Deja el estado de la
+    cubeta en ``request.cuota_throttle`` para las cabeceras X-RateLimit-*
+    (``apps.core.middleware.CabecerasCuotaMiddleware``).
+    """
+
+    espera = None
+
+    def coste(self, request, view):
+        if hasattr(view, 'coste_throttle'):
+            return view.coste_throttle(request)
+        return getattr(view, 'costes_throttle', {}).get(getattr(view, 'action', None), 1)
+
+    def allow_request(self, request, view):
+        if not getattr(settings, 'THROTTLE_ACTIVO', True):
+            return True
+        autenticado = request.user.is_authenticated
+        ambito = ('lectura' if request.method in SAFE_METHODS else 'escritura') + (
+            '_usuario' if autenticado else '_anonimo'
+        )
+        tasa = api_settings.DEFAULT_THROTTLE_RATES.get(ambito)
+        if tasa is None:
+            return True
+
+        capacidad, periodo = parsear_tasa(tasa)
+        identidad = request.user.pk if autenticado else self.get_ident(request)
+        permitida, restantes, self.espera, reinicio = consumir(
+            f'throttle:{ambito}:{identidad}', self.coste(request, view), capacidad, periodo
+        )
+        request._request.cuota_throttle = (capacidad, restantes, reinicio)
+        return permitida
+
+    def wait(self):
+        return self.espera
@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('', views.api_home, name='home'),
+    path('estado/db/', views.estado_db, name='estado_db'),
 ]
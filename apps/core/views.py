@@ -1,5 +1,23 @@
-from django.http import JsonResponse
+import mimetypes
+import os
+import posixpath
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from apps.recetas.models import Categoria, Receta
+from .db_pool import metricas_pools
+from .storage import es_nombre_por_contenido
+
+# Un año: los nombres con hash no cambian de contenido
+CACHE_INMUTABLE = 'max-age=31536000, immutable'
 
 
 def api_home(request):
@@ -34,3 +52,105 @@ def api_home(request):
             ]
         }
         return render(request, 'home.html', context)
+
+
+def estado_db(request):
+    """
+    Métricas de conexiones de este proceso: configuración y saturación de los pools
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Solo para administradores'}, status=403)
+    
+    return JsonResponse({
+        'conexiones': {
+            alias: {
+                'engine': config['ENGINE'],
+                'conn_max_age': config.get('CONN_MAX_AGE'),
+                'conn_health_checks': config.get('CONN_HEALTH_CHECKS'),
+                'pool': (config.get('POOL') or {}).get('TAMANO', 0),
+            }
+            for alias, config in settings.DATABASES.items()
+        },
+        'pools': metricas_pools(),
+    })
+
+
+def ruta_segura(ruta):
+    """La ruta relativa normalizada, o 404 si intenta salir del directorio"""
+    ruta = posixpath.normpath(ruta).lstrip('/')
+    if ruta in ('', '.') or ruta.startswith('..'):
+        raise Http404
+    return ruta
+
+
+def respuesta_archivo(raiz, prefijo, ruta, cache_control):
+    """
+    Respuesta sin cuerpo que delega el envío del archivo al servidor web
+    (``SERVIDOR_ARCHIVOS``): X-Accel-Redirect a la ubicación interna de nginx o
+    X-Sendfile con la ruta absoluta. Sin servidor configurado (desarrollo) lo envía
+    Django.
+    """
+    modo = getattr(settings, 'SERVIDOR_ARCHIVOS', '')
+    if modo == 'nginx':
+        respuesta = HttpResponse()
+        respuesta['X-Accel-Redirect'] = quote(f"{settings.SERVIDOR_ARCHIVOS_PREFIJO}{prefijo}/{ruta}")
+        respuesta['Content-Type'] = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    elif modo == 'sendfile':
+        respuesta = HttpResponse()
+        respuesta['X-Sendfile'] = os.path.join(raiz, ruta)
+        respuesta['Content-Type'] = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+    else:
+        try:
+            respuesta = FileResponse(open(os.path.join(raiz, ruta), 'rb'))
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404
+    respuesta['Cache-Control'] = cache_control
+    return respuesta
+
+
+def acceso_media(usuario, ruta):
+    """
+    'public', 'private' (solo lo ve su autor) o None. Las imágenes de recetas
+    se ven si alguna receta visible para el usuario las usa; el resto es público.
+    Un archivo de ``recetas/`` puede ser también un avatar o la imagen de una
+    categoría (se comparte por contenido, ``apps.core.archivos``), y entonces es público.
+    """
+    if not ruta.startswith('recetas/'):
+        return 'public'
+    if get_user_model().objects.filter(avatar=ruta).exists() or Categoria.objects.filter(imagen=ruta).exists():
+        return 'public'
+    usa_imagen = [Q(imagen_principal=ruta), Q(imagenes_adicionales__imagen=ruta)]
+    if any(Receta.objects.publicadas().filter(condicion).exists() for condicion in usa_imagen):
+        return 'public'
+    if usuario.is_authenticated and any(
+        Receta.objects.filter(condicion, autor=usuario, fecha_baja__isnull=True).exists()
+        for condicion in usa_imagen
+    ):
+        return 'private'
+    return None
+
+
+@require_safe
+def servir_media(request, ruta):
+    """Archivos subidos: comprueba el acceso y el servidor web envía los bytes"""
+    ruta = ruta_segura(ruta)
+    acceso = acceso_media(request.user, ruta)
+    if acceso is None:
+        raise Http404
+    # Los nombres antiguos (sin hash) pueden cambiar de contenido
+    duracion = CACHE_INMUTABLE if es_nombre_por_contenido(ruta) else 'max-age=3600'
+    return respuesta_archivo(settings.MEDIA_ROOT, 'media', ruta, f'{acceso}, {duracion}')
+
+
+@lru_cache(maxsize=1)
+def estaticos_con_hash():
+    """Nombres con hash del manifiesto de ``collectstatic`` (se lee al arrancar el proceso)"""
+    return frozenset(getattr(staticfiles_storage, 'hashed_files', {}).values())
+
+
+@require_safe
+def servir_estatico(request, ruta):
+    """Estáticos de ``collectstatic``: caché de un año para los nombres con hash"""
+    ruta = ruta_segura(ruta)
+    duracion = CACHE_INMUTABLE if ruta in estaticos_con_hash() else 'max-age=3600'
+    return respuesta_archivo(settings.STATIC_ROOT, 'static', ruta, f'public, {duracion}')
@@ -2,10 +2,15 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
+
+from apps.usuarios.bajas import dar_de_baja_receta
 from .models import (
     Categoria, Ingrediente, Receta, RecetaIngrediente, 
-    Rating, Favorito, ImagenReceta
+    Rating, Favorito, ImagenReceta, UsoFiltro, AliasIngrediente, VistasDia
 )
+from .favoritos import quitar_favoritos
+from .feed import repartir_receta
+from .minhash import actualizar_firmas
 
 
 @admin.register(Categoria)
@@ -47,6 +52,16 @@ class CategoriaAdmin(admin.ModelAdmin):
     imagen_preview.short_description = 'Vista Previa'
 
 
+class AliasIngredienteInline(admin.TabularInline):
+    """
+    Sinónimos que resuelven al ingrediente en las búsquedas
+    """
+    model = AliasIngrediente
+    extra = 1
+    fields = ('nombre', 'clave')
+    readonly_fields = ('clave',)
+
+
 @admin.register(Ingrediente)
 class IngredienteAdmin(admin.ModelAdmin):
     """
@@ -56,6 +71,7 @@ class IngredienteAdmin(admin.ModelAdmin):
     list_filter = ('categoria_ingrediente',)
     search_fields = ('nombre',)
     ordering = ('nombre',)
+    inlines = [AliasIngredienteInline]
     
     def total_usos(self, obj):
         """Muestra en cuántas recetas se usa el ingrediente"""
@@ -118,7 +134,8 @@ class RecetaAdmin(admin.ModelAdmin):
         'dificultad',
         'categoria',
         'fecha_creacion',
-        'autor'
+        'autor',
+        'fecha_baja'
     )
     
     search_fields = (
@@ -135,6 +152,7 @@ class RecetaAdmin(admin.ModelAdmin):
         'id', 
         'fecha_creacion', 
         'fecha_actualizacion',
+        'fecha_baja',
         'vistas',
         'rating_display',
         'total_favoritos_display',
@@ -172,7 +190,8 @@ class RecetaAdmin(admin.ModelAdmin):
         ('Estado y Publicación', {
             'fields': (
                 'publicada',
-                'destacada'
+                'destacada',
+                'fecha_baja'
             )
         }),
         ('Estadísticas', {
@@ -229,10 +248,34 @@ class RecetaAdmin(admin.ModelAdmin):
         return "Sin imagen"
     imagen_preview.short_description = 'Vista Previa'
     
+    # Borrar desde el admin da de baja la receta: purgar_bajas borra las filas por lotes
+    def get_deleted_objects(self, objs, request):
+        """Sin recorrer la cascada de ratings, favoritos, feed y vistas"""
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+    
+    def delete_model(self, request, obj):
+        dar_de_baja_receta(obj)
+    
+    def delete_queryset(self, request, queryset):
+        for receta in queryset.filter(fecha_baja__isnull=True):
+            dar_de_baja_receta(receta)
+    
+    def save_related(self, request, form, formsets, change):
+        """Los ingredientes se guardan con el inline: recalcular después la firma MinHash"""
+        super().save_related(request, form, formsets, change)
+        actualizar_firmas([form.instance.pk])
+    
     # Acciones personalizadas
     def marcar_como_publicada(self, request, queryset):
         """Marca las recetas seleccionadas como publicadas"""
+        # Las borradas no vuelven; update() no envía post_save: el reparto al feed se hace aquí
+        queryset = queryset.filter(fecha_baja__isnull=True)
+        nuevas = list(queryset.filter(publicada=False).values_list('pk', 'autor_id'))
         updated = queryset.update(publicada=True)
+        for pk, autor_id in nuevas:
+            repartir_receta(pk, autor_id)
         self.message_user(request, f'{updated} recetas marcadas como publicadas.')
     marcar_como_publicada.short_description = "Marcar como publicada"
     
@@ -283,6 +326,20 @@ class RatingAdmin(admin.ModelAdmin):
         return format_html('<a href="{}">{}</a>', url, obj.receta.titulo)
     receta_link.short_description = 'Receta'
     
+    # Las escrituras pasan por favoritos.py para mantener Receta.total_favoritos
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def delete_model(self, request, obj):
+        quitar_favoritos(obj.usuario, [obj.receta_id])
+    
+    def delete_queryset(self, request, queryset):
+        for favorito in queryset.select_related('usuario'):
+            quitar_favoritos(favorito.usuario, [favorito.receta_id])
+    
     def puntuacion_display(self, obj):
         """Muestra la puntuación con estrellas"""
         stars = "★" * obj.puntuacion + "☆" * (5 - obj.puntuacion)
@@ -323,6 +380,20 @@ class FavoritoAdmin(admin.ModelAdmin):
         url = reverse('admin:recetas_receta_change', args=[obj.receta.pk])
         return format_html('<a href="{}">{}</a>', url, obj.receta.titulo)
     receta_link.short_description = 'Receta'
+    
+    # Las escrituras pasan por favoritos.py para mantener Receta.total_favoritos
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def delete_model(self, request, obj):
+        quitar_favoritos(obj.usuario, [obj.receta_id])
+    
+    def delete_queryset(self, request, queryset):
+        for favorito in queryset.select_related('usuario'):
+            quitar_favoritos(favorito.usuario, [favorito.receta_id])
 
 
 @admin.register(ImagenReceta)
@@ -370,3 +441,44 @@ class ImagenRecetaAdmin(admin.ModelAdmin):
 admin.site.site_header = "Quanticook Admin"
 admin.site.site_title = "Quanticook"
 admin.site.index_title = "Panel de Administración de Quanticook"
+
+
+@admin.register(UsoFiltro)
+class UsoFiltroAdmin(admin.ModelAdmin):
+    """
+    Admin de solo lectura para el uso de filtros del listado de recetas
+    """
+    list_display = (
+        'firma',
+        'usos',
+        'latencia_media',
+        'latencia_max_ms',
+        'ultima_vez'
+    )
+    
+    search_fields = ('firma',)
+    
+    readonly_fields = [field.name for field in UsoFiltro._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def latencia_media(self, obj):
+        return f"{obj.latencia_media_ms:.1f} ms"
+    latencia_media.short_description = 'Latencia media'
+
+
+@admin.register(VistasDia)
+class VistasDiaAdmin(admin.ModelAdmin):
+    """
+    Admin de solo lectura para las vistas diarias de cada receta (``agregar_vistas``)
+    """
+    list_display = ('receta', 'dia', 'origen', 'vistas')
+    list_filter = ('origen', 'dia')
+    list_select_related = ('receta',)
+    date_hierarchy = 'dia'
+    
+    readonly_fields = [field.name for field in VistasDia._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
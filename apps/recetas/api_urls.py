@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     CategoriaViewSet, IngredienteViewSet, RecetaViewSet,
-    RatingViewSet, FavoritoViewSet, EstadisticasViewSet
+    RatingViewSet, FavoritoViewSet, EstadisticasViewSet, FeedViewSet, ListaComprasViewSet,
+    SubidaImagenViewSet
 )
 
 # Crear el router principal
@@ -15,6 +16,9 @@ router.register(r'recetas', RecetaViewSet, basename='receta')
 router.register(r'ratings', RatingViewSet, basename='rating')
 router.register(r'favoritos', FavoritoViewSet, basename='favorito')
 router.register(r'estadisticas', EstadisticasViewSet, basename='estadisticas')
+router.register(r'feed', FeedViewSet, basename='feed')
+router.register(r'lista-compras', ListaComprasViewSet, basename='lista-compras')
+router.register(r'subidas', SubidaImagenViewSet, basename='subida')
 
 # URLs de la API
 urlpatterns = [
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecetasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.recetas'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,13 @@
+from django.urls import path
+from . import async_views
+
+# Versión asíncrona (ASGI) de las rutas de lectura más consultadas
+urlpatterns = [
+    path('recetas/', async_views.receta_list, name='async-receta-list'),
+    path('recetas/destacadas/', async_views.recetas_destacadas, name='async-receta-destacadas'),
+    path('recetas/mas_vistas/', async_views.recetas_mas_vistas, name='async-receta-mas-vistas'),
+    path('recetas/mejor_valoradas/', async_views.recetas_mejor_valoradas, name='async-receta-mejor-valoradas'),
+    path('recetas/<uuid:pk>/', async_views.receta_detail, name='async-receta-detail'),
+    path('categorias/', async_views.categoria_list, name='async-categoria-list'),
+    path('ingredientes/', async_views.ingrediente_list, name='async-ingrediente-list'),
+]
@@ -0,0 +1,220 @@
+"""
+Vistas asíncronas de solo lectura para las rutas más consultadas.
+
+Bajo ASGI, los ViewSets de DRF se ejecutan en un hilo por petición; estas vistas
+usan el ORM asíncrono de Django, de modo que un worker atiende muchas conexiones
+lentas a la vez mientras espera a la base de datos. Devuelven el mismo formato
+que los endpoints de ``/api/v1/`` reutilizando sus serializers: los querysets
+cargan de antemano (select_related, prefetch y anotaciones) todo lo que el
+serializer lee, así que serializar no ejecuta consultas.
+
+La autenticación (sesión y token), el throttling y la negociación de contenido
+(JSON o MessagePack) son los del ViewSet equivalente; se ejecutan en un hilo con
+``sync_to_async`` porque consultan la caché y, si falla, la base de datos.
+"""
+import time
+from functools import reduce, wraps
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Q
+from django.http import Http404
+from django.views.decorators.http import require_GET
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import RecetaFilter
+from .models import Ingrediente, Receta
+from .serializers import (
+    CategoriaSerializer, IngredienteSerializer,
+    RecetaListSerializer, RecetaDetailSerializer
+)
+from .registro_vistas import origen_de, registro_vistas
+from .uso_filtros import registro_filtros
+from .views import CategoriaViewSet, IngredienteViewSet, RecetaViewSet, prefetch_detalle
+
+TAMANO_PAGINA = settings.REST_FRAMEWORK['PAGE_SIZE']
+TAMANO_RANKING = 10
+
+
+def preparar(request, viewset, accion):
+    """
+    ``initial()`` de DRF con el ViewSet de la ruta síncrona: autentica, comprueba
+    permisos y throttling y elige el renderer. Devuelve la vista, la petición de
+    DRF y, si la petición no pasa, la respuesta de error.
+    """
+    vista = viewset(
+        action_map={'get': accion}, args=(), kwargs={}, format_kwarg=None,
+        # La API navegable necesita los métodos síncronos del ViewSet
+        renderer_classes=[r for r in viewset.renderer_classes if not issubclass(r, BrowsableAPIRenderer)],
+    )
+    vista.request = drf_request = vista.initialize_request(request)
+    vista.headers = vista.default_response_headers
+    try:
+        vista.initial(drf_request)
+    except Exception as exc:
+        return vista, drf_request, vista.handle_exception(exc)
+    return vista, drf_request, None
+
+
+def vista_drf(viewset, accion):
+    """
+    Decorador de las vistas asíncronas: reciben la petición de DRF ya autenticada
+    y devuelven datos o una ``Response``, que se renderiza según ``Accept``
+    """
+    def decorador(funcion):
+        @require_GET
+        @wraps(funcion)
+        async def envoltura(request, *args, **kwargs):
+            vista, drf_request, respuesta = await sync_to_async(preparar)(request, viewset, accion)
+            if respuesta is None:
+                try:
+                    respuesta = await funcion(drf_request, *args, **kwargs)
+                except Http404 as exc:
+                    respuesta = vista.handle_exception(exc)
+                if not isinstance(respuesta, Response):
+                    respuesta = Response(respuesta)
+            return vista.finalize_response(drf_request, respuesta)
+        return envoltura
+    return decorador
+
+
+def buscar(queryset, campos, texto):
+    """Equivalente a SearchFilter: cada término debe aparecer en alguno de los campos"""
+    for termino in texto.replace(',', ' ').split():
+        queryset = queryset.filter(
+            reduce(or_, (Q(**{f'{campo}__icontains': termino}) for campo in campos))
+        )
+    return queryset
+
+
+def ordenar(queryset, request, campos_permitidos, por_defecto):
+    """Equivalente a OrderingFilter con los ordering_fields del ViewSet"""
+    ordering = [
+        campo.strip() for campo in request.GET.get('ordering', '').split(',')
+        if campo.strip().lstrip('-') in campos_permitidos
+    ]
+    return queryset.order_by(*(ordering or por_defecto))
+
+
+async def paginar(request, queryset, serializer_class):
+    """Respuesta con el mismo formato que PageNumberPagination de DRF"""
+    try:
+        pagina = max(1, int(request.GET.get('page', 1)))
+    except ValueError:
+        pagina = 1
+
+    total = await queryset.acount()
+    inicio = (pagina - 1) * TAMANO_PAGINA
+    objetos = [objeto async for objeto in queryset[inicio:inicio + TAMANO_PAGINA]]
+    if pagina > 1 and not objetos:
+        raise Http404("Página inválida")
+
+    url = request.build_absolute_uri()
+    siguiente = replace_query_param(url, 'page', pagina + 1) if inicio + TAMANO_PAGINA < total else None
+    if pagina == 1:
+        anterior = None
+    elif pagina == 2:
+        anterior = remove_query_param(url, 'page')
+    else:
+        anterior = replace_query_param(url, 'page', pagina - 1)
+
+    serializer = serializer_class(objetos, many=True, context={'request': request})
+    return {
+        'count': total,
+        'next': siguiente,
+        'previous': anterior,
+        'results': serializer.data,
+    }
+
+
+def recetas_visibles(request):
+    return Receta.objects.select_related(
+        'autor', 'categoria'
+    ).con_estadisticas(request.user).visibles_para(request.user)
+
+
+@vista_drf(RecetaViewSet, 'list')
+async def receta_list(request):
+    """Listado de recetas con los mismos filtros, búsqueda y orden que /recetas/"""
+    inicio = time.perf_counter()
+    queryset = recetas_visibles(request)
+    filtro = RecetaFilter(request.GET, queryset=queryset)
+    if not filtro.is_valid():
+        return Response(filtro.errors, status=400)
+
+    queryset = filtro.qs
+    if request.GET.get('search'):
+        queryset = buscar(queryset, RecetaViewSet.search_fields, request.GET['search'])
+    queryset = ordenar(queryset, request, RecetaViewSet.ordering_fields, RecetaViewSet.ordering)
+    respuesta = await paginar(request, queryset, RecetaListSerializer)
+
+    registro_filtros.registrar(request.GET, (time.perf_counter() - inicio) * 1000)
+    if registro_filtros.toca_volcar():
+        await sync_to_async(registro_filtros.volcar)()
+    return respuesta
+
+
+@vista_drf(RecetaViewSet, 'retrieve')
+async def receta_detail(request, pk):
+    """Detalle de una receta; incrementa las vistas con un UPDATE atómico y registra la vista"""
+    queryset = recetas_visibles(request).prefetch_related(*prefetch_detalle())
+    try:
+        receta = await queryset.aget(pk=pk)
+    except Receta.DoesNotExist:
+        raise Http404("No encontrado")
+
+    await Receta.objects.filter(pk=receta.pk).aupdate(vistas=F('vistas') + 1)
+    receta.vistas += 1
+    usuario = request.user
+    registro_vistas.registrar(receta.pk, usuario.pk if usuario.is_authenticated else None, origen_de(request))
+    if registro_vistas.toca_volcar():
+        await sync_to_async(registro_vistas.volcar)()
+    serializer = RecetaDetailSerializer(receta, context={'request': request})
+    return serializer.data
+
+
+async def ranking(request, filtro, orden):
+    queryset = recetas_visibles(request).filter(filtro).order_by(orden)
+    recetas = [receta async for receta in queryset[:TAMANO_RANKING]]
+    serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
+    return serializer.data
+
+
+@vista_drf(RecetaViewSet, 'destacadas')
+async def recetas_destacadas(request):
+    return await ranking(request, Q(destacada=True), '-fecha_creacion')
+
+
+@vista_drf(RecetaViewSet, 'mas_vistas')
+async def recetas_mas_vistas(request):
+    return await ranking(request, Q(), '-vistas')
+
+
+@vista_drf(RecetaViewSet, 'mejor_valoradas')
+async def recetas_mejor_valoradas(request):
+    return await ranking(request, Q(rating_promedio__isnull=False), '-rating_promedio')
+
+
+@vista_drf(CategoriaViewSet, 'list')
+async def categoria_list(request):
+    """Listado de categorías activas con su total de recetas publicadas"""
+    queryset = CategoriaViewSet.queryset.all()
+    if request.GET.get('search'):
+        queryset = buscar(queryset, CategoriaViewSet.search_fields, request.GET['search'])
+    queryset = ordenar(queryset, request, CategoriaViewSet.ordering_fields, CategoriaViewSet.ordering)
+    return await paginar(request, queryset, CategoriaSerializer)
+
+
+@vista_drf(IngredienteViewSet, 'list')
+async def ingrediente_list(request):
+    """Búsqueda de ingredientes por nombre y tipo"""
+    queryset = Ingrediente.objects.all()
+    if request.GET.get('categoria_ingrediente'):
+        queryset = queryset.filter(categoria_ingrediente=request.GET['categoria_ingrediente'])
+    if request.GET.get('search'):
+        queryset = buscar(queryset, IngredienteViewSet.search_fields, request.GET['search'])
+    queryset = ordenar(queryset, request, IngredienteViewSet.ordering_fields, IngredienteViewSet.ordering)
+    return await paginar(request, queryset, IngredienteSerializer)
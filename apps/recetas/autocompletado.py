@@ -0,0 +1,172 @@
+"""
+Autocompletado de ingredientes desde un índice de prefijos en memoria.
+
+Cada proceso mantiene un array ordenado de claves (nombre sin acentos ni mayúsculas,
+una por cada palabra del nombre) y lo consulta con ``bisect``, sin tocar la base de
+datos. Los cambios de ``Ingrediente`` incrementan una versión en la caché compartida
+y guardan qué ingrediente cambió; al ver una versión nueva, cada proceso recarga solo
+esos ingredientes, y si le falta algún cambio (caché vaciada, demasiados cambios o una
+invalidación global) reconstruye el índice entero. El uso en recetas se actualiza con
+la reconstrucción periódica.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Ingrediente
+from .normalizacion import plegar
+
+CLAVE_VERSION = 'autocompletar_ingredientes:version'
+CLAVE_CAMBIO = 'autocompletar_ingredientes:cambio:{}'
+# Más cambios pendientes que esto: sale más barato reconstruir
+MAX_CAMBIOS_INCREMENTALES = 200
+
+
+def claves_nombre(nombre):
+    """Una clave por cada palabra: 'pimienta negra' -> 'pimienta negra', 'negra'"""
+    plegado = ' '.join(plegar(nombre).split())
+    claves, inicio = [], 0
+    for palabra in plegado.split(' '):
+        claves.append(plegado[inicio:])
+        inicio += len(palabra) + 1
+    return claves
+
+
+def intervalo_reconstruccion():
+    """Edad máxima del índice; recoge también cambios de uso hechos sin señales"""
+    return getattr(settings, 'AUTOCOMPLETAR_RECONSTRUCCION_SEGUNDOS', 600)
+
+
+def _nueva_version():
+    cache.add(CLAVE_VERSION, 0, timeout=None)
+    try:
+        return cache.incr(CLAVE_VERSION)
+    except ValueError:
+        # La clave expiró o se desalojó entre add() e incr()
+        cache.set(CLAVE_VERSION, 1, timeout=None)
+        return 1
+
+
+def registrar_cambio(ingrediente_id):
+    """Publica que un ingrediente cambió (alta, edición, borrado o uso en recetas)"""
+    version = _nueva_version()
+    cache.set(CLAVE_CAMBIO.format(version), ingrediente_id, intervalo_reconstruccion())
+
+
+def invalidar_indice():
+    """Fuerza la reconstrucción en todos los procesos (cargas masivas sin señales)"""
+    _nueva_version()
+
+
+class IndicePrefijos:
+    """
+    Array ordenado e inmutable de (clave, es_interior, id); las actualizaciones crean
+    uno nuevo, así que las lecturas concurrentes no necesitan lock
+    """
+
+    def __init__(self, ingredientes):
+        # id -> (nombre, categoria_ingrediente, recetas_uso)
+        self.ingredientes = {fila[0]: fila[1:] for fila in ingredientes}
+        self.entradas = sorted(
+            (clave, posicion > 0, ingrediente_id)
+            for ingrediente_id, (nombre, _, _) in self.ingredientes.items()
+            for posicion, clave in enumerate(claves_nombre(nombre))
+        )
+
+    def con_cambios(self, ids, ingredientes):
+        """Índice nuevo sin ``ids`` y con las filas recargadas de ``ingredientes``"""
+        ids = set(ids)
+        nuevo = IndicePrefijos(ingredientes)
+        nuevo.ingredientes = {
+            **{k: v for k, v in self.ingredientes.items() if k not in ids},
+            **nuevo.ingredientes,
+        }
+        nuevo.entradas = sorted(
+            [entrada for entrada in self.entradas if entrada[2] not in ids] + nuevo.entradas
+        )
+        return nuevo
+
+    def buscar(self, prefijo, limite):
+        """
+        Ingredientes con alguna palabra que empieza por ``prefijo``: primero los que
+        empiezan por él, luego por uso en recetas y por nombre
+        """
+        prefijo = ' '.join(plegar(prefijo).split())
+        if not prefijo:
+            return []
+        candidatos = {}
+        i = bisect_left(self.entradas, (prefijo,))
+        while i < len(self.entradas) and self.entradas[i][0].startswith(prefijo):
+            _, interior, ingrediente_id = self.entradas[i]
+            candidatos[ingrediente_id] = min(candidatos.get(ingrediente_id, True), interior)
+            i += 1
+
+        ordenados = sorted(
+            candidatos.items(),
+            key=lambda item: (item[1], -self.ingredientes[item[0]][2], self.ingredientes[item[0]][0])
+        )
+        return [
+            {
+                'id': ingrediente_id,
+                'nombre': self.ingredientes[ingrediente_id][0],
+                'categoria_ingrediente': self.ingredientes[ingrediente_id][1],
+                'recetas_uso': self.ingredientes[ingrediente_id][2],
+            }
+            for ingrediente_id, _ in ordenados[:limite]
+        ]
+
+
+def filas_ingredientes(ids=None):
+    queryset = Ingrediente.objects.annotate(uso=Count('recetas_uso'))
+    if ids is not None:
+        queryset = queryset.filter(pk__in=ids)
+    return queryset.order_by().values_list('id', 'nombre', 'categoria_ingrediente', 'uso')
+
+
+class AutocompletadoIngredientes:
+    """Índice del proceso, sincronizado con la versión de la caché compartida"""
+
+    def __init__(self):
+        self.indice = None
+        self.version = None
+        self.construido = 0.0
+        self._lock = threading.Lock()
+
+    def buscar(self, q, limite=10):
+        if not plegar(q).strip():
+            return []
+        self.sincronizar()
+        return self.indice.buscar(q, limite)
+
+    def sincronizar(self):
+        version = cache.get(CLAVE_VERSION, 0)
+        caducado = time.monotonic() - self.construido > intervalo_reconstruccion()
+        if self.indice is not None and version == self.version and not caducado:
+            return
+        with self._lock:
+            if self.indice is not None and version == self.version and not caducado:
+                return
+            ids = self.cambios_pendientes(version) if not caducado else None
+            if ids is None:
+                self.indice = IndicePrefijos(filas_ingredientes())
+                self.construido = time.monotonic()
+            elif ids:
+                self.indice = self.indice.con_cambios(ids, filas_ingredientes(ids))
+            self.version = version
+
+    def cambios_pendientes(self, version):
+        """Ids cambiados desde la versión local, o None si hay que reconstruir"""
+        if self.indice is None or not 0 <= version - self.version <= MAX_CAMBIOS_INCREMENTALES:
+            return None
+        claves = [CLAVE_CAMBIO.format(v) for v in range(self.version + 1, version + 1)]
+        cambios = cache.get_many(claves)
+        if len(cambios) != len(claves):
+            return None
+        return set(cambios.values())
+
+
+autocompletado = AutocompletadoIngredientes()
@@ -0,0 +1,83 @@
+"""
+Interpretación de las cantidades en texto libre de ``RecetaIngrediente``.
+
+``parsear_cantidad`` se ejecuta una vez al guardar y deja un valor numérico en una
+unidad base (g para masa, ml para volumen, ``unidad`` para piezas) para que las
+agregaciones (lista de la compra) sumen en SQL sin volver a leer el texto.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from .normalizacion import plegar, singular
+
+# Unidad plegada y en singular -> (unidad base, factor)
+UNIDADES = {
+    'g': ('g', 1), 'gr': ('g', 1), 'grs': ('g', 1), 'gramo': ('g', 1),
+    'kg': ('g', 1000), 'kilo': ('g', 1000), 'kilogramo': ('g', 1000),
+    'mg': ('g', Decimal('0.001')),
+    'lb': ('g', Decimal('453.592')), 'libra': ('g', Decimal('453.592')),
+    'oz': ('g', Decimal('28.3495')), 'onza': ('g', Decimal('28.3495')),
+    'ml': ('ml', 1), 'cc': ('ml', 1), 'mililitro': ('ml', 1),
+    'l': ('ml', 1000), 'lt': ('ml', 1000), 'litro': ('ml', 1000),
+    'taza': ('ml', 240),
+    'cucharada': ('ml', 15), 'cda': ('ml', 15),
+    'cucharadita': ('ml', 5), 'cdta': ('ml', 5),
+    'unidad': ('unidad', 1), 'pieza': ('unidad', 1), 'pza': ('unidad', 1),
+}
+
+FRACCIONES = {'½': '1/2', '¼': '1/4', '¾': '3/4', '⅓': '1/3', '⅔': '2/3'}
+
+PATRON = re.compile(
+    r'^\s*(?P<numero>\d+\s+\d+/\d+|\d+/\d+|\d+(?:[.,]\d+)?)\s*(?P<unidad>[^\W\d_]+\.?)?',
+    re.UNICODE
+)
+
+# Unidades base -> (unidad mayor, factor) para presentar totales
+UNIDADES_MAYORES = {'g': ('kg', 1000), 'ml': ('l', 1000)}
+
+
+def _numero(texto):
+    total = Decimal(0)
+    for parte in texto.replace(',', '.').split():
+        if '/' in parte:
+            numerador, denominador = parte.split('/')
+            if int(denominador) == 0:
+                raise InvalidOperation
+            total += Decimal(numerador) / Decimal(denominador)
+        else:
+            total += Decimal(parte)
+    return total
+
+
+def parsear_cantidad(texto):
+    """
+    (valor, unidad) de un texto como "2 tazas", "500g", "1 1/2 kg" o "3 dientes".
+    Las unidades conocidas se convierten a su unidad base; las demás se guardan
+    plegadas y en singular ("diente"); sin número (p. ej. "al gusto") -> (None, '').
+    """
+    for simbolo, fraccion in FRACCIONES.items():
+        texto = texto.replace(simbolo, f' {fraccion}')
+    coincidencia = PATRON.match(texto)
+    if coincidencia is None:
+        return None, ''
+    try:
+        valor = _numero(coincidencia.group('numero'))
+    except (InvalidOperation, ValueError):
+        return None, ''
+
+    unidad = singular(plegar(coincidencia.group('unidad') or '').rstrip('.'))
+    if not unidad or unidad == 'de':
+        unidad = 'unidad'
+    base, factor = UNIDADES.get(unidad, (unidad, 1))
+    return (valor * factor).quantize(Decimal('0.001')), base
+
+
+def presentar(valor, unidad):
+    """Pasa a kg o l los totales grandes: (1500, 'g') -> (1.5, 'kg')"""
+    if valor is None:
+        return None, unidad
+    if unidad in UNIDADES_MAYORES:
+        mayor, factor = UNIDADES_MAYORES[unidad]
+        if valor >= factor:
+            return round(valor / factor, 3), mayor
+    return round(valor, 3), unidad
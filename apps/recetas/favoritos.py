@@ -0,0 +1,55 @@
+"""
+Altas y bajas de favoritos idempotentes con ``Receta.total_favoritos`` al día.
+
+Toda escritura de ``Favorito`` pasa por aquí. Las altas son INSERT que ignoran los
+duplicados (``bulk_create(ignore_conflicts=True)``), así que repetir una petición o
+enviar dos a la vez no falla por ``unique_together`` ni invierte el estado. Cada
+operación bloquea antes la fila del usuario: sus escrituras de favoritos se
+serializan y la diferencia entre lo que había y lo que hay es exacta, de modo que los
+contadores se ajustan con UPDATE ... SET total_favoritos = total_favoritos ± 1 en lugar
+de recontar.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from .models import Favorito, Receta
+
+User = get_user_model()
+
+
+def _bloquear_usuario(usuario):
+    User.objects.select_for_update().filter(pk=usuario.pk).values_list('pk', flat=True).first()
+
+
+def _existentes(usuario, receta_ids):
+    return set(Favorito.objects.filter(usuario=usuario, receta_id__in=receta_ids).values_list('receta_id', flat=True))
+
+
+@transaction.atomic
+def agregar_favoritos(usuario, receta_ids):
+    """Marca como favoritas ``receta_ids``; devuelve los ids que no lo eran"""
+    receta_ids = set(receta_ids)
+    if not receta_ids:
+        return set()
+    _bloquear_usuario(usuario)
+    nuevas = receta_ids - _existentes(usuario, receta_ids)
+    Favorito.objects.bulk_create(
+        [Favorito(usuario=usuario, receta_id=receta_id) for receta_id in nuevas],
+        ignore_conflicts=True
+    )
+    Receta.objects.filter(pk__in=nuevas).update(total_favoritos=F('total_favoritos') + 1)
+    return nuevas
+
+
+@transaction.atomic
+def quitar_favoritos(usuario, receta_ids):
+    """Quita de favoritas ``receta_ids``; devuelve los ids que lo eran"""
+    receta_ids = set(receta_ids)
+    if not receta_ids:
+        return set()
+    _bloquear_usuario(usuario)
+    quitadas = _existentes(usuario, receta_ids)
+    Favorito.objects.filter(usuario=usuario, receta_id__in=quitadas).delete()
+    Receta.objects.filter(pk__in=quitadas).update(total_favoritos=F('total_favoritos') - 1)
+    return quitadas
@@ -0,0 +1,120 @@
+"""
+Feed de recetas de los autores que sigue un usuario.
+
+Fan-out al publicar: cuando un autor publica, su receta se copia como ``EntradaFeed``
+al timeline de cada seguidor, de modo que leer el feed es un rango del índice
+(usuario, -fecha). Para los autores con más de ``FEED_FANOUT_MAX_SEGUIDORES``
+seguidores copiar a todos sería demasiado caro: sus recetas se leen al pedir el feed
+(fan-out al leer, por el índice (autor, -fecha_creacion) de Receta) y se mezclan con
+el timeline.
+"""
+import uuid
+
+from django.conf import settings
+from django.db.models import F, FilteredRelation, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.usuarios.models import PerfilExtendido, Seguimiento
+
+from .models import EntradaFeed, Receta
+
+LOTE = 1000
+
+
+def umbral_fanout():
+    return getattr(settings, 'FEED_FANOUT_MAX_SEGUIDORES', 5000)
+
+
+def es_popular(autor_id):
+    return PerfilExtendido.objects.filter(usuario_id=autor_id, total_seguidores__gt=umbral_fanout()).exists()
+
+
+def repartir_receta(receta_id, autor_id, fecha=None):
+    """Copia la receta al timeline de los seguidores del autor; devuelve cuántos"""
+    if es_popular(autor_id):
+        return 0
+    fecha = fecha or timezone.now()
+    # Como mucho umbral_fanout() ids: cabe en memoria
+    seguidores = list(Seguimiento.objects.filter(seguido_id=autor_id).values_list('seguidor_id', flat=True))
+    for inicio in range(0, len(seguidores), LOTE):
+        EntradaFeed.objects.bulk_create([
+            EntradaFeed(usuario_id=seguidor, receta_id=receta_id, autor_id=autor_id, fecha=fecha)
+            for seguidor in seguidores[inicio:inicio + LOTE]
+        ], ignore_conflicts=True)
+    return len(seguidores)
+
+
+def rellenar_timeline(seguidor_id, autor_id):
+    """Al empezar a seguir: las últimas recetas publicadas del autor, con su fecha"""
+    if es_popular(autor_id):
+        return
+    recientes = Receta.objects.publicadas().filter(autor_id=autor_id).order_by(
+        '-fecha_creacion'
+    ).values_list('pk', 'fecha_creacion')[:getattr(settings, 'FEED_RELLENO_AL_SEGUIR', 20)]
+    EntradaFeed.objects.bulk_create([
+        EntradaFeed(usuario_id=seguidor_id, receta_id=pk, autor_id=autor_id, fecha=fecha)
+        for pk, fecha in recientes
+    ], ignore_conflicts=True)
+
+
+def quitar_autor(seguidor_id, autor_id):
+    EntradaFeed.objects.filter(usuario_id=seguidor_id, autor_id=autor_id).delete()
+
+
+def cursor_feed(receta):
+    """``siguiente`` de una página: fecha en el feed e id de su última receta"""
+    return f"{receta.fecha_feed.isoformat().replace('+00:00', 'Z')},{receta.pk}"
+
+
+def parsear_cursor(texto):
+    """
+    (fecha, id) de un cursor de ``cursor_feed``, o None si no es válido. Se acepta
+    también solo la fecha (cursores anteriores): el id queda a None.
+    """
+    fecha, _, pk = texto.rpartition(',') if ',' in texto else (texto, '', '')
+    fecha = parse_datetime(fecha)
+    if fecha is None:
+        return None
+    try:
+        return fecha, uuid.UUID(pk) if pk else None
+    except ValueError:
+        return None
+
+
+def anteriores(campo, antes):
+    """Filas posteriores al cursor en el orden (-campo, -pk)"""
+    fecha, pk = antes
+    if pk is None:
+        return Q(**{f'{campo}__lt': fecha})
+    return Q(**{f'{campo}__lt': fecha}) | Q(**{campo: fecha, 'pk__lt': pk})
+
+
+def leer_feed(recetas, usuario, antes=None, limite=20):
+    """
+    Página del feed como lista de recetas con ``fecha_feed``, de más nueva a más
+    antigua (a igual fecha, por id), posteriores al cursor ``antes`` (fecha, id).
+    ``recetas`` es el queryset base (anotaciones y select_related de la vista). Una
+    consulta al timeline y otra a los autores populares seguidos.
+    """
+    # Un único JOIN a las entradas del lector: filtrar por usuario y por fecha en
+    # .filter() separados uniría todas las entradas de la receta (una por seguidor)
+    timeline = recetas.publicadas().annotate(
+        entrada=FilteredRelation('entradas_feed', condition=Q(entradas_feed__usuario=usuario))
+    ).filter(entrada__isnull=False).annotate(fecha_feed=F('entrada__fecha'))
+    populares = recetas.publicadas().filter(
+        autor__in=Seguimiento.objects.filter(
+            seguidor=usuario,
+            seguido__perfil_extendido__total_seguidores__gt=umbral_fanout()
+        ).values('seguido_id')
+    ).annotate(fecha_feed=F('fecha_creacion'))
+    if antes is not None:
+        timeline = timeline.filter(anteriores('fecha_feed', antes))
+        populares = populares.filter(anteriores('fecha_creacion', antes))
+    timeline = timeline.order_by('-fecha_feed', '-pk')[:limite]
+    populares = populares.order_by('-fecha_creacion', '-pk')[:limite]
+
+    # Un autor que pasó a ser popular puede estar en ambas
+    mezcla = {receta.pk: receta for receta in populares}
+    mezcla.update({receta.pk: receta for receta in timeline})
+    return sorted(mezcla.values(), key=lambda receta: (receta.fecha_feed, receta.pk), reverse=True)[:limite]
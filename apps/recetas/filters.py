@@ -3,6 +3,27 @@ from django.db.models import Q
 from .models import Receta
 
 
+# Columna de Receta y tipo de condición que genera cada filtro (para recomendar_indices):
+# igualdad y rango pueden usar un índice compuesto; texto_exacto (iexact) y
+# texto_parcial (icontains) aplican UPPER()/LIKE '%...%' y no pueden usar un B-tree
+COLUMNAS_FILTRO = {
+    'tiempo_max': ('tiempo_preparacion', 'rango'),
+    'tiempo_total_max': ('tiempo_total', 'rango'),
+    'dificultad': ('dificultad', 'igualdad'),
+    'porciones_min': ('porciones', 'rango'),
+    'porciones_max': ('porciones', 'rango'),
+    'ingredientes': (None, 'semijoin'),
+    'categoria': ('categoria', 'texto_exacto'),
+    'autor': ('autor', 'texto_parcial'),
+    'destacada': ('destacada', 'igualdad'),
+    'calorias_max': ('calorias_por_porcion', 'rango'),
+    'fecha_desde': ('fecha_creacion', 'rango'),
+    'fecha_hasta': ('fecha_creacion', 'rango'),
+    'titulo__icontains': ('titulo', 'texto_parcial'),
+    'descripcion__icontains': ('descripcion', 'texto_parcial'),
+}
+
+
 class RecetaFilter(django_filters.FilterSet):
     """
     Filtros avanzados para recetas
@@ -95,20 +116,11 @@ class RecetaFilter(django_filters.FilterSet):
     def filter_tiempo_total(self, queryset, name, value):
         """Filtrar por tiempo total (preparación + cocción)"""
         if value:
-            return queryset.extra(
-                where=["tiempo_preparacion + tiempo_coccion <= %s"],
-                params=[value]
-            )
+            return queryset.filter(tiempo_total__lte=value)
         return queryset
     
     def filter_por_ingredientes(self, queryset, name, value):
         """Filtrar recetas que contengan los ingredientes especificados"""
         if value:
-            ingredientes = [ing.strip() for ing in value.split(',')]
-            for ingrediente in ingredientes:
-                if ingrediente:
-                    queryset = queryset.filter(
-                        ingredientes_detalle__ingrediente__nombre__icontains=ingrediente
-                    )
-            return queryset.distinct()
+            return queryset.con_ingredientes(value.split(','))
         return queryset
@@ -0,0 +1,282 @@
+"""
+Generador de datos sintéticos para pruebas de carga y benchmarks.
+
+Crea usuarios, categorías, ingredientes y recetas con ``bulk_create`` en lotes,
+repartiendo autores, valoraciones, favoritos y vistas con una distribución de
+Zipf para reproducir la concentración de tráfico de producción (pocas recetas
+muy populares y una cola larga con poca actividad).
+"""
+import itertools
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .autocompletado import invalidar_indice
+from .cantidades import parsear_cantidad
+from .ingredientes import crear_alias_faltantes
+from .minhash import guardar_firmas, tokens_contenido
+from .models import (
+    Categoria, Ingrediente, Receta, RecetaIngrediente, Rating, Favorito
+)
+
+User = get_user_model()
+
+PREFIJO_USUARIO = 'sintetico_'
+
+CATEGORIAS_BASE = [
+    'Italiana', 'Mexicana', 'Vegana', 'Vegetariana', 'Española', 'Japonesa',
+    'China', 'India', 'Peruana', 'Francesa', 'Mediterránea', 'Postres',
+    'Panadería', 'Sopas', 'Ensaladas', 'Mariscos', 'Parrilla', 'Desayunos',
+]
+
+INGREDIENTES_BASE = [
+    ('Pollo', 'proteina'), ('Res', 'proteina'), ('Cerdo', 'proteina'),
+    ('Huevo', 'proteina'), ('Atún', 'proteina'), ('Salmón', 'proteina'),
+    ('Camarón', 'proteina'), ('Tofu', 'proteina'), ('Frijol', 'proteina'),
+    ('Lenteja', 'proteina'), ('Garbanzo', 'proteina'),
+    ('Tomate', 'verdura'), ('Cebolla', 'verdura'), ('Ajo', 'verdura'),
+    ('Zanahoria', 'verdura'), ('Papa', 'verdura'), ('Pimiento', 'verdura'),
+    ('Calabacín', 'verdura'), ('Espinaca', 'verdura'), ('Lechuga', 'verdura'),
+    ('Brócoli', 'verdura'), ('Champiñón', 'verdura'), ('Chile', 'verdura'),
+    ('Limón', 'fruta'), ('Manzana', 'fruta'), ('Plátano', 'fruta'),
+    ('Fresa', 'fruta'), ('Naranja', 'fruta'), ('Aguacate', 'fruta'),
+    ('Mango', 'fruta'), ('Arroz', 'cereal'), ('Pasta', 'cereal'),
+    ('Harina', 'cereal'), ('Avena', 'cereal'), ('Maíz', 'cereal'),
+    ('Pan', 'cereal'), ('Leche', 'lacteo'), ('Queso', 'lacteo'),
+    ('Mantequilla', 'lacteo'), ('Crema', 'lacteo'), ('Yogur', 'lacteo'),
+    ('Sal', 'condimento'), ('Pimienta', 'condimento'), ('Comino', 'condimento'),
+    ('Orégano', 'condimento'), ('Cilantro', 'condimento'), ('Perejil', 'condimento'),
+    ('Albahaca', 'condimento'), ('Canela', 'condimento'), ('Azúcar', 'otro'),
+    ('Aceite de oliva', 'otro'), ('Vinagre', 'otro'), ('Chocolate', 'otro'),
+]
+
+PLATOS = [
+    'Tacos', 'Ensalada', 'Sopa', 'Guiso', 'Tarta', 'Pasta', 'Arroz',
+    'Crema', 'Brochetas', 'Hamburguesa', 'Tortilla', 'Curry', 'Pastel',
+]
+
+ESTILOS = [
+    'de la abuela', 'al horno', 'a la parrilla', 'express', 'casero',
+    'tradicional', 'picante', 'ligero', 'gourmet', 'de temporada',
+]
+
+CANTIDADES = [
+    '1 taza', '2 tazas', '100g', '250g', '500g', '1 cucharada',
+    '2 cucharadas', '1 pizca', 'al gusto', '3 piezas', '1 litro',
+]
+
+DIFICULTADES = [valor for valor, _ in Receta._meta.get_field('dificultad').choices]
+
+
+@dataclass
+class ConfiguracionDataset:
+    """Parámetros del dataset sintético"""
+    usuarios: int = 200
+    categorias: int = 12
+    ingredientes: int = 150
+    recetas: int = 1000
+    ingredientes_por_receta: int = 8
+    ratings: int = 5000
+    favoritos: int = 5000
+    vistas: int = 200000
+    exponente_zipf: float = 1.1
+    semilla: int = 42
+    tamano_lote: int = 1000
+
+
+def pesos_zipf(n, exponente):
+    """Pesos acumulados de una distribución de Zipf sobre n elementos"""
+    return list(itertools.accumulate(1.0 / (rango ** exponente) for rango in range(1, n + 1)))
+
+
+def _nombres_unicos(base, total, sufijo):
+    """Extiende una lista base con nombres numerados hasta alcanzar el total"""
+    nombres = list(base[:total])
+    for indice in range(len(nombres), total):
+        nombres.append(f"{base[indice % len(base)]} {sufijo} {indice}")
+    return nombres
+
+
+def _pares_unicos(rng, total, usuarios, recetas, pesos):
+    """
+    Genera pares (usuario, receta) sin repetir, eligiendo recetas según Zipf.
+
+    El número de pares posibles limita el total para no iterar indefinidamente.
+    """
+    total = min(total, len(usuarios) * len(recetas))
+    pares = set()
+    intentos = 0
+    while len(pares) < total and intentos < total * 20:
+        faltan = total - len(pares)
+        elegidas = rng.choices(recetas, cum_weights=pesos, k=faltan)
+        for receta in elegidas:
+            pares.add((rng.choice(usuarios), receta))
+        intentos += faltan
+    return pares
+
+
+def limpiar_dataset():
+    """Elimina los datos generados previamente (usuarios sintéticos y sus recetas)"""
+    User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+    transaction.on_commit(invalidar_indice)
+
+
+@transaction.atomic
+def generar_dataset(config=None, stdout=None):
+    """
+    Crea un dataset sintético completo y devuelve un resumen con los totales.
+
+    Las categorías e ingredientes existentes se reutilizan; los usuarios se crean
+    con el prefijo ``PREFIJO_USUARIO`` para poder limpiarlos después.
+    """
+    config = config or ConfiguracionDataset()
+    rng = random.Random(config.semilla)
+    lote = config.tamano_lote
+
+    def log(mensaje):
+        if stdout is not None:
+            stdout.write(mensaje)
+
+    # Usuarios: el hash de contraseña se calcula una sola vez
+    password = make_password('quanticook')
+    inicio = User.objects.filter(username__startswith=PREFIJO_USUARIO).count()
+    User.objects.bulk_create([
+        User(
+            username=f"{PREFIJO_USUARIO}{inicio + i:06d}",
+            email=f"{PREFIJO_USUARIO}{inicio + i:06d}@example.com",
+            password=password,
+            nivel_experiencia=rng.choice(['principiante', 'intermedio', 'avanzado', 'chef']),
+        )
+        for i in range(config.usuarios)
+    ], batch_size=lote)
+    usuarios = list(
+        User.objects.filter(username__startswith=PREFIJO_USUARIO)
+        .order_by('username').values_list('pk', flat=True)
+    )
+    log(f"Usuarios: {len(usuarios)}")
+
+    # Categorías e ingredientes (ignorando los que ya existen)
+    Categoria.objects.bulk_create([
+        Categoria(nombre=nombre, slug=slugify(nombre), descripcion=f"Cocina {nombre.lower()}")
+        for nombre in _nombres_unicos(CATEGORIAS_BASE, config.categorias, 'estilo')
+    ], batch_size=lote, ignore_conflicts=True)
+    categorias = list(Categoria.objects.filter(activa=True).values_list('pk', flat=True))
+    log(f"Categorías: {len(categorias)}")
+
+    nombres_ingredientes = _nombres_unicos(
+        [nombre for nombre, _ in INGREDIENTES_BASE], config.ingredientes, 'variedad'
+    )
+    tipos = dict(INGREDIENTES_BASE)
+    Ingrediente.objects.bulk_create([
+        Ingrediente(
+            nombre=nombre,
+            categoria_ingrediente=tipos.get(nombre, INGREDIENTES_BASE[i % len(INGREDIENTES_BASE)][1]),
+        )
+        for i, nombre in enumerate(nombres_ingredientes)
+    ], batch_size=lote, ignore_conflicts=True)
+    crear_alias_faltantes()
+    ingredientes = list(Ingrediente.objects.order_by('pk').values_list('pk', flat=True))
+    log(f"Ingredientes: {len(ingredientes)}")
+
+    # Recetas: autores e ingredientes siguen Zipf (pocos autores prolíficos)
+    pesos_autores = pesos_zipf(len(usuarios), config.exponente_zipf)
+    autores = rng.choices(usuarios, cum_weights=pesos_autores, k=config.recetas)
+    ahora = timezone.now()
+    recetas = []
+    for autor in autores:
+        preparacion = rng.randint(5, 90)
+        recetas.append(Receta(
+            titulo=f"{rng.choice(PLATOS)} {rng.choice(ESTILOS)}",
+            descripcion="Receta generada para pruebas de rendimiento.",
+            instrucciones="\n".join(
+                f"{paso}. Paso de preparación {paso}." for paso in range(1, rng.randint(3, 9))
+            ),
+            autor_id=autor,
+            categoria_id=rng.choice(categorias) if categorias else None,
+            tiempo_preparacion=preparacion,
+            tiempo_coccion=rng.choice([0, 10, 15, 20, 30, 45, 60, 90]),
+            dificultad=rng.choice(DIFICULTADES),
+            porciones=rng.randint(1, 12),
+            calorias_por_porcion=rng.choice([None, rng.randint(80, 1200)]),
+            publicada=rng.random() < 0.9,
+            destacada=rng.random() < 0.03,
+        ))
+    Receta.objects.bulk_create(recetas, batch_size=lote)
+
+    # auto_now_add ignora el valor asignado en bulk_create; se reparte la fecha después
+    for receta in recetas:
+        receta.fecha_creacion = ahora - timedelta(minutes=rng.randint(0, 60 * 24 * 730))
+    Receta.objects.bulk_update(recetas, ['fecha_creacion'], batch_size=lote)
+    log(f"Recetas: {len(recetas)}")
+
+    # Ingredientes por receta
+    pesos_ingredientes = pesos_zipf(len(ingredientes), config.exponente_zipf)
+    detalle, contenidos = [], {}
+    for receta in recetas:
+        cantidad = max(1, int(rng.gauss(config.ingredientes_por_receta, 2)))
+        elegidos = set(rng.choices(ingredientes, cum_weights=pesos_ingredientes, k=cantidad))
+        contenidos[receta.pk] = tokens_contenido(receta.categoria_id, elegidos)
+        for ingrediente in elegidos:
+            texto = rng.choice(CANTIDADES)
+            # bulk_create no llama a save(): la cantidad se interpreta aquí
+            valor, unidad = parsear_cantidad(texto)
+            detalle.append(RecetaIngrediente(
+                receta_id=receta.pk,
+                ingrediente_id=ingrediente,
+                cantidad=texto,
+                cantidad_valor=valor,
+                unidad=unidad,
+                opcional=rng.random() < 0.1,
+            ))
+    RecetaIngrediente.objects.bulk_create(detalle, batch_size=lote)
+    log(f"Ingredientes de recetas: {len(detalle)}")
+    # Firmas MinHash desde los conjuntos ya en memoria, sin releer los ingredientes
+    for inicio in range(0, len(recetas), lote):
+        guardar_firmas({receta.pk: contenidos[receta.pk] for receta in recetas[inicio:inicio + lote]})
+
+    # Popularidad: la receta i-ésima (en orden aleatorio) recibe peso 1/i^s
+    populares = [receta.pk for receta in recetas]
+    rng.shuffle(populares)
+    pesos_recetas = pesos_zipf(len(populares), config.exponente_zipf)
+
+    ratings = [
+        Rating(usuario_id=usuario, receta_id=receta, puntuacion=rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 6, 5])[0])
+        for usuario, receta in _pares_unicos(rng, config.ratings, usuarios, populares, pesos_recetas)
+    ]
+    Rating.objects.bulk_create(ratings, batch_size=lote, ignore_conflicts=True)
+    log(f"Valoraciones: {len(ratings)}")
+
+    favoritos = [
+        Favorito(usuario_id=usuario, receta_id=receta)
+        for usuario, receta in _pares_unicos(rng, config.favoritos, usuarios, populares, pesos_recetas)
+    ]
+    Favorito.objects.bulk_create(favoritos, batch_size=lote, ignore_conflicts=True)
+    log(f"Favoritos: {len(favoritos)}")
+
+    por_receta = {receta.pk: receta for receta in recetas}
+    for pk in rng.choices(populares, cum_weights=pesos_recetas, k=config.vistas) if populares else []:
+        por_receta[pk].vistas += 1
+    # Pares únicos de usuarios y recetas nuevos: todos se insertaron
+    for favorito in favoritos:
+        por_receta[favorito.receta_id].total_favoritos += 1
+    Receta.objects.bulk_update(recetas, ['vistas', 'total_favoritos'], batch_size=lote)
+
+    # bulk_create no envía señales: los índices en memoria se reconstruyen
+    transaction.on_commit(invalidar_indice)
+
+    return {
+        'usuarios': len(usuarios),
+        'categorias': len(categorias),
+        'ingredientes': len(ingredientes),
+        'recetas': len(recetas),
+        'ingredientes_receta': len(detalle),
+        'ratings': len(ratings),
+        'favoritos': len(favoritos),
+        'vistas': config.vistas,
+    }
@@ -0,0 +1,73 @@
+"""
+Mantenimiento del catálogo de ingredientes: alias normalizados y fusión de duplicados.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Subquery
+
+from .autocompletado import registrar_cambio
+from .minhash import actualizar_firmas
+from .models import AliasIngrediente, Ingrediente, RecetaIngrediente
+from .normalizacion import clave_ingrediente
+
+
+def crear_alias_faltantes(ingredientes=None):
+    """
+    Crea el alias del propio nombre de cada ingrediente (cargas con bulk_create, que
+    no envían señales). Si la clave ya pertenece a otro ingrediente se deja como está:
+    es un duplicado para ``fusionar_ingredientes``.
+    """
+    if ingredientes is None:
+        ingredientes = Ingrediente.objects.only('pk', 'nombre')
+    alias = [
+        AliasIngrediente(clave=clave_ingrediente(ingrediente.nombre), nombre=ingrediente.nombre, ingrediente=ingrediente)
+        for ingrediente in ingredientes
+    ]
+    AliasIngrediente.objects.bulk_create(alias, batch_size=1000, ignore_conflicts=True)
+
+
+def grupos_duplicados():
+    """
+    Ingredientes cuyos nombres comparten clave normalizada, como listas con el
+    canónico primero (el más usado en recetas y, a igualdad, el más antiguo)
+    """
+    grupos = defaultdict(list)
+    ingredientes = Ingrediente.objects.annotate(uso=Count('recetas_uso')).order_by('-uso', 'pk')
+    for ingrediente in ingredientes:
+        grupos[clave_ingrediente(ingrediente.nombre)].append(ingrediente)
+    return [grupo for grupo in grupos.values() if len(grupo) > 1]
+
+
+@transaction.atomic
+def fusionar_ingredientes(canonico, duplicados):
+    """
+    Fusiona ``duplicados`` en ``canonico``: mueve sus RecetaIngrediente y alias con
+    UPDATE masivos y borra los duplicados. Si una receta ya usaba el canónico se
+    conserva esa fila (y su cantidad) y se descarta la del duplicado.
+    Devuelve el número de filas de RecetaIngrediente movidas.
+    """
+    movidas = 0
+    for duplicado in duplicados:
+        if duplicado.pk == canonico.pk:
+            continue
+        # Se materializan solo los pks en conflicto: MySQL no admite subconsultas
+        # sobre la misma tabla en un DELETE
+        conflictos = list(RecetaIngrediente.objects.filter(
+            ingrediente=duplicado,
+            receta__in=Subquery(
+                RecetaIngrediente.objects.filter(ingrediente=canonico).values('receta')
+            )
+        ).values_list('pk', flat=True))
+        RecetaIngrediente.objects.filter(pk__in=conflictos).delete()
+        movidas += RecetaIngrediente.objects.filter(ingrediente=duplicado).update(ingrediente=canonico)
+        # Los nombres del duplicado siguen resolviendo al canónico
+        AliasIngrediente.objects.filter(ingrediente=duplicado).update(ingrediente=canonico)
+        duplicado.delete()
+
+    # Las recetas de los duplicados usan ahora el canónico: cambia su contenido
+    if movidas:
+        actualizar_firmas(RecetaIngrediente.objects.filter(ingrediente=canonico).values_list('receta_id', flat=True))
+    pk = canonico.pk
+    transaction.on_commit(lambda: registrar_cambio(pk))
+    return movidas
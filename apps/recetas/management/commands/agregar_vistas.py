@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from apps.recetas.registro_vistas import agregar_vistas, podar_eventos
+
+
+class Command(BaseCommand):
+    help = (
+        "Suma las vistas registradas desde la pasada anterior a VistasHora y VistasDia "
+        "y borra los eventos ya sumados más antiguos que la retención"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=10000,
+            help="Eventos (rango de ids) por transacción"
+        )
+        parser.add_argument(
+            '--retencion-dias', type=int, default=None,
+            help="Días que se conservan los eventos ya sumados (VISTAS_RETENCION_DIAS)"
+        )
+
+    def handle(self, *args, **options):
+        sumados = agregar_vistas(options['lote'])
+        borrados = podar_eventos(options['retencion_dias'], options['lote'])
+        self.stdout.write(self.style.SUCCESS(f"{sumados} vistas sumadas, {borrados} eventos borrados"))
@@ -0,0 +1,71 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+
+from apps.core.benchmark import comparar_resultados, guardar_resultados, medir, rutas_get
+from apps.recetas.api_urls import router
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Mide latencia p50/p95 y número de consultas de cada endpoint GET de la API de recetas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', default='benchmark_api.json', help="Archivo JSON de resultados")
+        parser.add_argument('--comparar', help="Archivo JSON base contra el que comparar")
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--usuario', help="Usuario autenticado (por defecto el primero activo)")
+        parser.add_argument('--anonimo', action='store_true', help="Ejecutar sin autenticación")
+        parser.add_argument(
+            '--parametros', default='ingredientes=pollo,ajo',
+            help="Query string añadida a buscar-por-ingredientes"
+        )
+        parser.add_argument(
+            '--excluir', nargs='*', default=[],
+            help="Nombres de endpoint a omitir (p. ej. recetas-mejor-valoradas)"
+        )
+
+    def handle(self, *args, **options):
+        cliente = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        if not options['anonimo']:
+            usuarios = User.objects.filter(is_active=True)
+            if options['usuario']:
+                usuarios = usuarios.filter(username=options['usuario'])
+            usuario = usuarios.order_by('pk').first()
+            if usuario is None:
+                raise CommandError("No hay usuarios; ejecuta primero generar_datos")
+            cliente.force_login(usuario)
+
+        resultados = {}
+        # Las vistas de detalle escriben (vistas); todo se revierte al terminar
+        with transaction.atomic():
+            for nombre, url in rutas_get(router, cliente):
+                if nombre in options['excluir']:
+                    continue
+                if nombre.endswith('buscar-por-ingredientes'):
+                    url = f"{url}?{options['parametros']}"
+                resultados[nombre] = dict(
+                    url=url,
+                    **medir(lambda: cliente.get(url), repeticiones=options['repeticiones'])
+                )
+                medidas = resultados[nombre]
+                self.stdout.write(
+                    f"{nombre:40} {medidas['status']} "
+                    f"p50={medidas['p50_ms']:8.2f}ms p95={medidas['p95_ms']:8.2f}ms "
+                    f"consultas={medidas['consultas']}"
+                )
+            transaction.set_rollback(True)
+
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
+
+        if options['comparar']:
+            with open(options['comparar'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+            for endpoint, campo, antes, despues, delta in comparar_resultados(base, resultados):
+                estilo = self.style.ERROR if delta > 10 else self.style.SUCCESS
+                self.stdout.write(estilo(f"{endpoint:40} {campo:10} {antes} -> {despues} ({delta:+}%)"))
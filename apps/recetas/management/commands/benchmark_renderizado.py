@@ -0,0 +1,75 @@
+import json
+import zlib
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from apps.core.benchmark import guardar_resultados, medir
+from apps.core.middleware import brotli
+from apps.core.renderers import JSONRapidoRenderer, MessagePackRenderer, msgpack, orjson
+from apps.recetas.serializers import RecetaDetailSerializer
+from apps.recetas.views import RecetaViewSet
+
+
+class Command(BaseCommand):
+    help = (
+        "Tiempo de serializar, renderizar (JSON de DRF, orjson y MessagePack) y parsear "
+        "páginas de RecetaDetailSerializer, y bytes enviados sin comprimir y comprimidos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamano', type=int, default=20, help="Recetas por página")
+        parser.add_argument('--repeticiones', type=int, default=50)
+        parser.add_argument('--salida', default='benchmark_renderizado.json')
+
+    def handle(self, *args, **options):
+        request = Request(RequestFactory().get('/api/v1/recetas/'))
+        vista = RecetaViewSet(action='retrieve', request=request, format_kwarg=None)
+        # Las consultas se hacen una vez: se mide solo serializar y renderizar
+        recetas = list(vista.get_queryset().order_by('-fecha_creacion')[:options['tamano']])
+        if not recetas:
+            raise CommandError("No hay recetas; ejecuta primero generar_datos")
+
+        def serializar():
+            return RecetaDetailSerializer(recetas, many=True, context={'request': request}).data
+
+        datos = serializar()
+        repeticiones = options['repeticiones']
+        resultados = {
+            'serializar': medir(serializar, repeticiones=repeticiones),
+            'render_drf': medir(lambda: JSONRenderer().render(datos), repeticiones=repeticiones),
+        }
+        if orjson is not None:
+            resultados['render_orjson'] = medir(lambda: JSONRapidoRenderer().render(datos), repeticiones=repeticiones)
+
+        contenido = JSONRapidoRenderer().render(datos)
+        # Lo que hace el cliente al recibir la página
+        resultados['parsear_json'] = medir(lambda: json.loads(contenido), repeticiones=repeticiones)
+        bytes_enviados = {
+            'sin_comprimir': len(contenido),
+            'gzip': len(compress_string(contenido)),
+            'gzip_9': len(zlib.compress(contenido, 9)),
+        }
+        if brotli is not None:
+            bytes_enviados['brotli_4'] = len(brotli.compress(contenido, quality=4))
+            bytes_enviados['brotli_11'] = len(brotli.compress(contenido, quality=11))
+        if msgpack is not None:
+            resultados['render_msgpack'] = medir(lambda: MessagePackRenderer().render(datos), repeticiones=repeticiones)
+            binario = MessagePackRenderer().render(datos)
+            resultados['parsear_msgpack'] = medir(
+                lambda: msgpack.unpackb(binario, timestamp=3), repeticiones=repeticiones
+            )
+            bytes_enviados['msgpack'] = len(binario)
+            bytes_enviados['msgpack_gzip'] = len(compress_string(binario))
+        resultados['bytes'] = dict(recetas=len(recetas), **bytes_enviados)
+
+        for nombre, medidas in resultados.items():
+            if nombre != 'bytes':
+                self.stdout.write(f"{nombre:15} p50={medidas['p50_ms']:8.3f}ms p95={medidas['p95_ms']:8.3f}ms")
+        for nombre, tamano in bytes_enviados.items():
+            self.stdout.write(f"{nombre:15} {tamano:10} bytes ({tamano / len(contenido):.0%})")
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
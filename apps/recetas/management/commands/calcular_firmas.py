@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.recetas.minhash import recalcular_firmas
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula las firmas MinHash y bandas LSH del contenido de todas las recetas "
+        "(similares por ingredientes y detección de duplicados)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help="Recetas por lote y transacción")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        recetas = recalcular_firmas(lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Firmas de {recetas} recetas en {time.perf_counter() - inicio:.1f}s"
+        ))
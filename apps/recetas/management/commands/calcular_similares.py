@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.recetas.recomendaciones import calcular_similares
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula las recetas similares (filtrado colaborativo ítem a ítem sobre "
+        "favoritos y valoraciones) que sirven /similares/ y /recomendadas/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=20, help="Vecinos guardados por receta")
+        parser.add_argument('--lote', type=int, default=500, help="Recetas por lote y transacción")
+        parser.add_argument(
+            '--min-comunes', type=int, default=2,
+            help="Usuarios en común mínimos para considerar dos recetas similares"
+        )
+        parser.add_argument(
+            '--max-por-usuario', type=int, default=1000,
+            help="Se ignoran los usuarios con más recetas marcadas que esto"
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        recetas, filas = calcular_similares(
+            k=options['k'],
+            lote=options['lote'],
+            min_comunes=options['min_comunes'],
+            max_por_usuario=options['max_por_usuario'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{filas} vecinos de {recetas} recetas en {time.perf_counter() - inicio:.1f}s"
+        ))
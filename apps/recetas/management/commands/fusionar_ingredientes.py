@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.recetas.ingredientes import crear_alias_faltantes, fusionar_ingredientes, grupos_duplicados
+from apps.recetas.models import AliasIngrediente, Ingrediente
+from apps.recetas.normalizacion import clave_ingrediente
+
+
+class Command(BaseCommand):
+    help = (
+        "Detecta ingredientes duplicados (misma clave normalizada) y los fusiona en "
+        "uno canónico, moviendo sus usos en recetas y sus alias"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--aplicar', action='store_true',
+            help="Fusionar los duplicados detectados (por defecto solo se listan)"
+        )
+        parser.add_argument('--canonico', type=int, help="Id del ingrediente canónico")
+        parser.add_argument(
+            '--duplicados', type=int, nargs='*', default=[],
+            help="Ids a fusionar en --canonico (p. ej. Jitomate en Tomate)"
+        )
+        parser.add_argument(
+            '--alias', nargs='*', default=[],
+            help="Sinónimos que deben resolver a --canonico"
+        )
+
+    def handle(self, *args, **options):
+        crear_alias_faltantes()
+
+        if options['canonico'] is not None:
+            self.fusion_manual(options)
+            return
+
+        grupos = grupos_duplicados()
+        if not grupos:
+            self.stdout.write("No hay ingredientes duplicados")
+            return
+        movidas = 0
+        for canonico, *duplicados in grupos:
+            nombres = ', '.join(f"{ingrediente.nombre} ({ingrediente.uso})" for ingrediente in duplicados)
+            self.stdout.write(f"{canonico.nombre} ({canonico.uso}) <- {nombres}")
+            if options['aplicar']:
+                movidas += fusionar_ingredientes(canonico, duplicados)
+
+        if options['aplicar']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{len(grupos)} grupos fusionados, {movidas} usos en recetas movidos"
+            ))
+        else:
+            self.stdout.write("Ejecuta con --aplicar para fusionarlos")
+
+    def fusion_manual(self, options):
+        try:
+            canonico = Ingrediente.objects.get(pk=options['canonico'])
+        except Ingrediente.DoesNotExist:
+            raise CommandError(f"No existe el ingrediente {options['canonico']}")
+
+        duplicados = list(Ingrediente.objects.filter(pk__in=options['duplicados']).exclude(pk=canonico.pk))
+        if len(duplicados) != len(set(options['duplicados']) - {canonico.pk}):
+            raise CommandError("Alguno de los ids de --duplicados no existe")
+        movidas = fusionar_ingredientes(canonico, duplicados)
+
+        for nombre in options['alias']:
+            AliasIngrediente.objects.update_or_create(
+                clave=clave_ingrediente(nombre),
+                defaults={'nombre': nombre, 'ingrediente': canonico}
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(duplicados)} ingredientes fusionados en {canonico.nombre}, "
+            f"{movidas} usos en recetas movidos, {len(options['alias'])} alias"
+        ))
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.recetas.generador import ConfiguracionDataset, generar_dataset, limpiar_dataset
+
+
+class Command(BaseCommand):
+    help = "Genera un dataset sintético (usuarios, recetas, valoraciones, favoritos y vistas)"
+
+    def add_arguments(self, parser):
+        defaults = ConfiguracionDataset()
+        parser.add_argument('--usuarios', type=int, default=defaults.usuarios)
+        parser.add_argument('--categorias', type=int, default=defaults.categorias)
+        parser.add_argument('--ingredientes', type=int, default=defaults.ingredientes)
+        parser.add_argument('--recetas', type=int, default=defaults.recetas)
+        parser.add_argument('--ingredientes-por-receta', type=int, default=defaults.ingredientes_por_receta)
+        parser.add_argument('--ratings', type=int, default=defaults.ratings)
+        parser.add_argument('--favoritos', type=int, default=defaults.favoritos)
+        parser.add_argument('--vistas', type=int, default=defaults.vistas)
+        parser.add_argument(
+            '--zipf', type=float, default=defaults.exponente_zipf,
+            help="Exponente de la distribución de Zipf para popularidad y autores"
+        )
+        parser.add_argument('--semilla', type=int, default=defaults.semilla)
+        parser.add_argument('--lote', type=int, default=defaults.tamano_lote)
+        parser.add_argument(
+            '--limpiar', action='store_true',
+            help="Eliminar antes los usuarios sintéticos y todo su contenido"
+        )
+
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            limpiar_dataset()
+            self.stdout.write("Dataset sintético anterior eliminado")
+
+        config = ConfiguracionDataset(
+            usuarios=options['usuarios'],
+            categorias=options['categorias'],
+            ingredientes=options['ingredientes'],
+            recetas=options['recetas'],
+            ingredientes_por_receta=options['ingredientes_por_receta'],
+            ratings=options['ratings'],
+            favoritos=options['favoritos'],
+            vistas=options['vistas'],
+            exponente_zipf=options['zipf'],
+            semilla=options['semilla'],
+            tamano_lote=options['lote'],
+        )
+
+        inicio = time.perf_counter()
+        resumen = generar_dataset(config, stdout=self.stdout)
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Dataset generado en {duracion:.1f}s: "
+            + ", ".join(f"{clave}={valor}" for clave, valor in resumen.items())
+        ))
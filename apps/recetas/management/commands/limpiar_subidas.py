@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from apps.recetas.subidas import limpiar_subidas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las subidas de imágenes por bloques abandonadas (sin terminar o sin "
+        "adjuntar a una receta) y sus archivos temporales"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horas', type=int, default=None,
+            help="Horas sin actividad tras las que se borra una subida (SUBIDA_CADUCIDAD_HORAS)"
+        )
+
+    def handle(self, *args, **options):
+        borradas = limpiar_subidas(options['horas'])
+        self.stdout.write(self.style.SUCCESS(f"{borradas} subidas borradas"))
@@ -0,0 +1,170 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import QueryDict
+
+from apps.core.benchmark import guardar_resultados
+from apps.recetas.async_views import buscar
+from apps.recetas.filters import COLUMNAS_FILTRO, RecetaFilter
+from apps.recetas.models import Receta, UsoFiltro
+from apps.recetas.views import RecetaViewSet
+
+# Campos de orden que son columnas de Receta (rating_promedio es una anotación)
+COLUMNAS_ORDEN = {
+    campo for campo in RecetaViewSet.ordering_fields
+    if campo in {field.name for field in Receta._meta.concrete_fields}
+}
+
+NOTAS_TEXTO = {
+    'texto_exacto': (
+        "{filtro}: iexact aplica UPPER() y no usa el índice; los slugs ya se guardan en "
+        "minúsculas, así que basta con filtrar con exact sobre el valor en minúsculas "
+        "(o un índice funcional Lower())"
+    ),
+    'texto_parcial': (
+        "{filtro}: icontains ('%...%') no puede usar un B-tree; usar una columna "
+        "normalizada (Lower) con istartswith o un índice FULLTEXT"
+    ),
+    'semijoin': (
+        "{filtro}: semijoin sobre RecetaIngrediente resuelto por AliasIngrediente.clave; "
+        "los términos sin alias caen a icontains (revisa fusionar_ingredientes)"
+    ),
+}
+
+
+def recorre_tabla(plan, tabla):
+    """True si el plan recorre la tabla completa en lugar de usar un índice"""
+    if connection.vendor == 'sqlite':
+        return any(
+            re.search(rf'\bSCAN {tabla}\b', linea) and 'INDEX' not in linea
+            for linea in plan.splitlines()
+        )
+    if connection.vendor == 'mysql':
+        return bool(re.search(r'\bALL\b', plan))
+    return False
+
+
+def ordena_en_memoria(plan):
+    """True si el orden no sale del índice (TEMP B-TREE en SQLite, filesort en MySQL)"""
+    return 'TEMP B-TREE FOR ORDER BY' in plan or 'filesort' in plan
+
+
+def indices_usados(plan):
+    return [indice.name for indice in Receta._meta.indexes if indice.name in plan]
+
+
+def proponer_indice(filtros, ordenacion):
+    """
+    Índice compuesto para una combinación: publicada y columnas de igualdad (en
+    cualquier orden) y al final una sola columna de rango u orden, porque un B-tree
+    no sirve dos rangos a la vez. Devuelve (igualdad, columna_final, notas).
+    """
+    igualdad, rango, notas = ['publicada'], None, []
+    for filtro in filtros:
+        # search: icontains sobre título, descripción e instrucciones
+        columna, tipo = COLUMNAS_FILTRO.get(filtro, (None, 'texto_parcial'))
+        if tipo == 'igualdad' or (tipo == 'texto_exacto' and columna):
+            if columna not in igualdad:
+                igualdad.append(columna)
+        elif tipo == 'rango':
+            rango = rango or columna
+        if tipo in NOTAS_TEXTO:
+            notas.append(NOTAS_TEXTO[tipo].format(filtro=filtro))
+
+    orden = (ordenacion or ','.join(RecetaViewSet.ordering)).split(',')[0]
+    if orden.lstrip('-') in COLUMNAS_ORDEN and rango in (None, orden.lstrip('-')):
+        return igualdad, orden, notas
+    return igualdad, rango, notas
+
+
+def indice_existente(igualdad, final):
+    """Nombre del índice de Receta que ya sirve la combinación, si existe"""
+    for indice in Receta._meta.indexes:
+        campos = list(indice.fields)
+        if set(campos[:len(igualdad)]) != set(igualdad):
+            continue
+        if final is None or campos[len(igualdad):len(igualdad) + 1] == [final]:
+            return indice.name
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Analiza las combinaciones de filtros más usadas en el listado de recetas, "
+        "comprueba con EXPLAIN si las sirve un índice y propone índices compuestos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--min-usos', type=int, default=1)
+        parser.add_argument(
+            '--orden', choices=['usos', 'latencia'], default='usos',
+            help="Priorizar por número de usos o por latencia acumulada"
+        )
+        parser.add_argument('--salida', help="Archivo JSON con el informe")
+
+    def explicar(self, uso):
+        """EXPLAIN de la consulta del listado (anónimo) con el ejemplo registrado"""
+        params = QueryDict(uso.ejemplo)
+        queryset = Receta.objects.select_related(
+            'autor', 'categoria'
+        ).con_estadisticas().visibles_para(None)
+        queryset = RecetaFilter(params, queryset=queryset).qs
+        if params.get('search'):
+            queryset = buscar(queryset, RecetaViewSet.search_fields, params['search'])
+        ordering = [
+            campo for campo in uso.ordenacion.split(',')
+            if campo.lstrip('-') in RecetaViewSet.ordering_fields
+        ]
+        queryset = queryset.order_by(*(ordering or RecetaViewSet.ordering))
+        return queryset[:settings.REST_FRAMEWORK['PAGE_SIZE']].explain()
+
+    def handle(self, *args, **options):
+        orden = '-usos' if options['orden'] == 'usos' else '-latencia_total_ms'
+        usos = UsoFiltro.objects.filter(usos__gte=options['min_usos']).order_by(orden)[:options['top']]
+
+        informe = {}
+        for uso in usos:
+            filtros = uso.filtros.split(',') if uso.filtros else []
+            plan = self.explicar(uso)
+            recorrido = recorre_tabla(plan, Receta._meta.db_table)
+            igualdad, final, notas = proponer_indice(filtros, uso.ordenacion)
+            existente = indice_existente(igualdad, final)
+            campos = igualdad + ([final] if final else [])
+
+            entrada = {
+                'filtros': filtros,
+                'ordenacion': uso.ordenacion,
+                'usos': uso.usos,
+                'latencia_media_ms': round(uso.latencia_media_ms, 3),
+                'latencia_max_ms': round(uso.latencia_max_ms, 3),
+                'indices_usados': indices_usados(plan),
+                'recorrido_completo': recorrido,
+                'ordena_en_memoria': ordena_en_memoria(plan),
+                'indice_cubre': existente,
+                'notas': notas,
+            }
+            # Usar solo el prefijo publicada de otro índice equivale casi a recorrer la tabla
+            if not existente and len(campos) > 1:
+                entrada['propuesta'] = f"models.Index(fields={campos!r})"
+            informe[uso.firma or '(sin filtros)'] = entrada
+
+            estado = 'RECORRIDO COMPLETO' if recorrido else ', '.join(entrada['indices_usados']) or 'índice'
+            if entrada['ordena_en_memoria']:
+                estado += ' + orden en memoria'
+            self.stdout.write(
+                f"{uso.firma or '(sin filtros)':55} usos={uso.usos:<7} "
+                f"media={entrada['latencia_media_ms']:8.2f}ms  {estado}"
+            )
+            if 'propuesta' in entrada:
+                self.stdout.write(self.style.WARNING(f"    propuesta: {entrada['propuesta']}"))
+            for nota in notas:
+                self.stdout.write(f"    nota: {nota}")
+
+        if not informe:
+            self.stdout.write("No hay uso de filtros registrado todavía")
+        if options['salida']:
+            guardar_resultados(options['salida'], informe)
+            self.stdout.write(self.style.SUCCESS(f"Informe guardado en {options['salida']}"))
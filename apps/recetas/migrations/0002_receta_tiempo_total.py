@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:26
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receta',
+            name='tiempo_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('tiempo_preparacion'), '+', models.F('tiempo_coccion')), help_text='Tiempo total de preparación + cocción en minutos', output_field=models.PositiveIntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='receta',
+            index=models.Index(fields=['publicada', 'tiempo_total'], name='recetas_rec_publica_565ff6_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0002_receta_tiempo_total'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoFiltro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('firma', models.CharField(max_length=255, unique=True)),
+                ('filtros', models.CharField(blank=True, max_length=255)),
+                ('ordenacion', models.CharField(blank=True, max_length=100)),
+                ('ejemplo', models.CharField(blank=True, help_text='Última query string observada con esta combinación', max_length=500)),
+                ('usos', models.PositiveBigIntegerField(default=0)),
+                ('latencia_total_ms', models.FloatField(default=0)),
+                ('latencia_max_ms', models.FloatField(default=0)),
+                ('ultima_vez', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Uso de filtros',
+                'verbose_name_plural': 'Uso de filtros',
+                'ordering': ['-usos'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.recetas.normalizacion import clave_ingrediente
+
+
+def crear_alias(apps, schema_editor):
+    """Alias del nombre de cada ingrediente existente; con claves repetidas gana el más antiguo"""
+    Ingrediente = apps.get_model('recetas', 'Ingrediente')
+    AliasIngrediente = apps.get_model('recetas', 'AliasIngrediente')
+    AliasIngrediente.objects.bulk_create([
+        AliasIngrediente(clave=clave_ingrediente(nombre), nombre=nombre, ingrediente_id=pk)
+        for pk, nombre in Ingrediente.objects.order_by('pk').values_list('pk', 'nombre')
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0003_usofiltro'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AliasIngrediente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('nombre', models.CharField(help_text='Texto original del alias', max_length=100)),
+                ('ingrediente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alias', to='recetas.ingrediente')),
+            ],
+            options={
+                'verbose_name': 'Alias de ingrediente',
+                'verbose_name_plural': 'Alias de ingredientes',
+                'ordering': ['clave'],
+            },
+        ),
+        migrations.RunPython(crear_alias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:35
+
+from django.db import migrations, models
+
+from apps.recetas.cantidades import parsear_cantidad
+
+
+def interpretar_cantidades(apps, schema_editor):
+    """Rellena cantidad_valor y unidad de las filas existentes, por lotes"""
+    RecetaIngrediente = apps.get_model('recetas', 'RecetaIngrediente')
+    lote = []
+    for fila in RecetaIngrediente.objects.only('pk', 'cantidad').iterator(chunk_size=2000):
+        fila.cantidad_valor, fila.unidad = parsear_cantidad(fila.cantidad)
+        lote.append(fila)
+        if len(lote) >= 2000:
+            RecetaIngrediente.objects.bulk_update(lote, ['cantidad_valor', 'unidad'])
+            lote = []
+    RecetaIngrediente.objects.bulk_update(lote, ['cantidad_valor', 'unidad'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0004_aliasingrediente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recetaingrediente',
+            name='cantidad_valor',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, help_text='Cantidad en la unidad base (g, ml, unidad...); vacío si no es numérica', max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='recetaingrediente',
+            name='unidad',
+            field=models.CharField(blank=True, editable=False, help_text='Unidad base normalizada de cantidad_valor', max_length=30),
+        ),
+        migrations.RunPython(interpretar_cantidades, migrations.RunPython.noop),
+    ]
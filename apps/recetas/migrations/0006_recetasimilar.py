@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0005_cantidad_estructurada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecetaSimilar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntuacion', models.FloatField(help_text='Similitud coseno entre 0 y 1')),
+                ('usuarios_comunes', models.PositiveIntegerField(default=0)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similares', to='recetas.receta')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_de', to='recetas.receta')),
+            ],
+            options={
+                'verbose_name': 'Receta similar',
+                'verbose_name_plural': 'Recetas similares',
+                'ordering': ['receta', '-puntuacion'],
+                'indexes': [models.Index(fields=['receta', '-puntuacion'], name='recetas_rec_receta__83676f_idx')],
+                'unique_together': {('receta', 'similar')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0006_recetasimilar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FirmaMinHash',
+            fields=[
+                ('receta', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='firma_minhash', serialize=False, to='recetas.receta')),
+                ('firma', models.BinaryField()),
+            ],
+            options={
+                'verbose_name': 'Firma MinHash',
+                'verbose_name_plural': 'Firmas MinHash',
+            },
+        ),
+        migrations.CreateModel(
+            name='BandaMinHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.BigIntegerField(db_index=True)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bandas_minhash', to='recetas.receta')),
+            ],
+            options={
+                'verbose_name': 'Banda MinHash',
+                'verbose_name_plural': 'Bandas MinHash',
+            },
+        ),
+    ]
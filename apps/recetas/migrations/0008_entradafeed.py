@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0007_firmas_minhash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntradaFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(help_text='Momento de la publicación')),
+                ('autor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entradas_feed', to='recetas.receta')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Entrada de feed',
+                'verbose_name_plural': 'Entradas de feed',
+                'indexes': [models.Index(fields=['usuario', '-fecha'], name='recetas_ent_usuario_1630d5_idx'), models.Index(fields=['usuario', 'autor'], name='recetas_ent_usuario_2dd5f9_idx')],
+                'unique_together': {('usuario', 'receta')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:47
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def contar_favoritos(apps, schema_editor):
+    """Rellena total_favoritos con un recuento agrupado, por lotes"""
+    Receta = apps.get_model('recetas', 'Receta')
+    Favorito = apps.get_model('recetas', 'Favorito')
+    totales = Favorito.objects.order_by().values_list('receta_id').annotate(total=Count('pk'))
+    lote = []
+    for receta_id, total in totales.iterator(chunk_size=2000):
+        lote.append(Receta(pk=receta_id, total_favoritos=total))
+        if len(lote) >= 2000:
+            Receta.objects.bulk_update(lote, ['total_favoritos'])
+            lote = []
+    Receta.objects.bulk_update(lote, ['total_favoritos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0008_entradafeed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receta',
+            name='total_favoritos',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Lo mantiene favoritos.py al escribir, sin COUNT al leer'),
+        ),
+        migrations.RunPython(contar_favoritos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0009_total_favoritos'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='imagenreceta',
+            name='imagen',
+            field=models.ImageField(db_index=True, help_text='Imagen adicional de la receta', upload_to='recetas/galeria/'),
+        ),
+        migrations.AlterField(
+            model_name='receta',
+            name='imagen_principal',
+            field=models.ImageField(blank=True, db_index=True, help_text='Imagen principal de la receta', null=True, upload_to='recetas/principales/'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:11
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0010_indices_imagenes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubidaImagen',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nombre', models.CharField(blank=True, help_text='Nombre original del archivo', max_length=255)),
+                ('tamano', models.PositiveBigIntegerField(help_text='Bytes de la imagen completa')),
+                ('recibidos', models.PositiveBigIntegerField(default=0)),
+                ('tipo', models.CharField(blank=True, max_length=20)),
+                ('ancho', models.PositiveIntegerField(blank=True, null=True)),
+                ('alto', models.PositiveIntegerField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subidas_imagen', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Subida de imagen',
+                'verbose_name_plural': 'Subidas de imágenes',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['usuario', '-fecha_creacion'], name='recetas_sub_usuario_e09c9d_idx'), models.Index(fields=['fecha_actualizacion'], name='recetas_sub_fecha_a_31e88a_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:15
+
+import apps.core.archivos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0011_subidas_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidaimagen',
+            name='sha256',
+            field=models.CharField(blank=True, help_text='Resumen al completarse', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='categoria',
+            name='imagen',
+            field=apps.core.archivos.ImagenCompartida(blank=True, null=True, upload_to='categorias/'),
+        ),
+        migrations.AlterField(
+            model_name='imagenreceta',
+            name='imagen',
+            field=apps.core.archivos.ImagenCompartida(db_index=True, help_text='Imagen adicional de la receta', upload_to='recetas/galeria/'),
+        ),
+        migrations.AlterField(
+            model_name='receta',
+            name='imagen_principal',
+            field=apps.core.archivos.ImagenCompartida(blank=True, db_index=True, help_text='Imagen principal de la receta', lado_maximo=800, null=True, upload_to='recetas/principales/'),
+        ),
+    ]
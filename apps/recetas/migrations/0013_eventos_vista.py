@@ -0,0 +1,74 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0012_imagenes_compartidas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoAgregado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('ultimo_id', models.PositiveBigIntegerField(default=0)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Progreso de agregado',
+                'verbose_name_plural': 'Progreso de agregados',
+            },
+        ),
+        migrations.CreateModel(
+            name='EventoVista',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('origen', models.CharField(choices=[('directo', 'Directo'), ('interno', 'Interno'), ('buscador', 'Buscador'), ('social', 'Red social'), ('externo', 'Otro sitio')], default='directo', max_length=10)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_vista', to='recetas.receta')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Evento de vista',
+                'verbose_name_plural': 'Eventos de vista',
+            },
+        ),
+        migrations.CreateModel(
+            name='VistasDia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('origen', models.CharField(choices=[('directo', 'Directo'), ('interno', 'Interno'), ('buscador', 'Buscador'), ('social', 'Red social'), ('externo', 'Otro sitio')], max_length=10)),
+                ('vistas', models.PositiveIntegerField(default=0)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_dia', to='recetas.receta')),
+            ],
+            options={
+                'verbose_name': 'Vistas por día',
+                'verbose_name_plural': 'Vistas por día',
+                'unique_together': {('receta', 'dia', 'origen')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VistasHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField(help_text='Inicio de la hora')),
+                ('origen', models.CharField(choices=[('directo', 'Directo'), ('interno', 'Interno'), ('buscador', 'Buscador'), ('social', 'Red social'), ('externo', 'Otro sitio')], max_length=10)),
+                ('vistas', models.PositiveIntegerField(default=0)),
+                ('receta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_hora', to='recetas.receta')),
+            ],
+            options={
+                'verbose_name': 'Vistas por hora',
+                'verbose_name_plural': 'Vistas por hora',
+                'unique_together': {('receta', 'hora', 'origen')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0013_eventos_vista'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subidaimagen',
+            name='escribiendo_hasta',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
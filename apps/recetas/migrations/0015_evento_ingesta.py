@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0014_subida_escribiendo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventovista',
+            name='ingesta',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recetas', '0015_evento_ingesta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='receta',
+            name='fecha_baja',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Fecha del borrado; sus filas se borran después en segundo plano', null=True),
+        ),
+    ]
@@ -1,7 +1,14 @@
 from django.db import models
+from django.db.models import Avg, Exists, F, OuterRef, Q, Subquery, Value
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
-from PIL import Image
+from django.utils import timezone
+from django.conf import settings
+
+from apps.core.archivos import ImagenCompartida
+from .cantidades import parsear_cantidad
+from .normalizacion import clave_ingrediente
+import os
 import uuid
 
 User = get_user_model()
@@ -13,7 +20,7 @@ class Categoria(models.Model):
     """
     nombre = models.CharField(max_length=100, unique=True)
     descripcion = models.TextField(blank=True)
-    imagen = models.ImageField(upload_to='categorias/', blank=True, null=True)
+    imagen = ImagenCompartida(upload_to='categorias/', blank=True, null=True)
     slug = models.SlugField(unique=True, help_text="URL amigable")
     activa = models.BooleanField(default=True)
     
@@ -54,6 +61,108 @@ class Ingrediente(models.Model):
         return self.nombre
 
 
+class AliasIngrediente(models.Model):
+    """
+    Clave normalizada (ver ``normalizacion.clave_ingrediente``) que apunta a un
+    ingrediente canónico: su propio nombre, plurales y sinónimos como "jitomate".
+    """
+    clave = models.CharField(max_length=100, unique=True)
+    nombre = models.CharField(max_length=100, help_text="Texto original del alias")
+    ingrediente = models.ForeignKey(
+        Ingrediente,
+        on_delete=models.CASCADE,
+        related_name='alias'
+    )
+    
+    class Meta:
+        verbose_name = "Alias de ingrediente"
+        verbose_name_plural = "Alias de ingredientes"
+        ordering = ['clave']
+    
+    def __str__(self):
+        return f"{self.nombre} → {self.ingrediente.nombre}"
+    
+    def save(self, *args, **kwargs):
+        self.clave = clave_ingrediente(self.nombre)
+        super().save(*args, **kwargs)
+
+
+# Condición indexable de receta publicada (ver RecetaQuerySet.publicadas)
+PUBLICADA = Q(publicada=Value(True))
+
+
+class RecetaQuerySet(models.QuerySet):
+    """
+    Consultas reutilizables de recetas
+    """
+    
+    def publicadas(self):
+        """
+        Recetas publicadas.
+        
+        En SQLite Django traduce ``publicada=True`` a ``WHERE publicada``, que no se
+        resuelve con los índices que empiezan por ``publicada``; comparar contra
+        ``Value(True)`` genera ``publicada = %s``. En MySQL ya sale ``= 1`` y el
+        cambio no afecta.
+        """
+        return self.filter(PUBLICADA)
+    
+    def visibles_para(self, usuario):
+        """Recetas publicadas más los borradores propios (no borrados) del usuario autenticado"""
+        if usuario is not None and usuario.is_authenticated:
+            return self.filter(PUBLICADA | Q(autor=usuario, fecha_baja__isnull=True))
+        return self.publicadas()
+    
+    def con_ingredientes(self, terminos):
+        """
+        Recetas que contienen todos los ingredientes buscados. Cada término se
+        resuelve por su clave normalizada con una subconsulta indexada a
+        AliasIngrediente; si no tiene alias se busca por nombre__icontains. Todo va
+        en la misma consulta, así que el queryset sigue siendo perezoso (el listado
+        asíncrono lo evalúa con el ORM asíncrono).
+        """
+        terminos = [termino.strip() for termino in terminos if termino.strip()]
+        if not terminos:
+            return self
+        
+        queryset = self
+        for termino in terminos:
+            alias = AliasIngrediente.objects.filter(clave=clave_ingrediente(termino))
+            condicion = Q(ingrediente_id__in=alias.values('ingrediente_id')) | (
+                ~Exists(alias) & Q(ingrediente__nombre__icontains=termino)
+            )
+            # Un semijoin por ingrediente: sin JOINs encadenados ni DISTINCT
+            queryset = queryset.filter(
+                pk__in=RecetaIngrediente.objects.filter(condicion).values('receta')
+            )
+        return queryset
+    
+    def con_estadisticas(self, usuario=None):
+        """
+        Anota rating_promedio y es_favorito con subconsultas correlacionadas, sin
+        JOINs sobre ratings/favoritos que multipliquen filas (total_favoritos ya es
+        una columna).
+        """
+        # Los ratings de usuarios dados de baja dejan de contar antes de purgarlos
+        promedio = Rating.objects.filter(
+            receta=OuterRef('pk'), usuario__fecha_baja__isnull=True
+        ).order_by().values(
+            'receta'
+        ).annotate(promedio=Avg('puntuacion')).values('promedio')
+        
+        if usuario is not None and usuario.is_authenticated:
+            es_favorito = Exists(
+                Favorito.objects.filter(receta=OuterRef('pk'), usuario=usuario)
+            )
+        else:
+            es_favorito = Value(False, output_field=models.BooleanField())
+        
+        return self.annotate(
+            rating_promedio=Subquery(promedio, output_field=models.FloatField()),
+            es_favorito=es_favorito,
+        )
+
+
 class Receta(models.Model):
     """
     Modelo principal de recetas para Quanticook
@@ -98,6 +207,14 @@ class Receta(models.Model):
         default=0,
         help_text="Tiempo de cocción en minutos"
     )
+
+    # Columna generada por la base de datos: filtrable, ordenable e indexable
+    tiempo_total = models.GeneratedField(
+        expression=F('tiempo_preparacion') + F('tiempo_coccion'),
+        output_field=models.PositiveIntegerField(),
+        db_persist=True,
+        help_text="Tiempo total de preparación + cocción en minutos"
+    )
     
     # Dificultad y porciones
     dificultad = models.CharField(
@@ -131,10 +248,14 @@ class Receta(models.Model):
     )
     
     # Imágenes
-    imagen_principal = models.ImageField(
+    # Indexada: /media/ comprueba qué recetas usan una imagen antes de servirla
+    # Reducida a 800 px al subirla
+    imagen_principal = ImagenCompartida(
         upload_to='recetas/principales/',
+        lado_maximo=800,
         blank=True,
         null=True,
+        db_index=True,
         help_text="Imagen principal de la receta"
     )
     
@@ -153,8 +274,24 @@ class Receta(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    # Baja: la receta se oculta y purgar_recetas borra sus filas por lotes
+    fecha_baja = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Fecha del borrado; sus filas se borran después en segundo plano"
+    )
+    
     # Estadísticas
     vistas = models.PositiveIntegerField(default=0)
+    total_favoritos = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Lo mantiene favoritos.py al escribir, sin COUNT al leer"
+    )
+    
+    objects = RecetaQuerySet.as_manager()
     
     class Meta:
         verbose_name = "Receta"
@@ -164,44 +301,41 @@ class Receta(models.Model):
             models.Index(fields=['publicada', '-fecha_creacion']),
             models.Index(fields=['categoria', 'publicada']),
             models.Index(fields=['autor', '-fecha_creacion']),
+            models.Index(fields=['publicada', 'tiempo_total']),
         ]
     
     def __str__(self):
         return f"{self.titulo} - {self.autor.username}"
     
-    @property
-    def tiempo_total(self):
-        """Tiempo total de preparación + cocción"""
-        return self.tiempo_preparacion + self.tiempo_coccion
-    
     @property
     def rating_promedio(self):
-        """Promedio de ratings de la receta"""
-        ratings = self.ratings.all()
+        """Promedio de ratings de la receta (usa la anotación si existe)"""
+        if '_rating_promedio' in self.__dict__:
+            return self._rating_promedio
+        if 'ratings' in getattr(self, '_prefetched_objects_cache', {}):
+            ratings = self.ratings.all()
+        else:
+            ratings = self.ratings.filter(usuario__fecha_baja__isnull=True)
         if ratings:
             return sum(r.puntuacion for r in ratings) / len(ratings)
         return 0
     
-    @property
-    def total_favoritos(self):
-        """Total de usuarios que tienen esta receta como favorita"""
-        return self.favoritos.count()
+    @rating_promedio.setter
+    def rating_promedio(self, valor):
+        """Permite que el queryset anote el promedio calculado en SQL"""
+        self._rating_promedio = valor
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado guardado, para detectar la publicación en post_save (reparto al feed)
+        instancia._publicada_guardada = instancia.__dict__.get('publicada')
+        return instancia
     
     def incrementar_vistas(self):
         """Incrementa el contador de vistas"""
         self.vistas += 1
         self.save(update_fields=['vistas'])
-    
-    def save(self, *args, **kwargs):
-        """Redimensionar imagen al guardar"""
-        super().save(*args, **kwargs)
-        
-        if self.imagen_principal:
-            img = Image.open(self.imagen_principal.path)
-            if img.height > 800 or img.width > 800:
-                output_size = (800, 800)
-                img.thumbnail(output_size)
-                img.save(self.imagen_principal.path)
 
 
 class RecetaIngrediente(models.Model):
@@ -230,6 +364,23 @@ class RecetaIngrediente(models.Model):
         help_text="¿Es un ingrediente opcional?"
     )
     
+    # Interpretación de ``cantidad`` calculada al guardar (ver cantidades.parsear_cantidad)
+    cantidad_valor = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Cantidad en la unidad base (g, ml, unidad...); vacío si no es numérica"
+    )
+    
+    unidad = models.CharField(
+        max_length=30,
+        blank=True,
+        editable=False,
+        help_text="Unidad base normalizada de cantidad_valor"
+    )
+    
     class Meta:
         unique_together = ['receta', 'ingrediente']
         verbose_name = "Ingrediente de Receta"
@@ -237,6 +388,14 @@ class RecetaIngrediente(models.Model):
     
     def __str__(self):
         return f"{self.cantidad} de {self.ingrediente.nombre}"
+    
+    def save(self, *args, **kwargs):
+        """Interpreta la cantidad una sola vez, al escribir"""
+        self.cantidad_valor, self.unidad = parsear_cantidad(self.cantidad)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cantidad' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cantidad_valor', 'unidad'}
+        super().save(*args, **kwargs)
 
 
 class Rating(models.Model):
@@ -316,8 +475,9 @@ class ImagenReceta(models.Model):
         related_name='imagenes_adicionales'
     )
     
-    imagen = models.ImageField(
+    imagen = ImagenCompartida(
         upload_to='recetas/galeria/',
+        db_index=True,
         help_text="Imagen adicional de la receta"
     )
     
@@ -341,3 +501,304 @@ class ImagenReceta(models.Model):
     
     def __str__(self):
         return f"Imagen de {self.receta.titulo}"
+
+
+class UsoFiltro(models.Model):
+    """
+    Uso agregado de una combinación de filtros y orden del listado de recetas.
+    Lo alimenta ``uso_filtros.registro_filtros`` y lo analiza ``recomendar_indices``.
+    """
+    firma = models.CharField(max_length=255, unique=True)
+    filtros = models.CharField(max_length=255, blank=True)
+    ordenacion = models.CharField(max_length=100, blank=True)
+    ejemplo = models.CharField(
+        max_length=500,
+        blank=True,
+        help_text="Última query string observada con esta combinación"
+    )
+    usos = models.PositiveBigIntegerField(default=0)
+    latencia_total_ms = models.FloatField(default=0)
+    latencia_max_ms = models.FloatField(default=0)
+    ultima_vez = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Uso de filtros"
+        verbose_name_plural = "Uso de filtros"
+        ordering = ['-usos']
+    
+    def __str__(self):
+        return self.firma or "(sin filtros)"
+    
+    @property
+    def latencia_media_ms(self):
+        return self.latencia_total_ms / self.usos if self.usos else 0.0
+
+
+class RecetaSimilar(models.Model):
+    """
+    Vecinos precalculados de cada receta (filtrado colaborativo ítem a ítem sobre
+    favoritos y valoraciones). Lo rellena ``calcular_similares``; las vistas solo
+    leen por el índice (receta, -puntuacion).
+    """
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='similares'
+    )
+    
+    similar = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='similar_de'
+    )
+    
+    puntuacion = models.FloatField(help_text="Similitud coseno entre 0 y 1")
+    
+    usuarios_comunes = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['receta', 'similar']
+        verbose_name = "Receta similar"
+        verbose_name_plural = "Recetas similares"
+        ordering = ['receta', '-puntuacion']
+        indexes = [
+            models.Index(fields=['receta', '-puntuacion']),
+        ]
+    
+    def __str__(self):
+        return f"{self.receta_id} ~ {self.similar_id} ({self.puntuacion:.3f})"
+
+
+class FirmaMinHash(models.Model):
+    """
+    Firma MinHash del contenido de una receta (ingredientes y categoría); ver ``minhash``
+    """
+    receta = models.OneToOneField(
+        Receta,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='firma_minhash'
+    )
+    
+    firma = models.BinaryField()
+    
+    class Meta:
+        verbose_name = "Firma MinHash"
+        verbose_name_plural = "Firmas MinHash"
+    
+    def __str__(self):
+        return f"Firma de {self.receta_id}"
+
+
+class BandaMinHash(models.Model):
+    """
+    Una banda de la firma MinHash de una receta: las recetas que comparten alguna
+    clave son candidatas a parecerse
+    """
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='bandas_minhash'
+    )
+    
+    clave = models.BigIntegerField(db_index=True)
+    
+    class Meta:
+        verbose_name = "Banda MinHash"
+        verbose_name_plural = "Bandas MinHash"
+    
+    def __str__(self):
+        return f"{self.receta_id}: {self.clave}"
+
+
+class EntradaFeed(models.Model):
+    """
+    Fila del timeline de un usuario: una receta publicada por un autor al que sigue.
+    Se escribe al publicar (fan-out) salvo para autores muy seguidos; ver ``feed``.
+    """
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed'
+    )
+    
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='entradas_feed'
+    )
+    
+    autor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    
+    fecha = models.DateTimeField(help_text="Momento de la publicación")
+    
+    class Meta:
+        unique_together = ['usuario', 'receta']
+        verbose_name = "Entrada de feed"
+        verbose_name_plural = "Entradas de feed"
+        indexes = [
+            models.Index(fields=['usuario', '-fecha']),
+            models.Index(fields=['usuario', 'autor']),
+        ]
+    
+    def __str__(self):
+        return f"{self.usuario_id}: {self.receta_id}"
+
+
+class SubidaImagen(models.Model):
+    """
+    Imagen subida por bloques (reanudable). Los bytes se escriben en ``SUBIDAS_DIR``
+    y pasan al almacenamiento de media al adjuntarla a una receta; ver ``subidas``.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='subidas_imagen'
+    )
+    
+    nombre = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Nombre original del archivo"
+    )
+    
+    tamano = models.PositiveBigIntegerField(help_text="Bytes de la imagen completa")
+    recibidos = models.PositiveBigIntegerField(default=0)
+    # Mientras una petición escribe el bloque que empieza en ``recibidos``
+    escribiendo_hasta = models.DateTimeField(blank=True, null=True)
+    
+    # Leídos de la cabecera de la imagen en cuanto llega
+    tipo = models.CharField(max_length=20, blank=True)
+    ancho = models.PositiveIntegerField(blank=True, null=True)
+    alto = models.PositiveIntegerField(blank=True, null=True)
+    sha256 = models.CharField(max_length=64, blank=True, help_text="Resumen al completarse")
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Subida de imagen"
+        verbose_name_plural = "Subidas de imágenes"
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['usuario', '-fecha_creacion']),
+            models.Index(fields=['fecha_actualizacion']),
+        ]
+    
+    def __str__(self):
+        return f"{self.nombre or self.pk} ({self.recibidos}/{self.tamano})"
+    
+    @property
+    def completada(self):
+        return self.recibidos == self.tamano
+    
+    @property
+    def ruta(self):
+        """Archivo temporal con los bytes recibidos"""
+        return os.path.join(settings.SUBIDAS_DIR, f'{self.pk}.part')
+
+
+# De dónde llega una vista del detalle, según su Referer; ver ``registro_vistas``
+ORIGENES_VISTA = [
+    ('directo', 'Directo'),
+    ('interno', 'Interno'),
+    ('buscador', 'Buscador'),
+    ('social', 'Red social'),
+    ('externo', 'Otro sitio'),
+]
+
+
+class EventoVista(models.Model):
+    """
+    Vista del detalle de una receta. Tabla de solo inserción: los procesos acumulan
+    las vistas y las insertan en lote, ``agregar_vistas`` las suma a ``VistasHora``
+    y ``VistasDia`` y las borra pasada la retención. Sin índices aparte de las claves
+    ajenas, para que insertar sea barato.
+    """
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='eventos_vista'
+    )
+    
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    
+    fecha = models.DateTimeField(default=timezone.now)
+    origen = models.CharField(max_length=10, choices=ORIGENES_VISTA, default='directo')
+    # Cuándo se insertó (el volcado), que puede ser bastante después de ``fecha``
+    ingesta = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Evento de vista"
+        verbose_name_plural = "Eventos de vista"
+    
+    def __str__(self):
+        return f"{self.receta_id} {self.fecha:%Y-%m-%d %H:%M} ({self.origen})"
+
+
+class VistasHora(models.Model):
+    """Vistas de una receta en una hora, por origen"""
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='vistas_hora'
+    )
+    
+    hora = models.DateTimeField(help_text="Inicio de la hora")
+    origen = models.CharField(max_length=10, choices=ORIGENES_VISTA)
+    vistas = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['receta', 'hora', 'origen']
+        verbose_name = "Vistas por hora"
+        verbose_name_plural = "Vistas por hora"
+    
+    def __str__(self):
+        return f"{self.receta_id} {self.hora:%Y-%m-%d %H}h {self.origen}: {self.vistas}"
+
+
+class VistasDia(models.Model):
+    """Vistas de una receta en un día, por origen"""
+    receta = models.ForeignKey(
+        Receta,
+        on_delete=models.CASCADE,
+        related_name='vistas_dia'
+    )
+    
+    dia = models.DateField()
+    origen = models.CharField(max_length=10, choices=ORIGENES_VISTA)
+    vistas = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['receta', 'dia', 'origen']
+        verbose_name = "Vistas por día"
+        verbose_name_plural = "Vistas por día"
+    
+    def __str__(self):
+        return f"{self.receta_id} {self.dia} {self.origen}: {self.vistas}"
+
+
+class ProgresoAgregado(models.Model):
+    """Último evento sumado a los agregados de ``nombre``: cada pasada sigue desde ahí"""
+    nombre = models.CharField(max_length=50, unique=True)
+    ultimo_id = models.PositiveBigIntegerField(default=0)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Progreso de agregado"
+        verbose_name_plural = "Progreso de agregados"
+    
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_id}"
@@ -0,0 +1,40 @@
+"""
+Normalización de nombres de ingredientes para búsquedas exactas e indexables.
+
+``clave_ingrediente`` pliega mayúsculas, acentos, signos y plurales regulares del
+español, de modo que "Tomates", "tomate" y "TOMATE" comparten la clave "tomate".
+"""
+import re
+import unicodedata
+
+VOCALES = 'aeiou'
+
+
+def plegar(texto):
+    """Minúsculas y sin acentos: 'Jalapeño Ácido' -> 'jalapeno acido'"""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def singular(palabra):
+    """
+    Forma común de singular y plural de una palabra ya plegada (no siempre el
+    singular real): limones -> limon, tomates -> tomate, nuez y nueces -> nuece.
+    """
+    if palabra.endswith('z'):
+        # nuez/nueces, maiz/maices: la z final se escribe ce ante la -s del plural
+        return palabra[:-1] + 'ce'
+    if len(palabra) <= 3 or not palabra.endswith('s'):
+        return palabra
+    if palabra.endswith('es') and palabra[-3] in 'lnrjy' and palabra[-4] in VOCALES:
+        # limon-es, frijol-es, flor-es; vinagr-es no (vinagre)
+        return palabra[:-2]
+    if palabra[-2] in VOCALES:
+        return palabra[:-1]
+    return palabra
+
+
+def clave_ingrediente(texto):
+    """Clave normalizada: 'Tomates  cherry' -> 'tomate cherry'"""
+    palabras = re.sub(r'[^0-9a-z]+', ' ', plegar(texto)).split()
+    return ' '.join(singular(palabra) for palabra in palabras)
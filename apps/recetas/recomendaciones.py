@@ -0,0 +1,125 @@
+"""
+Recomendaciones ítem a ítem precalculadas a partir de favoritos y valoraciones.
+
+La matriz usuario×receta es muy dispersa, así que se guarda como listas de adyacencia
+(usuario -> recetas y receta -> usuarios, con su peso). La similitud coseno de una
+receta con las demás se obtiene recorriendo sus usuarios y las recetas de cada uno: solo
+se visitan los pares con algún usuario en común, nunca la matriz densa. Las recetas se
+procesan por lotes y de cada una solo se conservan sus K mejores vecinos, que se
+escriben en ``RecetaSimilar`` antes de pasar al siguiente lote; la memoria es la de la
+matriz dispersa más un lote de resultados.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q, Sum
+
+from .models import Favorito, Rating, Receta, RecetaSimilar
+
+PESO_FAVORITO = 1.0
+# Las valoraciones bajas no indican afinidad y no cuentan
+PESOS_RATING = {5: 1.0, 4: 0.75, 3: 0.25}
+
+
+def cargar_interacciones():
+    """usuario -> {receta: peso} de las recetas publicadas (favorito o valoración, el mayor)"""
+    pesos = defaultdict(dict)
+    favoritos = Favorito.objects.filter(receta__publicada=True).order_by().values_list('usuario_id', 'receta_id')
+    for usuario, receta in favoritos.iterator(chunk_size=5000):
+        pesos[usuario][receta] = PESO_FAVORITO
+    ratings = Rating.objects.filter(
+        receta__publicada=True, puntuacion__in=PESOS_RATING
+    ).order_by().values_list('usuario_id', 'receta_id', 'puntuacion')
+    for usuario, receta, puntuacion in ratings.iterator(chunk_size=5000):
+        pesos[usuario][receta] = max(pesos[usuario].get(receta, 0.0), PESOS_RATING[puntuacion])
+    return pesos
+
+
+class MatrizInteracciones:
+    """Matriz usuario×receta dispersa, indexada por filas y por columnas"""
+
+    def __init__(self, pesos, max_por_usuario=1000):
+        # Los usuarios con miles de recetas aportan poca señal y un coste cuadrático
+        self.por_usuario = {
+            usuario: list(recetas.items())
+            for usuario, recetas in pesos.items()
+            if len(recetas) <= max_por_usuario
+        }
+        self.por_receta = defaultdict(list)
+        for usuario, recetas in self.por_usuario.items():
+            for receta, peso in recetas:
+                self.por_receta[receta].append((usuario, peso))
+        self.normas = {
+            receta: math.sqrt(sum(peso * peso for _, peso in usuarios))
+            for receta, usuarios in self.por_receta.items()
+        }
+
+    def vecinos(self, receta, k, min_comunes=2):
+        """Las ``k`` recetas más similares como [(similitud, usuarios_comunes, id)]"""
+        acumulado = defaultdict(lambda: [0.0, 0])
+        for usuario, peso in self.por_receta[receta]:
+            for otra, peso_otra in self.por_usuario[usuario]:
+                if otra != receta:
+                    entrada = acumulado[otra]
+                    entrada[0] += peso * peso_otra
+                    entrada[1] += 1
+
+        norma = self.normas[receta]
+        candidatos = (
+            (producto / (norma * self.normas[otra]), comunes, otra)
+            for otra, (producto, comunes) in acumulado.items()
+            if comunes >= min_comunes
+        )
+        return heapq.nlargest(k, candidatos, key=lambda candidato: candidato[:2])
+
+
+def calcular_similares(k=20, lote=500, min_comunes=2, max_por_usuario=1000):
+    """
+    Recalcula ``RecetaSimilar`` lote a lote (cada lote se sustituye en su propia
+    transacción, así que las lecturas nunca ven una receta sin vecinos a medias).
+    Devuelve (recetas procesadas, filas escritas).
+    """
+    matriz = MatrizInteracciones(cargar_interacciones(), max_por_usuario)
+    recetas = sorted(matriz.por_receta)
+    escritas = 0
+    for inicio in range(0, len(recetas), lote):
+        bloque = recetas[inicio:inicio + lote]
+        filas = [
+            RecetaSimilar(receta_id=receta, similar_id=otra, puntuacion=round(similitud, 6), usuarios_comunes=comunes)
+            for receta in bloque
+            for similitud, comunes, otra in matriz.vecinos(receta, k, min_comunes)
+        ]
+        with transaction.atomic():
+            RecetaSimilar.objects.filter(receta_id__in=bloque).delete()
+            RecetaSimilar.objects.bulk_create(filas, batch_size=1000)
+        escritas += len(filas)
+
+    # Recetas que ya no tienen interacciones (o se despublicaron)
+    obsoletas = list(
+        set(RecetaSimilar.objects.order_by().values_list('receta_id', flat=True).distinct())
+        - set(recetas)
+    )
+    for inicio in range(0, len(obsoletas), lote):
+        RecetaSimilar.objects.filter(receta_id__in=obsoletas[inicio:inicio + lote]).delete()
+    return len(recetas), escritas
+
+
+def puntuaciones_recomendadas(usuario, limite):
+    """
+    [(receta_id, puntuacion)] para ``usuario``: suma de similitudes con las recetas que
+    marcó como favoritas o valoró bien, sin las que ya conoce ni las suyas. Una consulta
+    agrupada sobre el índice (receta, -puntuacion) de ``RecetaSimilar``.
+    """
+    favoritas = Favorito.objects.filter(usuario=usuario).values('receta_id')
+    valoradas = Rating.objects.filter(usuario=usuario)
+    filas = RecetaSimilar.objects.filter(
+        Q(receta__in=favoritas) | Q(receta__in=valoradas.filter(puntuacion__gte=4).values('receta_id')),
+        similar__in=Receta.objects.publicadas().exclude(autor=usuario).values('pk'),
+    ).exclude(
+        Q(similar__in=favoritas) | Q(similar__in=valoradas.values('receta_id'))
+    ).order_by().values('similar_id').annotate(
+        total=Sum('puntuacion')
+    ).order_by('-total', 'similar_id')[:limite]
+    return [(fila['similar_id'], fila['total']) for fila in filas]
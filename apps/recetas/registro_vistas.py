@@ -0,0 +1,206 @@
+"""
+Registro de las vistas del detalle de las recetas.
+
+Cada petición solo añade la vista (receta, usuario, fecha y origen según el Referer)
+a una lista en memoria; el proceso la inserta en ``EventoVista`` con un INSERT por
+lote cada ``VISTAS_VOLCADO_SEGUNDOS`` o al llegar a ``VISTAS_VOLCADO_MAX`` vistas. Si
+el proceso termina se pierden las vistas sin volcar, aceptable para una estadística.
+
+``agregar_vistas`` (cron) suma a ``VistasHora`` y ``VistasDia`` solo los eventos
+posteriores al último que sumó (``ProgresoAgregado``), por rangos de ids hasta el
+último insertado hace más de ``VISTAS_MARGEN_SEGUNDOS`` (``ingesta``), y borra los
+ya sumados con más de ``VISTAS_RETENCION_DIAS``: la tabla de eventos no crece sin
+límite y los agregados guardan el histórico.
+"""
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import EventoVista, ProgresoAgregado, Receta, VistasDia, VistasHora
+
+BUSCADORES = {'google', 'bing', 'duckduckgo', 'yahoo', 'ecosia', 'yandex', 'baidu', 'qwant'}
+REDES_SOCIALES = {
+    'facebook', 'instagram', 'twitter', 'pinterest', 'reddit', 'tiktok', 'whatsapp',
+    'youtube', 'linkedin', 'telegram',
+}
+HOSTS_SOCIALES = {'t.co', 'x.com', 'fb.me', 'wa.me', 't.me', 'lnkd.in'}
+
+PROGRESO = 'vistas'
+
+User = get_user_model()
+
+
+def categorizar_origen(referer, host):
+    """Origen de ``ORIGENES_VISTA`` para el Referer de una petición a ``host``"""
+    try:
+        dominio = urlsplit(referer or '').hostname or ''
+    except ValueError:
+        return 'externo'
+    if not dominio:
+        return 'directo'
+    if dominio == host.rsplit(':', 1)[0].lower():
+        return 'interno'
+    # Sin el dominio de primer nivel: www.google.es -> {'www', 'google'}
+    etiquetas = set(dominio.split('.')[:-1])
+    if dominio.removeprefix('www.') in HOSTS_SOCIALES or etiquetas & REDES_SOCIALES:
+        return 'social'
+    if etiquetas & BUSCADORES:
+        return 'buscador'
+    return 'externo'
+
+
+def origen_de(request):
+    return categorizar_origen(request.META.get('HTTP_REFERER'), request.get_host())
+
+
+class RegistroVistas:
+    """Acumulador del proceso, seguro entre hilos"""
+
+    def __init__(self):
+        self._pendiente = []
+        self._lock = threading.Lock()
+        self._ultimo_volcado = time.monotonic()
+
+    def registrar(self, receta_id, usuario_id, origen):
+        with self._lock:
+            self._pendiente.append((receta_id, usuario_id, timezone.now(), origen))
+
+    def registrar_peticion(self, receta_id, request):
+        usuario = request.user
+        self.registrar(receta_id, usuario.pk if usuario.is_authenticated else None, origen_de(request))
+
+    def toca_volcar(self):
+        if not self._pendiente:
+            return False
+        intervalo = getattr(settings, 'VISTAS_VOLCADO_SEGUNDOS', 10)
+        return (
+            len(self._pendiente) >= getattr(settings, 'VISTAS_VOLCADO_MAX', 1000)
+            or time.monotonic() - self._ultimo_volcado >= intervalo
+        )
+
+    def volcar(self):
+        """Inserta lo acumulado en ``EventoVista`` y vacía el acumulador"""
+        with self._lock:
+            pendiente, self._pendiente = self._pendiente, []
+            self._ultimo_volcado = time.monotonic()
+        if not pendiente:
+            return 0
+
+        ahora = timezone.now()
+        eventos = [
+            EventoVista(receta_id=receta_id, usuario_id=usuario_id, fecha=fecha, origen=origen, ingesta=ahora)
+            for receta_id, usuario_id, fecha, origen in pendiente
+        ]
+        try:
+            with transaction.atomic():
+                EventoVista.objects.bulk_create(eventos, batch_size=1000)
+        except IntegrityError:
+            # Una receta o un usuario borrados mientras sus vistas esperaban
+            recetas = set(Receta.objects.filter(
+                pk__in={evento.receta_id for evento in eventos}
+            ).values_list('pk', flat=True))
+            usuarios = set(User.objects.filter(
+                pk__in={evento.usuario_id for evento in eventos if evento.usuario_id}
+            ).values_list('pk', flat=True))
+            eventos = [evento for evento in eventos if evento.receta_id in recetas]
+            for evento in eventos:
+                if evento.usuario_id not in usuarios:
+                    evento.usuario_id = None
+            EventoVista.objects.bulk_create(eventos, batch_size=1000)
+        return len(eventos)
+
+    def registrar_y_volcar(self, receta_id, request):
+        self.registrar_peticion(receta_id, request)
+        if self.toca_volcar():
+            self.volcar()
+
+
+registro_vistas = RegistroVistas()
+
+
+def _sumar(modelo, campo, truncado, eventos):
+    """
+    Suma a ``modelo`` los eventos agrupados por (receta, ``campo``, origen) con un
+    INSERT ... SELECT que suma a las filas existentes: los grupos no pasan por Python
+    """
+    agrupados = eventos.values('receta_id', 'origen', periodo=truncado).annotate(vistas=Count('pk')).order_by()
+    sql, params = agrupados.query.sql_with_params()
+    nombre = connection.ops.quote_name
+    tabla = nombre(modelo._meta.db_table)
+    columnas = ', '.join(nombre(modelo._meta.get_field(c).column) for c in ('receta', 'origen', campo, 'vistas'))
+    vistas = nombre('vistas')
+    if connection.vendor == 'mysql':
+        conflicto = f'ON DUPLICATE KEY UPDATE {tabla}.{vistas} = {tabla}.{vistas} + agrupados.{vistas}'
+    else:
+        unicas = ', '.join(nombre(modelo._meta.get_field(c).column) for c in ('receta', campo, 'origen'))
+        # WHERE true: sin él SQLite lee ON CONFLICT como parte del SELECT
+        conflicto = f'WHERE true ON CONFLICT ({unicas}) DO UPDATE SET {vistas} = {tabla}.{vistas} + excluded.{vistas}'
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {tabla} ({columnas}) SELECT * FROM ({sql}) agrupados {conflicto}', params)
+
+
+def agregar_vistas(lote=10000, margen_segundos=None):
+    """
+    Suma a los agregados los eventos nuevos, de ``lote`` en ``lote`` ids y una
+    transacción por rango. Devuelve los eventos sumados.
+
+    Solo llega hasta el último evento insertado hace más de ``margen_segundos``. Un
+    INSERT en curso puede tener ids menores que otro ya visible, pero su ``ingesta``
+    es anterior a la de ese otro en menos de lo que dura la transacción, así que con
+    un margen mucho mayor que ella ya está confirmado. ``fecha`` no sirve: una vista
+    puede esperar en memoria hasta el siguiente volcado.
+    """
+    if margen_segundos is None:
+        margen_segundos = getattr(settings, 'VISTAS_MARGEN_SEGUNDOS', 120)
+    corte = timezone.now() - timedelta(seconds=margen_segundos)
+    progreso, _ = ProgresoAgregado.objects.get_or_create(nombre=PROGRESO)
+    desde = progreso.ultimo_id
+    hasta = EventoVista.objects.filter(pk__gt=desde, ingesta__lt=corte).order_by('-pk').values_list(
+        'pk', flat=True
+    ).first()
+    if hasta is None:
+        return 0
+
+    sumados = 0
+    while desde < hasta:
+        tope = min(desde + lote, hasta)
+        with transaction.atomic():
+            # Dos pasadas a la vez: la que no encuentra el progreso donde lo dejó se retira
+            progreso = ProgresoAgregado.objects.select_for_update().get(nombre=PROGRESO)
+            if progreso.ultimo_id != desde:
+                return sumados
+            eventos = EventoVista.objects.filter(pk__gt=desde, pk__lte=tope)
+            _sumar(VistasHora, 'hora', TruncHour('fecha'), eventos)
+            _sumar(VistasDia, 'dia', TruncDate('fecha'), eventos)
+            sumados += eventos.count()
+            progreso.ultimo_id = tope
+            progreso.save(update_fields=['ultimo_id', 'fecha_actualizacion'])
+        desde = tope
+    return sumados
+
+
+def podar_eventos(dias=None, lote=10000):
+    """Borra por lotes los eventos ya sumados con más de ``dias``; devuelve cuántos"""
+    if dias is None:
+        dias = getattr(settings, 'VISTAS_RETENCION_DIAS', 30)
+    limite = timezone.now() - timedelta(days=dias)
+    ultimo = ProgresoAgregado.objects.filter(nombre=PROGRESO).values_list('ultimo_id', flat=True).first() or 0
+    borrados = 0
+    while True:
+        # Los más antiguos están al principio del índice de la clave primaria
+        pks = list(EventoVista.objects.filter(pk__lte=ultimo, fecha__lt=limite).order_by('pk').values_list(
+            'pk', flat=True
+        )[:lote])
+        if not pks:
+            return borrados
+        # Sin señales ni dependientes: un DELETE por lote, sin cargar las filas
+        EventoVista.objects.filter(pk__in=pks).delete()
+        borrados += len(pks)
@@ -1,9 +1,13 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from .models import (
     Categoria, Ingrediente, Receta, RecetaIngrediente,
-    Rating, Favorito, ImagenReceta
+    Rating, Favorito, ImagenReceta, SubidaImagen
 )
+from .favoritos import agregar_favoritos
+from .minhash import actualizar_firmas, buscar_duplicadas
+from .subidas import crear_subida
 
 User = get_user_model()
 
@@ -60,9 +64,24 @@ class RecetaIngredienteSerializer(serializers.ModelSerializer):
         model = RecetaIngrediente
         fields = [
             'id', 'ingrediente', 'ingrediente_id', 
-            'cantidad', 'opcional'
+            'cantidad', 'cantidad_valor', 'unidad', 'opcional'
         ]
-        read_only_fields = ['id']
+        read_only_fields = ['id', 'cantidad_valor', 'unidad']
+
+
+class RecetaPorcionesSerializer(serializers.Serializer):
+    """
+    Receta de un plan de comidas y porciones deseadas (por defecto, las de la receta)
+    """
+    id = serializers.UUIDField()
+    porciones = serializers.IntegerField(min_value=1, max_value=200, required=False)
+
+
+class ListaComprasSerializer(serializers.Serializer):
+    """
+    Entrada de la lista de la compra
+    """
+    recetas = RecetaPorcionesSerializer(many=True, max_length=100)
 
 
 class ImagenRecetaSerializer(serializers.ModelSerializer):
@@ -121,6 +140,8 @@ class RecetaListSerializer(serializers.ModelSerializer):
     
     def get_es_favorito(self, obj):
         """Indica si la receta es favorita del usuario actual"""
+        if hasattr(obj, 'es_favorito'):
+            return obj.es_favorito
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.favoritos.filter(usuario=request.user).exists()
@@ -162,6 +183,8 @@ class RecetaDetailSerializer(serializers.ModelSerializer):
     
     def get_es_favorito(self, obj):
         """Indica si la receta es favorita del usuario actual"""
+        if hasattr(obj, 'es_favorito'):
+            return obj.es_favorito
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.favoritos.filter(usuario=request.user).exists()
@@ -174,6 +197,7 @@ class RecetaCreateUpdateSerializer(serializers.ModelSerializer):
     """
     ingredientes = RecetaIngredienteSerializer(many=True, write_only=True, required=False)
     imagenes = ImagenRecetaSerializer(many=True, write_only=True, required=False)
+    permitir_duplicado = serializers.BooleanField(write_only=True, required=False, default=False)
     
     class Meta:
         model = Receta
@@ -182,13 +206,38 @@ class RecetaCreateUpdateSerializer(serializers.ModelSerializer):
             'tiempo_preparacion', 'tiempo_coccion',
             'dificultad', 'porciones', 'instrucciones',
             'calorias_por_porcion', 'imagen_principal',
-            'ingredientes', 'imagenes'
+            'ingredientes', 'imagenes', 'permitir_duplicado'
         ]
     
+    def validate(self, attrs):
+        """Al crear, rechaza recetas casi idénticas a otra visible salvo que se confirme"""
+        if self.instance is None and not attrs.get('permitir_duplicado'):
+            categoria = attrs.get('categoria')
+            duplicadas = buscar_duplicadas(
+                attrs.get('titulo', ''),
+                categoria.pk if categoria else None,
+                [ingrediente['ingrediente_id'] for ingrediente in attrs.get('ingredientes', [])],
+                Receta.objects.visibles_para(self.context['request'].user),
+                settings.RECETA_DUPLICADA_UMBRAL,
+            )
+            if duplicadas:
+                raise serializers.ValidationError({
+                    'permitir_duplicado': (
+                        "Ya existe una receta muy parecida; envía permitir_duplicado=true "
+                        "para crearla igualmente."
+                    ),
+                    'duplicadas': [
+                        {'id': str(pk), 'titulo': titulo, 'similitud': f'{similitud:.2f}'}
+                        for pk, titulo, similitud in duplicadas
+                    ],
+                })
+        return attrs
+    
     def create(self, validated_data):
         """Crear receta con ingredientes e imágenes"""
         ingredientes_data = validated_data.pop('ingredientes', [])
         imagenes_data = validated_data.pop('imagenes', [])
+        validated_data.pop('permitir_duplicado', None)
         
         # Asignar autor automáticamente
         validated_data['autor'] = self.context['request'].user
@@ -204,12 +253,15 @@ class RecetaCreateUpdateSerializer(serializers.ModelSerializer):
         for imagen_data in imagenes_data:
             ImagenReceta.objects.create(receta=receta, **imagen_data)
         
+        actualizar_firmas([receta.pk])
         return receta
     
     def update(self, instance, validated_data):
         """Actualizar receta con ingredientes e imágenes"""
         ingredientes_data = validated_data.pop('ingredientes', None)
         imagenes_data = validated_data.pop('imagenes', None)
+        validated_data.pop('permitir_duplicado', None)
+        contenido_cambiado = ingredientes_data is not None or 'categoria' in validated_data
         
         # Actualizar campos básicos
         for attr, value in validated_data.items():
@@ -228,6 +280,8 @@ class RecetaCreateUpdateSerializer(serializers.ModelSerializer):
             for imagen_data in imagenes_data:
                 ImagenReceta.objects.create(receta=instance, **imagen_data)
         
+        if contenido_cambiado:
+            actualizar_firmas([instance.pk])
         return instance
 
 
@@ -243,10 +297,84 @@ class FavoritoSerializer(serializers.ModelSerializer):
         fields = ['id', 'receta', 'receta_id', 'fecha_agregado']
         read_only_fields = ['id', 'fecha_agregado']
     
+    def validate_receta_id(self, value):
+        if not Receta.objects.visibles_para(self.context['request'].user).filter(pk=value).exists():
+            raise serializers.ValidationError("Receta no encontrada")
+        return value
+    
     def create(self, validated_data):
-        """Asigna automáticamente el usuario autenticado"""
-        validated_data['usuario'] = self.context['request'].user
-        return super().create(validated_data)
+        """Idempotente: si ya era favorita devuelve el favorito existente"""
+        usuario = self.context['request'].user
+        agregar_favoritos(usuario, [validated_data['receta_id']])
+        return Favorito.objects.select_related('receta').get(usuario=usuario, receta_id=validated_data['receta_id'])
+
+
+class RecetasLoteSerializer(serializers.Serializer):
+    """
+    Ids de recetas a obtener en una sola petición, en el orden deseado
+    """
+    ids = serializers.ListField(child=serializers.CharField(max_length=64))
+    
+    def validate_ids(self, value):
+        maximo = settings.RECETAS_LOTE_MAX
+        if len(value) > maximo:
+            raise serializers.ValidationError(f"Como máximo {maximo} recetas por petición")
+        return value
+
+
+class FavoritosLoteSerializer(serializers.Serializer):
+    """
+    Favoritos a añadir y quitar en una sola transacción (sincronización offline)
+    """
+    agregar = serializers.ListField(child=serializers.UUIDField(), required=False, default=list, max_length=500)
+    quitar = serializers.ListField(child=serializers.UUIDField(), required=False, default=list, max_length=500)
+    
+    def validate(self, attrs):
+        if set(attrs['agregar']) & set(attrs['quitar']):
+            raise serializers.ValidationError("Una receta no puede estar a la vez en agregar y quitar")
+        return attrs
+
+
+class SubidaImagenSerializer(serializers.ModelSerializer):
+    """
+    Subida de imagen por bloques: al crearla solo se indican nombre y tamaño
+    """
+    completada = serializers.BooleanField(read_only=True)
+    
+    class Meta:
+        model = SubidaImagen
+        fields = [
+            'id', 'nombre', 'tamano', 'recibidos', 'completada',
+            'tipo', 'ancho', 'alto', 'fecha_creacion'
+        ]
+        read_only_fields = ['id', 'recibidos', 'tipo', 'ancho', 'alto', 'fecha_creacion']
+    
+    def validate_tamano(self, value):
+        # Antes de recibir ningún byte
+        if not 0 < value <= settings.SUBIDA_MAX_BYTES:
+            raise serializers.ValidationError(f"El tamaño debe estar entre 1 y {settings.SUBIDA_MAX_BYTES} bytes")
+        return value
+    
+    def create(self, validated_data):
+        return crear_subida(self.context['request'].user, **validated_data)
+
+
+class AdjuntarImagenSerializer(serializers.Serializer):
+    """
+    Subida terminada que se adjunta a una receta, como imagen principal o en la galería
+    """
+    subida = serializers.UUIDField()
+    galeria = serializers.BooleanField(default=False)
+    descripcion = serializers.CharField(max_length=200, required=False, default='', allow_blank=True)
+    orden = serializers.IntegerField(min_value=0, required=False, default=0)
+    
+    def validate_subida(self, value):
+        subida = SubidaImagen.objects.filter(pk=value, usuario=self.context['request'].user).first()
+        if subida is None:
+            raise serializers.ValidationError("Subida no encontrada")
+        if not subida.completada or not subida.tipo:
+            raise serializers.ValidationError("La subida no está completa")
+        return subida
 
 
 class EstadisticasRecetaSerializer(serializers.Serializer):
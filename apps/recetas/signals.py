@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from apps.usuarios.models import Seguimiento
+
+from .autocompletado import registrar_cambio
+from .feed import quitar_autor, rellenar_timeline, repartir_receta
+from .ingredientes import crear_alias_faltantes
+from .models import Favorito, Ingrediente, Receta
+
+
+@receiver(post_save, sender=Ingrediente)
+@receiver(post_delete, sender=Ingrediente)
+def ingrediente_modificado(sender, instance, **kwargs):
+    """
+    Recarga incremental del autocompletado. El uso en recetas no envía cambios (un
+    receptor en RecetaIngrediente haría que borrar recetas cargase cada fila): se
+    actualiza con la reconstrucción periódica.
+    """
+    # Tras el commit, para que los demás procesos recarguen el dato definitivo;
+    # el pk se copia antes porque delete() lo pone a None
+    pk = instance.pk
+    transaction.on_commit(lambda: registrar_cambio(pk))
+
+
+@receiver(post_save, sender=Ingrediente)
+def alias_nombre_ingrediente(sender, instance, raw=False, **kwargs):
+    """El nombre (también tras renombrar) resuelve al ingrediente en las búsquedas"""
+    if not raw:
+        crear_alias_faltantes([instance])
+
+
+@receiver(post_save, sender=Receta)
+def receta_publicada(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Reparte al feed de los seguidores al crearla publicada o al publicar un borrador"""
+    if raw or (update_fields is not None and 'publicada' not in update_fields):
+        return
+    publicada_antes = getattr(instance, '_publicada_guardada', False)
+    instance._publicada_guardada = instance.publicada
+    if instance.publicada and not publicada_antes:
+        pk, autor_id = instance.pk, instance.autor_id
+        transaction.on_commit(lambda: repartir_receta(pk, autor_id))
+
+
+@receiver(post_save, sender=Seguimiento)
+def seguimiento_creado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rellenar_timeline(instance.seguidor_id, instance.seguido_id)
+
+
+@receiver(post_delete, sender=Seguimiento)
+def seguimiento_borrado(sender, instance, **kwargs):
+    quitar_autor(instance.seguidor_id, instance.seguido_id)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def descontar_favoritos_usuario(sender, instance, **kwargs):
+    """Sus favoritos se borran en cascada sin pasar por favoritos.quitar_favoritos"""
+    # Tras una baja ya están descontados (bajas.dar_de_baja)
+    Receta.objects.filter(
+        pk__in=Favorito.objects.filter(usuario=instance, usuario__fecha_baja__isnull=True).values('receta_id')
+    ).update(total_favoritos=F('total_favoritos') - 1)
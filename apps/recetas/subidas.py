@@ -0,0 +1,195 @@
+"""
+Subida de imágenes por bloques, reanudable.
+
+POST /subidas/ {"tamano": ..., "nombre": ...} crea la subida, y cada bloque llega en
+un PUT /subidas/<id>/ con ``Content-Range: bytes <inicio>-<fin>/<tamano>``. El cuerpo
+se copia al archivo temporal de la subida (``SUBIDAS_DIR``) de 64 KB en 64 KB, sin
+pasar por los parsers ni tenerlo entero en memoria. El tipo y las dimensiones se leen
+de la cabecera de la imagen en cuanto llega, así que un archivo que no es una imagen
+admitida o que es demasiado grande se rechaza en el primer bloque. Si la conexión se
+corta, GET /subidas/<id>/ devuelve ``recibidos`` y el cliente sigue desde ese byte.
+
+Al completarse se calcula su sha256 (una lectura secuencial del archivo), y POST
+/recetas/<id>/imagen/ la pasa al almacenamiento de media como imagen principal o de la
+galería; si ya se había subido esa misma foto no se copia otra vez (``apps.core.archivos``).
+"""
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.core.imagenes import FORMATOS, ImagenNoValida, leer_cabecera
+from apps.core.storage import resumen_sha256
+from .models import ImagenReceta, SubidaImagen
+
+TAMANO_LECTURA = 64 * 1024
+
+# Si con estos bytes aún no se reconoce la cabecera, no es una imagen admitida
+BYTES_CABECERA = 256 * 1024
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+
+
+class SubidaRechazada(Exception):
+
+    def __init__(self, mensaje, estado=400):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+def _borrar_archivo(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def borrar_archivos(pks):
+    """Borra los archivos temporales de las subidas ``pks``, ya borradas"""
+    for pk in pks:
+        _borrar_archivo(SubidaImagen(pk=pk).ruta)
+
+
+def crear_subida(usuario, tamano, nombre=''):
+    """Registra la subida y crea su archivo temporal vacío"""
+    os.makedirs(settings.SUBIDAS_DIR, exist_ok=True)
+    subida = SubidaImagen.objects.create(usuario=usuario, tamano=tamano, nombre=nombre)
+    open(subida.ruta, 'xb').close()
+    return subida
+
+
+def cancelar_subida(subida):
+    ruta = subida.ruta
+    subida.delete()
+    transaction.on_commit(lambda: _borrar_archivo(ruta))
+
+
+def parsear_rango(cabecera, longitud, subida):
+    """(inicio, bytes) del bloque según Content-Range y Content-Length"""
+    try:
+        longitud = int(longitud)
+    except (TypeError, ValueError):
+        raise SubidaRechazada("Falta Content-Length", estado=411)
+    rango = CONTENT_RANGE.fullmatch(cabecera or '')
+    if rango is None:
+        raise SubidaRechazada("Falta Content-Range: bytes <inicio>-<fin>/<tamaño>")
+    inicio, fin, total = (int(valor) for valor in rango.groups())
+    if total != subida.tamano or fin < inicio or fin >= total:
+        raise SubidaRechazada(f"Rango no válido para una imagen de {subida.tamano} bytes")
+    if fin - inicio + 1 > settings.SUBIDA_MAX_BLOQUE:
+        raise SubidaRechazada(f"Como máximo {settings.SUBIDA_MAX_BLOQUE} bytes por bloque", estado=413)
+    if longitud != fin - inicio + 1:
+        raise SubidaRechazada("Content-Length no coincide con Content-Range")
+    if inicio != subida.recibidos:
+        raise SubidaRechazada(f"Se esperaba el bloque que empieza en el byte {subida.recibidos}", estado=409)
+    return inicio, fin - inicio + 1
+
+
+def validar_cabecera(subida):
+    """Lee tipo y dimensiones de lo recibido; cancela la subida si no son válidos"""
+    try:
+        cabecera = leer_cabecera(subida.ruta)
+    except ImagenNoValida as error:
+        cancelar_subida(subida)
+        raise SubidaRechazada(str(error))
+    if cabecera is None:
+        if subida.recibidos >= min(BYTES_CABECERA, subida.tamano):
+            cancelar_subida(subida)
+            raise SubidaRechazada(f"El archivo no es una imagen {', '.join(FORMATOS)}")
+        return
+    formato, ancho, alto = cabecera
+    if ancho * alto > settings.SUBIDA_MAX_PIXELES:
+        cancelar_subida(subida)
+        raise SubidaRechazada(f"La imagen tiene más de {settings.SUBIDA_MAX_PIXELES} píxeles")
+    subida.tipo, subida.ancho, subida.alto = FORMATOS[formato], ancho, alto
+    SubidaImagen.objects.filter(pk=subida.pk).update(tipo=subida.tipo, ancho=ancho, alto=alto)
+
+
+def escribir_bloque(subida, flujo, inicio, longitud):
+    """
+    Copia ``longitud`` bytes de ``flujo`` al archivo temporal a partir de ``inicio``.
+    Si el bloque llega cortado se guarda lo recibido: el cliente reanuda desde ahí.
+    """
+    # Reserva el bloque antes de escribirlo: un reintento del mismo bloque mientras
+    # el primero sigue llegando no pisa sus bytes
+    ahora = timezone.now()
+    reserva = ahora + timedelta(seconds=settings.SUBIDA_BLOQUE_SEGUNDOS)
+    libre = Q(escribiendo_hasta__isnull=True) | Q(escribiendo_hasta__lt=ahora)
+    if not SubidaImagen.objects.filter(libre, pk=subida.pk, recibidos=inicio).update(escribiendo_hasta=reserva):
+        raise SubidaRechazada("El bloque ya se está recibiendo o se había recibido", estado=409)
+
+    escritos = 0
+    try:
+        with open(subida.ruta, 'r+b') as destino:
+            destino.seek(inicio)
+            while escritos < longitud:
+                try:
+                    bloque = flujo.read(min(TAMANO_LECTURA, longitud - escritos))
+                except OSError:
+                    bloque = b''
+                if not bloque:
+                    break
+                destino.write(bloque)
+                escritos += len(bloque)
+    except FileNotFoundError:
+        subida.delete()
+        raise SubidaRechazada("La subida ha caducado", estado=410)
+    finally:
+        # Libera la reserva (si no ha caducado y es de otro) y avanza lo escrito
+        SubidaImagen.objects.filter(pk=subida.pk, escribiendo_hasta=reserva).update(
+            recibidos=inicio + escritos, escribiendo_hasta=None, fecha_actualizacion=timezone.now()
+        )
+    subida.recibidos = inicio + escritos
+
+    if not subida.tipo:
+        validar_cabecera(subida)
+    if subida.completada:
+        with open(subida.ruta, 'rb') as archivo:
+            subida.sha256 = resumen_sha256(File(archivo))
+        SubidaImagen.objects.filter(pk=subida.pk).update(sha256=subida.sha256)
+    if escritos < longitud:
+        raise SubidaRechazada(f"Bloque incompleto: recibidos {escritos} de {longitud} bytes")
+    return subida
+
+
+def adjuntar(subida, receta, galeria=False, descripcion='', orden=0):
+    """
+    Guarda la imagen completa como principal de ``receta`` o en su galería y borra
+    la subida. La principal se reduce al guardarla, salvo si ya estaba guardada.
+    """
+    nombre = f"{os.path.splitext(subida.nombre)[0] or 'imagen'}.{subida.tipo.partition('/')[2]}"
+    with transaction.atomic():
+        # Dos peticiones con la misma subida: la segunda ya no la encuentra
+        if not SubidaImagen.objects.select_for_update().filter(pk=subida.pk).exists():
+            raise SubidaRechazada("La subida ya se ha usado", estado=409)
+        with open(subida.ruta, 'rb') as archivo:
+            contenido = File(archivo, name=nombre)
+            if subida.sha256:
+                contenido.sha256 = subida.sha256
+            if galeria:
+                resultado = ImagenReceta(receta=receta, descripcion=descripcion, orden=orden)
+                resultado.imagen.save(nombre, contenido, save=True)
+            else:
+                receta.imagen_principal.save(nombre, contenido, save=False)
+                receta.save(update_fields=['imagen_principal', 'fecha_actualizacion'])
+                resultado = receta
+        cancelar_subida(subida)
+    return resultado
+
+
+def limpiar_subidas(horas=None, lote=500):
+    """Borra las subidas sin terminar ni adjuntar que no se han tocado en ``horas``"""
+    limite = timezone.now() - timedelta(hours=horas or settings.SUBIDA_CADUCIDAD_HORAS)
+    borradas = 0
+    while True:
+        pks = list(SubidaImagen.objects.filter(fecha_actualizacion__lt=limite).values_list('pk', flat=True)[:lote])
+        if not pks:
+            return borradas
+        with transaction.atomic():
+            borradas += SubidaImagen.objects.filter(pk__in=pks).delete()[0]
+        borrar_archivos(pks)
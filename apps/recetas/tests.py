@@ -1,3 +1,1019 @@
-from django.test import TestCase
+import re
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from apps.core.benchmark import rutas_get
+from apps.core.renderers import EXT_UUID, _msgpack_ext, msgpack
+from .api_urls import router
+from .autocompletado import invalidar_indice
+from .generador import ConfiguracionDataset, PREFIJO_USUARIO, generar_dataset
+from .models import (
+    AliasIngrediente, Categoria, EntradaFeed, EventoVista, Favorito, ImagenReceta, Ingrediente, Rating, Receta,
+    RecetaIngrediente, RecetaSimilar, SubidaImagen, UsoFiltro, VistasDia, VistasHora
+)
+from apps.usuarios.seguimiento import dejar_de_seguir, seguir
+from .minhash import calcular_firma, similitud_estimada, vecinos_de_receta
+from .recomendaciones import calcular_similares
+from .registro_vistas import RegistroVistas, agregar_vistas, categorizar_origen, podar_eventos
+from .serializers import RatingSerializer
+from .subidas import BYTES_CABECERA, escribir_bloque
+from .uso_filtros import registro_filtros
+
+User = get_user_model()
+
+DATASET_PEQUENO = ConfiguracionDataset(
+    usuarios=8, categorias=4, ingredientes=20, recetas=30,
+    ratings=60, favoritos=60, vistas=500, semilla=1
+)
+DATASET_GRANDE = ConfiguracionDataset(
+    usuarios=40, categorias=8, ingredientes=60, recetas=150,
+    ratings=600, favoritos=600, vistas=5000, semilla=2
+)
+
+# Rutas con parámetros que ejercitan filtros costosos, además de las del router
+RUTAS_FILTRADAS = {
+    'recetas-list-ingredientes': ('receta-list', 'ingredientes=Pollo,Ajo'),
+    'recetas-list-tiempo-total': ('receta-list', 'tiempo_total_max=45&ordering=-vistas'),
+    'recetas-list-rapidas': ('receta-list', 'tiempo_total_max=30&ordering=tiempo_total'),
+    'recetas-list-rating': ('receta-list', 'ordering=-rating_promedio'),
+    'recetas-buscar-por-ingredientes': ('receta-buscar-por-ingredientes', 'ingredientes=Tomate,Cebolla'),
+    'ingredientes-list-busqueda': ('ingrediente-list', 'search=a'),
+}
+
+
+# Sin volcados del registro de filtros a mitad de una medición
+@override_settings(USO_FILTROS_VOLCADO_SEGUNDOS=3600)
+class ConsultasConstantesTests(TestCase):
+    """
+    El número de consultas por endpoint no debe depender del tamaño del dataset
+    ni del contenido de la página (detecta N+1 y subconsultas por fila).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+
+    def medir_endpoints(self):
+        """Número de consultas de cada endpoint GET de la API de recetas"""
+        consultas = {}
+        rutas = dict(rutas_get(router, self.client))
+        for nombre, (ruta, parametros) in RUTAS_FILTRADAS.items():
+            rutas[nombre] = f"{reverse(ruta)}?{parametros}"
+
+        for nombre, url in rutas.items():
+            with CaptureQueriesContext(connection) as contexto:
+                respuesta = self.client.get(url)
+            # Las rutas que requieren autenticación responden 403 a anónimos
+            self.assertIn(respuesta.status_code, (200, 403), f"{nombre}: {url}")
+            consultas[nombre] = len(contexto.captured_queries)
+        return consultas
+
+    def medir_escrituras(self, usuario):
+        """Consultas de valorar y toggle_favorito sobre la receta más y menos popular"""
+        recetas = Receta.objects.con_estadisticas().publicadas().exclude(autor=usuario)
+        elegidas = [recetas.order_by('-total_favoritos').first(), recetas.order_by('total_favoritos').first()]
+        # Mismo punto de partida en ambas: sin valoración ni favorito del usuario
+        Rating.objects.filter(usuario=usuario, receta__in=elegidas).delete()
+        Favorito.objects.filter(usuario=usuario, receta__in=elegidas).delete()
+
+        consultas = []
+        for receta in elegidas:
+            for accion, datos in (('valorar', {'puntuacion': 4}), ('toggle-favorito', {})):
+                url = reverse(f'receta-{accion}', kwargs={'pk': receta.pk})
+                with CaptureQueriesContext(connection) as contexto:
+                    respuesta = self.client.post(url, datos)
+                self.assertEqual(respuesta.status_code, 200, url)
+                consultas.append(len(contexto.captured_queries))
+        return consultas
+
+    def comparar_tamanos(self, autenticado):
+        usuario = User.objects.filter(username__startswith=PREFIJO_USUARIO).order_by('username').first()
+        if autenticado:
+            self.client.force_login(usuario)
+
+        pequeno = self.medir_endpoints()
+        generar_dataset(DATASET_GRANDE)
+        grande = self.medir_endpoints()
+
+        self.assertEqual(set(pequeno), set(grande))
+        for nombre in pequeno:
+            with self.subTest(endpoint=nombre):
+                self.assertEqual(
+                    grande[nombre], pequeno[nombre],
+                    f"{nombre}: {pequeno[nombre]} consultas con el dataset pequeño "
+                    f"y {grande[nombre]} con el grande"
+                )
+        return usuario
+
+    def test_consultas_constantes_anonimo(self):
+        self.comparar_tamanos(autenticado=False)
+
+    def test_consultas_constantes_autenticado(self):
+        usuario = self.comparar_tamanos(autenticado=True)
+        valorar_popular, favorito_popular, valorar_nueva, favorito_nueva = self.medir_escrituras(usuario)
+        self.assertEqual(valorar_popular, valorar_nueva)
+        self.assertEqual(favorito_popular, favorito_nueva)
+
+
+class PlanesDeConsultaTests(TestCase):
+    """
+    Las consultas principales deben resolverse con los índices de Receta.Meta.indexes
+    y no con un recorrido completo de la tabla.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_GRANDE)
+        # Estadísticas del planificador, como en una base de datos en producción
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+            elif connection.vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {Receta._meta.db_table}')
+
+    def indice(self, *campos):
+        for indice in Receta._meta.indexes:
+            if tuple(indice.fields) == campos:
+                return indice.name
+        self.fail(f"No existe un índice sobre {campos}")
+
+    def assertUsaIndice(self, queryset, nombre_indice):
+        plan = queryset.explain()
+        self.assertIn(nombre_indice, plan, plan)
+        if connection.vendor == 'sqlite':
+            tabla = Receta._meta.db_table
+            recorridos = [
+                linea for linea in plan.splitlines()
+                if re.search(rf'\bSCAN {tabla}\b', linea) and 'INDEX' not in linea
+            ]
+            self.assertEqual(recorridos, [], plan)
+        elif connection.vendor == 'mysql':
+            self.assertNotRegex(plan, r'\bALL\b', plan)
+
+    def test_listado_publicadas_usa_indice_por_fecha(self):
+        queryset = Receta.objects.select_related(
+            'autor', 'categoria'
+        ).con_estadisticas().visibles_para(None).order_by('-fecha_creacion')[:20]
+        self.assertUsaIndice(queryset, self.indice('publicada', '-fecha_creacion'))
+
+    def test_recetas_de_categoria_usan_indice_compuesto(self):
+        categoria = Categoria.objects.first()
+        queryset = Receta.objects.filter(categoria=categoria).publicadas().con_estadisticas()
+        self.assertUsaIndice(queryset, self.indice('categoria', 'publicada'))
+
+    def test_recetas_de_autor_usan_indice_por_fecha(self):
+        autor = User.objects.filter(username__startswith=PREFIJO_USUARIO).first()
+        queryset = Receta.objects.filter(autor=autor).order_by('-fecha_creacion')
+        self.assertUsaIndice(queryset, self.indice('autor', '-fecha_creacion'))
+
+    def test_rapidas_primero_usan_indice_por_tiempo_total(self):
+        queryset = Receta.objects.con_estadisticas().visibles_para(None).filter(
+            tiempo_total__lte=30
+        ).order_by('tiempo_total')[:20]
+        self.assertUsaIndice(queryset, self.indice('publicada', 'tiempo_total'))
+
+
+class UsoFiltrosTests(TestCase):
+    """Registro del uso de filtros del listado y recomendaciones de índices"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+
+    def setUp(self):
+        registro_filtros.volcar()
+        UsoFiltro.objects.all().delete()
+
+    def test_agrupa_por_combinacion_y_no_por_valores(self):
+        for consulta in ('dificultad=facil&ordering=-vistas', 'dificultad=dificil&ordering=-vistas', 'porciones_min=2'):
+            self.client.get(f'/api/v1/recetas/?{consulta}')
+        self.client.get('/api/v1/async/recetas/?dificultad=intermedio&ordering=-vistas')
+        registro_filtros.volcar()
+
+        uso = UsoFiltro.objects.get(firma='dificultad|-vistas')
+        self.assertEqual(uso.usos, 3)
+        self.assertEqual(uso.ejemplo, 'dificultad=intermedio&ordering=-vistas')
+        self.assertGreater(uso.latencia_max_ms, 0)
+        self.assertEqual(UsoFiltro.objects.get(firma='porciones_min|').usos, 1)
+
+    def test_recomienda_indice_compuesto(self):
+        self.client.get('/api/v1/recetas/?dificultad=facil&ordering=-vistas')
+        self.client.get('/api/v1/recetas/?tiempo_total_max=30&ordering=tiempo_total')
+        registro_filtros.volcar()
+
+        salida = StringIO()
+        call_command('recomendar_indices', stdout=salida)
+        self.assertIn("models.Index(fields=['publicada', 'dificultad', '-vistas'])", salida.getvalue())
+        # (publicada, tiempo_total) ya existe
+        self.assertEqual(salida.getvalue().count('propuesta'), 1)
+
+
+class AutocompletadoIngredientesTests(TestCase):
+    """Índice de prefijos en memoria de /ingredientes/autocompletar/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        receta = Receta.objects.first()
+        for nombre, categoria in (('Jalapeño', 'verdura'), ('Jamón serrano', 'proteina'), ('Pimienta de Jamaica', 'condimento')):
+            Ingrediente.objects.create(nombre=nombre, categoria_ingrediente=categoria)
+        RecetaIngrediente.objects.create(
+            receta=receta, ingrediente=Ingrediente.objects.get(nombre='Jamón serrano'), cantidad='100 g'
+        )
+
+    def setUp(self):
+        cache.clear()
+        invalidar_indice()
+
+    def sugerencias(self, q):
+        respuesta = self.client.get(f'/api/v1/ingredientes/autocompletar/?q={q}')
+        self.assertEqual(respuesta.status_code, 200)
+        return [ingrediente['nombre'] for ingrediente in respuesta.json()]
+
+    def test_prefijo_sin_acentos_ordenado_por_uso(self):
+        self.assertEqual(self.sugerencias('JALAPE'), ['Jalapeño'])
+        self.assertEqual(self.sugerencias('jamon'), ['Jamón serrano'])
+        # Primero los que empiezan por el prefijo (por uso), luego los de otra palabra
+        self.assertEqual(self.sugerencias('ja')[:3], ['Jamón serrano', 'Jalapeño', 'Pimienta de Jamaica'])
+        self.assertEqual(self.sugerencias(''), [])
+
+    def test_sin_consultas_una_vez_construido(self):
+        self.sugerencias('ja')
+        with self.assertNumQueries(0):
+            self.sugerencias('pim')
+
+    def test_recarga_incremental_al_cambiar_ingredientes(self):
+        self.sugerencias('ja')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingrediente.objects.create(nombre='Jengibre', categoria_ingrediente='condimento')
+            Ingrediente.objects.filter(nombre='Jalapeño').get().delete()
+        # Una consulta: solo los ingredientes cambiados
+        with self.assertNumQueries(1):
+            self.assertEqual(self.sugerencias('j'), ['Jamón serrano', 'Jengibre', 'Pimienta de Jamaica'])
+
+
+class AliasIngredientesTests(TestCase):
+    """Búsqueda por claves normalizadas y fusión de ingredientes duplicados"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        cls.recetas = list(Receta.objects.publicadas().order_by('pk')[:3])
+
+    def buscar(self, ingredientes):
+        respuesta = self.client.get(f'/api/v1/recetas/buscar_por_ingredientes/?ingredientes={ingredientes}')
+        self.assertEqual(respuesta.status_code, 200)
+        return {receta['id'] for receta in respuesta.json()}
+
+    def test_plurales_acentos_y_sinonimos(self):
+        tomatillo = Ingrediente.objects.create(nombre='Tomatillo')
+        AliasIngrediente.objects.create(nombre='Miltomate', ingrediente=tomatillo)
+        RecetaIngrediente.objects.create(receta=self.recetas[0], ingrediente=tomatillo, cantidad='3')
+
+        for termino in ('Tomatillo', 'TOMATILLOS', 'miltomates'):
+            with self.subTest(termino=termino):
+                self.assertEqual(self.buscar(termino), {str(self.recetas[0].pk)})
+
+    def test_fusionar_duplicados(self):
+        okra = Ingrediente.objects.create(nombre='Okra')
+        okras = Ingrediente.objects.create(nombre='Okras')
+        RecetaIngrediente.objects.create(receta=self.recetas[0], ingrediente=okra, cantidad='100 g')
+        RecetaIngrediente.objects.create(receta=self.recetas[1], ingrediente=okras, cantidad='200 g')
+        RecetaIngrediente.objects.create(receta=self.recetas[1], ingrediente=okra, cantidad='50 g')
+        RecetaIngrediente.objects.create(receta=self.recetas[2], ingrediente=okras, cantidad='1 taza')
+
+        call_command('fusionar_ingredientes', '--aplicar', stdout=StringIO())
+
+        self.assertFalse(Ingrediente.objects.filter(pk=okras.pk).exists())
+        usos = dict(RecetaIngrediente.objects.filter(ingrediente=okra).values_list('receta', 'cantidad'))
+        self.assertEqual(usos, {
+            self.recetas[0].pk: '100 g', self.recetas[1].pk: '50 g', self.recetas[2].pk: '1 taza'
+        })
+        self.assertEqual(self.buscar('okras'), {str(receta.pk) for receta in self.recetas})
+
+
+class ListaComprasTests(TestCase):
+    """Cantidades estructuradas y /lista-compras/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_GRANDE)
+        cls.recetas = list(Receta.objects.publicadas().order_by('pk'))
+        cls.quinoa = Ingrediente.objects.create(nombre='Quinoa')
+        for receta, cantidad in zip(cls.recetas[:3], ('1 1/2 tazas', '500g', '750 g')):
+            Receta.objects.filter(pk=receta.pk).update(porciones=4)
+            RecetaIngrediente.objects.create(receta=receta, ingrediente=cls.quinoa, cantidad=cantidad)
+
+    def lista(self, recetas):
+        respuesta = self.client.post(
+            '/api/v1/lista-compras/', json.dumps({'recetas': recetas}), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return [i for i in respuesta.json()['ingredientes'] if i['ingrediente_id'] == self.quinoa.pk]
+
+    def test_cantidad_interpretada_al_guardar(self):
+        detalle = RecetaIngrediente.objects.get(receta=self.recetas[0], ingrediente=self.quinoa)
+        self.assertEqual((float(detalle.cantidad_valor), detalle.unidad), (360.0, 'ml'))
+
+    def test_suma_escalada_y_convertida(self):
+        quinoa = self.lista([
+            {'id': str(self.recetas[0].pk), 'porciones': 2},
+            {'id': str(self.recetas[1].pk), 'porciones': 8},
+            {'id': str(self.recetas[2].pk)},
+        ])
+        # 360 ml * 2/4; 500 g * 8/4 + 750 g * 1
+        self.assertEqual(
+            [(i['cantidad'], i['unidad'], i['recetas']) for i in quinoa],
+            [(1.75, 'kg', 2), (180.0, 'ml', 1)]
+        )
+
+    def test_una_consulta_sin_importar_el_numero_de_recetas(self):
+        for n in (2, 40):
+            with self.subTest(recetas=n), self.assertNumQueries(1):
+                self.lista([{'id': str(receta.pk), 'porciones': 6} for receta in self.recetas[:n]])
+
+
+class RecomendacionesTests(TestCase):
+    """Vecinos precalculados, /similares/ y /recomendadas/"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        Favorito.objects.all().delete()
+        Rating.objects.all().delete()
+        cls.a, cls.b, cls.c, cls.d = Receta.objects.publicadas().order_by('pk')[:4]
+        cls.objetivo = User.objects.create_user(username='objetivo', password='x')
+        marcadas = {'u1': [cls.a, cls.b], 'u2': [cls.a, cls.b], 'u3': [cls.a, cls.c], 'u4': [cls.c, cls.d]}
+        for nombre, recetas in marcadas.items():
+            usuario = User.objects.create_user(username=nombre, password='x')
+            Favorito.objects.bulk_create([Favorito(usuario=usuario, receta=receta) for receta in recetas])
+        # Una valoración alta cuenta como afinidad; una baja, no
+        Rating.objects.create(usuario=User.objects.get(username='u3'), receta=cls.b, puntuacion=5)
+        Rating.objects.create(usuario=User.objects.get(username='u4'), receta=cls.a, puntuacion=1)
+        Favorito.objects.create(usuario=cls.objetivo, receta=cls.a)
+
+    def vecinos(self, receta):
+        return list(RecetaSimilar.objects.filter(receta=receta).values_list('similar_id', 'usuarios_comunes'))
+
+    def test_vecinos_con_usuarios_comunes(self):
+        calcular_similares(min_comunes=2)
+        # a~c solo comparten u3; la valoración baja de u4 no los acerca
+        self.assertEqual(self.vecinos(self.a), [(self.b.pk, 3)])
+        self.assertEqual(self.vecinos(self.c), [])
+
+        calcular_similares(min_comunes=1)
+        self.assertEqual([pk for pk, _ in self.vecinos(self.a)], [self.b.pk, self.c.pk])
+
+    def test_resultado_independiente_del_lote(self):
+        calcular_similares(min_comunes=1, lote=500)
+        completo = set(RecetaSimilar.objects.values_list('receta_id', 'similar_id', 'puntuacion'))
+        calcular_similares(min_comunes=1, lote=1)
+        self.assertEqual(set(RecetaSimilar.objects.values_list('receta_id', 'similar_id', 'puntuacion')), completo)
+
+    def test_endpoints(self):
+        calcular_similares(min_comunes=1)
+        respuesta = self.client.get(reverse('receta-similares', kwargs={'pk': self.a.pk}))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([r['id'] for r in respuesta.json()], [str(self.b.pk), str(self.c.pk)])
+
+        self.client.force_login(self.objetivo)
+        with self.assertNumQueries(4):  # sesión, usuario, puntuaciones y recetas
+            respuesta = self.client.get(reverse('receta-recomendadas'))
+        # b y c por su similitud con a; nunca la propia a
+        self.assertEqual([r['id'] for r in respuesta.json()], [str(self.b.pk), str(self.c.pk)])
+
+    def test_sin_historial_recomienda_las_mas_vistas(self):
+        calcular_similares(min_comunes=1)
+        nuevo = User.objects.create_user(username='nuevo', password='x')
+        self.client.force_login(nuevo)
+        respuesta = self.client.get(reverse('receta-recomendadas'), {'limite': 3})
+        esperadas = Receta.objects.publicadas().order_by('-vistas').values_list('pk', flat=True)[:3]
+        self.assertEqual([r['id'] for r in respuesta.json()], [str(pk) for pk in esperadas])
+
+
+class SimilitudContenidoTests(TestCase):
+    """Firmas MinHash, vecinos por LSH y detección de duplicados al crear"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        cls.usuario = User.objects.create_user(username='cocinero', password='x')
+        cls.original = Receta.objects.publicadas().annotate(
+            n=Count('ingredientes_detalle')
+        ).filter(n__gte=3, categoria__isnull=False).order_by('pk').first()
+        cls.ingredientes = list(cls.original.ingredientes_detalle.values_list('ingrediente_id', flat=True))
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def crear(self, titulo, ingredientes, **extra):
+        datos = {
+            'titulo': titulo, 'descripcion': 'd', 'instrucciones': 'i',
+            'categoria': self.original.categoria_id, 'tiempo_preparacion': 10, 'tiempo_coccion': 10,
+            'dificultad': 'facil', 'porciones': 2,
+            'ingredientes': [{'ingrediente_id': pk, 'cantidad': '1'} for pk in ingredientes],
+            **extra,
+        }
+        return self.client.post(reverse('receta-list'), json.dumps(datos), content_type='application/json')
+
+    def test_estimacion_de_jaccard(self):
+        a = calcular_firma(set(range(100)))
+        self.assertEqual(similitud_estimada(a, a), 1.0)
+        self.assertLess(similitud_estimada(a, calcular_firma(set(range(1000, 1100)))), 0.1)
+        # Cada estimación tiene un error típico de ~0.06 con 64 hashes; la media, ~0.02
+        estimaciones = [
+            similitud_estimada(calcular_firma(set(range(i, i + 100))), calcular_firma(set(range(i + 20, i + 120))))
+            for i in range(0, 10000, 1000)
+        ]
+        self.assertAlmostEqual(sum(estimaciones) / len(estimaciones), 80 / 120, delta=0.07)
+
+    def test_duplicado_rechazado_salvo_confirmacion(self):
+        respuesta = self.crear(self.original.titulo.upper(), self.ingredientes)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([d['id'] for d in respuesta.json()['duplicadas']], [str(self.original.pk)])
+
+        # Mismos ingredientes con otro título, o confirmando el duplicado: se crea
+        self.assertEqual(self.crear('Algo completamente distinto', self.ingredientes).status_code, 201)
+        self.assertEqual(
+            self.crear(self.original.titulo, self.ingredientes, permitir_duplicado=True).status_code, 201
+        )
+
+    def test_similares_por_contenido_para_recetas_nuevas(self):
+        self.crear('Versión nueva', self.ingredientes)
+        nueva = Receta.objects.get(titulo='Versión nueva')
+        respuesta = self.client.get(reverse('receta-similares', kwargs={'pk': nueva.pk}))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()[0]['id'], str(self.original.pk))
+
+        # La firma sigue a los ingredientes al editar
+        otros = Ingrediente.objects.exclude(pk__in=self.ingredientes).values_list('pk', flat=True)[:4]
+        self.client.patch(
+            reverse('receta-detail', kwargs={'pk': nueva.pk}),
+            json.dumps({'ingredientes': [{'ingrediente_id': pk, 'cantidad': '1'} for pk in otros]}),
+            content_type='application/json'
+        )
+        self.assertNotIn(self.original.pk, dict(vecinos_de_receta(nueva.pk)))
+
+    def test_vecinos_en_dos_consultas(self):
+        with self.assertNumQueries(2):
+            vecinos_de_receta(self.original.pk)
+
+
+class FeedTests(TestCase):
+    """Fan-out al publicar, fan-out al leer para autores populares y paginación"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        cls.lector = User.objects.create_user(username='lector', password='x')
+        cls.autora = User.objects.create_user(username='autora', password='x')
+        cls.categoria = Categoria.objects.first()
+
+    def setUp(self):
+        self.client.force_login(self.lector)
+
+    def publicar(self, titulo, publicada=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Receta.objects.create(
+                titulo=titulo, descripcion='d', instrucciones='i', autor=self.autora,
+                categoria=self.categoria, tiempo_preparacion=5, tiempo_coccion=5,
+                dificultad='facil', porciones=2, publicada=publicada
+            )
+
+    def feed(self, **params):
+        respuesta = self.client.get(reverse('feed-list'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def titulos(self, **params):
+        return [receta['titulo'] for receta in self.feed(**params)['results']]
+
+    def test_reparto_al_publicar(self):
+        antigua = self.publicar('Antes de seguir')
+        seguir(self.lector, self.autora)
+        # Al seguir se copian las recientes del autor
+        self.assertEqual(self.titulos(), ['Antes de seguir'])
+
+        self.publicar('Nueva')
+        borrador = self.publicar('Borrador', publicada=False)
+        self.assertEqual(self.titulos(), ['Nueva', 'Antes de seguir'])
+
+        borrador.publicada = True
+        with self.captureOnCommitCallbacks(execute=True):
+            borrador.save()
+        self.assertEqual(self.titulos()[0], 'Borrador')
+        self.assertEqual(EntradaFeed.objects.filter(usuario=self.lector).count(), 3)
+
+        dejar_de_seguir(self.lector, self.autora)
+        self.assertEqual(self.titulos(), [])
+        self.assertFalse(EntradaFeed.objects.filter(receta=antigua).exists())
+
+    @override_settings(FEED_FANOUT_MAX_SEGUIDORES=0)
+    def test_autores_populares_se_leen_al_pedir_el_feed(self):
+        seguir(self.lector, self.autora)
+        self.publicar('Popular')
+        self.assertFalse(EntradaFeed.objects.exists())
+        self.assertEqual(self.titulos(), ['Popular'])
+
+    def test_paginacion_y_consultas(self):
+        seguir(self.lector, self.autora)
+        for i in range(5):
+            self.publicar(f'Receta {i}')
+        pagina = self.feed(limite=3)
+        self.assertEqual([r['titulo'] for r in pagina['results']], ['Receta 4', 'Receta 3', 'Receta 2'])
+        self.assertEqual(self.titulos(limite=3, antes=pagina['siguiente']), ['Receta 1', 'Receta 0'])
+
+        # Sesión, usuario, timeline y autores populares
+        with self.assertNumQueries(4):
+            self.feed()
+
+    def test_paginacion_con_varios_seguidores(self):
+        # Cada receta tiene una entrada por seguidor: no deben repetirse ni acortar páginas
+        for nombre in ('seguidor_b', 'seguidor_c'):
+            seguir(User.objects.create_user(username=nombre, password='x'), self.autora)
+        seguir(self.lector, self.autora)
+        for i in range(5):
+            self.publicar(f'r{i}')
+        # Misma fecha para todas: desempata el id
+        EntradaFeed.objects.update(fecha=timezone.now())
+
+        vistos, antes = [], None
+        for _pagina in range(3):
+            pagina = self.feed(limite=2, **({'antes': antes} if antes else {}))
+            vistos += [receta['titulo'] for receta in pagina['results']]
+            antes = pagina['siguiente']
+            if antes is None:
+                break
+        self.assertEqual(sorted(vistos), ['r0', 'r1', 'r2', 'r3', 'r4'])
+        self.assertEqual(len(vistos), 5)
+
+        self.assertEqual(self.client.get(reverse('feed-list'), {'antes': 'x,y'}).status_code, 400)
+
+
+class FavoritosTests(TestCase):
+    """PUT/DELETE idempotentes, lote y total_favoritos sincronizado sin COUNT"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        cls.usuario = User.objects.create_user(username='fan', password='x')
+        cls.recetas = list(Receta.objects.publicadas().order_by('pk')[:3])
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def assertContadoresExactos(self):
+        reales = dict(Receta.objects.annotate(n=Count('favoritos')).values_list('pk', 'n'))
+        self.assertEqual(dict(Receta.objects.values_list('pk', 'total_favoritos')), reales)
+
+    def test_put_y_delete_idempotentes(self):
+        receta = self.recetas[0]
+        url = reverse('receta-favorito', kwargs={'pk': receta.pk})
+        inicial = Receta.objects.get(pk=receta.pk).total_favoritos
+
+        primera, segunda = self.client.put(url).json(), self.client.put(url).json()
+        self.assertEqual((primera['cambiado'], segunda['cambiado']), (True, False))
+        self.assertEqual(segunda['total_favoritos'], inicial + 1)
+
+        for _intento in range(2):
+            respuesta = self.client.delete(url).json()
+        self.assertEqual((respuesta['favorito'], respuesta['total_favoritos']), (False, inicial))
+        self.assertContadoresExactos()
+
+    def test_lote(self):
+        Favorito.objects.filter(usuario=self.usuario).delete()
+        a, b, c = (str(receta.pk) for receta in self.recetas)
+        desconocida = '00000000-0000-0000-0000-000000000000'
+        datos = {'agregar': [a, b, desconocida], 'quitar': [c]}
+
+        respuesta = self.client.post(reverse('favorito-lote'), datos, content_type='application/json').json()
+        self.assertEqual(respuesta['agregadas'], sorted([a, b]))
+        self.assertEqual((respuesta['quitadas'], respuesta['desconocidas']), ([], [desconocida]))
+
+        # Reenviar el mismo lote (reintento tras perder la respuesta) no cambia nada
+        respuesta = self.client.post(reverse('favorito-lote'), datos, content_type='application/json').json()
+        self.assertEqual(respuesta['agregadas'], [])
+        self.assertContadoresExactos()
+
+        datos = {'agregar': [a], 'quitar': [a]}
+        self.assertEqual(self.client.post(reverse('favorito-lote'), datos, content_type='application/json').status_code, 400)
+
+    def test_sin_edicion(self):
+        favorito = Favorito.objects.create(usuario=self.usuario, receta=self.recetas[0])
+        url = reverse('favorito-detail', kwargs={'pk': favorito.pk})
+        datos = {'receta_id': str(self.recetas[1].pk)}
+        for metodo in (self.client.put, self.client.patch):
+            self.assertEqual(metodo(url, datos, content_type='application/json').status_code, 405)
+        self.assertEqual(Favorito.objects.get(pk=favorito.pk).receta_id, self.recetas[0].pk)
+
+    def test_contadores_del_generador_toggle_y_borrado_de_usuarios(self):
+        self.assertContadoresExactos()
+        self.client.post(reverse('receta-toggle-favorito', kwargs={'pk': self.recetas[0].pk}))
+        self.client.put(reverse('receta-favorito', kwargs={'pk': self.recetas[1].pk}))
+        self.assertContadoresExactos()
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).first().delete()
+        self.usuario.delete()
+        self.assertContadoresExactos()
+
+    def test_crear_rating_asigna_usuario(self):
+        peticion = SimpleNamespace(user=self.usuario)
+        serializer = RatingSerializer(data={'puntuacion': 4}, context={'request': peticion})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        rating = serializer.save(receta=self.recetas[0])
+        self.assertEqual((rating.usuario, rating.puntuacion), (self.usuario, 4))
+
+
+class RecetasLoteTests(TestCase):
+    """/recetas/lote/: orden pedido, errores por id, límite y consultas constantes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+        cls.recetas = list(Receta.objects.publicadas().order_by('pk'))
+        cls.borrador = Receta.objects.filter(publicada=False).first()
+
+    def lote(self, ids):
+        respuesta = self.client.post(reverse('receta-lote'), {'ids': ids}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()['results']
+
+    def test_orden_y_errores_por_id(self):
+        a, b = str(self.recetas[0].pk), str(self.recetas[1].pk)
+        ids = [b, 'no-es-uuid', a, str(self.borrador.pk), b]
+        resultados = self.lote(ids)
+        self.assertEqual([r['id'] for r in resultados], ids)
+        self.assertEqual([r.get('receta', {}).get('id') for r in resultados], [b, None, a, None, b])
+        self.assertEqual([r.get('error') for r in resultados], [None, 'id no válido', None, 'no encontrada', None])
+        self.assertIn('ingredientes_detalle', resultados[0]['receta'])
+
+        respuesta = self.client.get(reverse('receta-lote'), {'ids': f'{a},{b}'})
+        self.assertEqual([r['id'] for r in respuesta.json()['results']], [a, b])
+
+    def test_no_cuenta_vistas(self):
+        vistas = Receta.objects.get(pk=self.recetas[0].pk).vistas
+        self.lote([str(self.recetas[0].pk)])
+        self.assertEqual(Receta.objects.get(pk=self.recetas[0].pk).vistas, vistas)
+
+    @override_settings(RECETAS_LOTE_MAX=5)
+    def test_limite(self):
+        respuesta = self.client.post(
+            reverse('receta-lote'), {'ids': [str(r.pk) for r in self.recetas[:6]]}, content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_consultas_constantes(self):
+        with CaptureQueriesContext(connection) as pocas:
+            self.lote([str(r.pk) for r in self.recetas[:2]])
+        with CaptureQueriesContext(connection) as muchas:
+            self.lote([str(r.pk) for r in self.recetas[:20]])
+        self.assertEqual(len(pocas), len(muchas))
+
+
+class VistasAsincronasTests(TestCase):
+    """Las vistas de /api/v1/async/ devuelven lo mismo que los ViewSets de DRF"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+
+    def comparar(self, ruta):
+        sincrona = self.client.get(f'/api/v1/{ruta}').json()
+        asincrona = self.client.get(f'/api/v1/async/{ruta}').json()
+        if isinstance(sincrona, dict):
+            for clave in ('next', 'previous', 'vistas', 'fecha_actualizacion'):
+                sincrona.pop(clave, None)
+                asincrona.pop(clave, None)
+        self.assertEqual(asincrona, sincrona, ruta)
+
+    def test_mismas_respuestas(self):
+        usuario = User.objects.filter(username__startswith=PREFIJO_USUARIO).first()
+        for autenticado in (False, True):
+            if autenticado:
+                self.client.force_login(usuario)
+            for ruta in (
+                'recetas/', 'recetas/?page=2', 'recetas/?ordering=-rating_promedio&dificultad=facil',
+                'recetas/?search=tacos', 'recetas/?ingredientes=pollo,ajo', 'recetas/destacadas/',
+                'recetas/mas_vistas/', 'recetas/mejor_valoradas/', 'categorias/', 'ingredientes/?search=po',
+            ):
+                with self.subTest(ruta=ruta, autenticado=autenticado):
+                    self.comparar(ruta)
+
+    async def test_ingredientes_con_el_orm_asincrono(self):
+        receta = await Receta.objects.publicadas().select_related('autor').afirst()
+        tomatillo = await Ingrediente.objects.acreate(nombre='Tomatillo')
+        await AliasIngrediente.objects.acreate(nombre='Miltomate', ingrediente=tomatillo)
+        await RecetaIngrediente.objects.acreate(receta=receta, ingrediente=tomatillo, cantidad='3')
+
+        for termino in ('miltomates', 'tomatil'):
+            with self.subTest(termino=termino):
+                respuesta = await self.async_client.get(f'/api/v1/async/recetas/?ingredientes={termino}')
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual([r['id'] for r in respuesta.json()['results']], [str(receta.pk)])
+
+    def test_detalle_incrementa_vistas(self):
+        receta = Receta.objects.publicadas().first()
+        self.comparar(f'recetas/{receta.pk}/')
+        vistas = Receta.objects.get(pk=receta.pk).vistas
+        respuesta = self.client.get(f'/api/v1/async/recetas/{receta.pk}/')
+        self.assertEqual(respuesta.json()['vistas'], vistas + 1)
+        self.assertEqual(Receta.objects.get(pk=receta.pk).vistas, vistas + 1)
+
+    def test_token_throttling_y_negociacion(self):
+        borrador = Receta.objects.filter(publicada=False).select_related('autor').first()
+        Favorito.objects.get_or_create(usuario=borrador.autor, receta=borrador)
+        token, _creado = Token.objects.get_or_create(user=borrador.autor)
+        url = f'/api/v1/async/recetas/{borrador.pk}/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+        respuesta = self.client.get(url, HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.json()['es_favorito'])
+        invalido = {'HTTP_AUTHORIZATION': 'Token invalido'}
+        sincrona = self.client.get(f'/api/v1/recetas/{borrador.pk}/', **invalido)
+        self.assertEqual(self.client.get(url, **invalido).json(), sincrona.json())
+
+        self.assertEqual(self.client.get('/api/v1/async/categorias/', HTTP_ACCEPT='application/xml').status_code, 406)
+        tasas = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'lectura_anonimo': '1/min'}}
+        with override_settings(THROTTLE_ACTIVO=True, REST_FRAMEWORK=tasas):
+            caches['throttle'].clear()
+            self.assertEqual(self.client.get('/api/v1/async/categorias/')['X-RateLimit-Remaining'], '0')
+            respuesta = self.client.get('/api/v1/async/categorias/')
+            self.assertEqual((respuesta.status_code, respuesta['Retry-After']), (429, '60'))
+
+    @skipUnless(msgpack, "Requiere msgpack")
+    def test_messagepack(self):
+        respuesta = self.client.get('/api/v1/async/recetas/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(respuesta['Content-Type'], 'application/msgpack')
+        datos = msgpack.unpackb(respuesta.content, timestamp=3, ext_hook=_msgpack_ext)
+        self.assertEqual(datos['count'], self.client.get('/api/v1/recetas/').json()['count'])
+
+
+@skipUnless(msgpack, "Requiere msgpack")
+class MessagePackTests(TestCase):
+    """Mismos datos que en JSON, con UUID y fechas como tipos nativos"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generar_dataset(DATASET_PEQUENO)
+
+    def test_listado(self):
+        url = reverse('receta-list')
+        respuesta = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(respuesta['Content-Type'], 'application/msgpack')
+        datos = msgpack.unpackb(respuesta.content, timestamp=3, ext_hook=_msgpack_ext)
+        json_ = self.client.get(url).json()
+        self.assertLess(len(respuesta.content), len(json.dumps(json_)))
+
+        primera, primera_json = datos['results'][0], json_['results'][0]
+        self.assertEqual(primera['id'], primera_json['id'])
+        crudo = msgpack.unpackb(respuesta.content)['results'][0]
+        self.assertEqual(crudo['id'], msgpack.ExtType(EXT_UUID, uuid.UUID(primera_json['id']).bytes))
+        self.assertEqual(primera['fecha_creacion'], parse_datetime(primera_json['fecha_creacion']))
+        self.assertEqual(primera['titulo'], primera_json['titulo'])
+
+    def test_el_texto_de_usuario_sigue_siendo_texto(self):
+        receta = Receta.objects.publicadas().first()
+        titulo, descripcion = str(uuid.uuid4()), '2024-05-01T10:00:00Z'
+        Receta.objects.filter(pk=receta.pk).update(titulo=titulo, descripcion=descripcion)
+        url = reverse('receta-detail', kwargs={'pk': receta.pk})
+        crudo = msgpack.unpackb(self.client.get(url, HTTP_ACCEPT='application/msgpack').content, timestamp=3)
+        self.assertEqual((crudo['titulo'], crudo['descripcion']), (titulo, descripcion))
+        self.assertEqual(crudo['id'], msgpack.ExtType(EXT_UUID, receta.pk.bytes))
+        self.assertIsInstance(crudo['fecha_creacion'], datetime)
+
+    def test_peticion_en_msgpack(self):
+        receta = Receta.objects.publicadas().first()
+        respuesta = self.client.post(
+            reverse('receta-lote'), msgpack.packb({'ids': [msgpack.ExtType(EXT_UUID, receta.pk.bytes)]}),
+            content_type='application/msgpack'
+        )
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.json()['results'][0]['receta']['id'], str(receta.pk))
+
+        invalida = self.client.post(reverse('receta-lote'), b'\xc1', content_type='application/msgpack')
+        self.assertEqual(invalida.status_code, 400)
+
+
+class SubidasImagenTests(TestCase):
+
+    def setUp(self):
+        for ajuste in ('MEDIA_ROOT', 'SUBIDAS_DIR'):
+            directorio = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, directorio)
+            ajustes = override_settings(**{ajuste: directorio})
+            ajustes.enable()
+            self.addCleanup(ajustes.disable)
+        self.autor = User.objects.create_user(username='autor', password='x')
+        self.receta = Receta.objects.create(
+            titulo='Con foto', descripcion='-', instrucciones='-', autor=self.autor,
+            tiempo_preparacion=10, publicada=True
+        )
+        self.client.force_login(self.autor)
+
+    def jpeg(self, ancho=1600, alto=1200):
+        salida = BytesIO()
+        Image.effect_noise((ancho, alto), 64).convert('RGB').save(salida, 'JPEG')
+        return salida.getvalue()
+
+    def crear(self, contenido, nombre='foto.jpg'):
+        respuesta = self.client.post(reverse('subida-list'), {'nombre': nombre, 'tamano': len(contenido)})
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()['id']
+
+    def enviar(self, pk, contenido, inicio, fin):
+        return self.client.put(
+            reverse('subida-detail', kwargs={'pk': pk}), contenido[inicio:fin + 1],
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE=f'bytes {inicio}-{fin}/{len(contenido)}'
+        )
+
+    def test_subida_por_bloques_y_reanudacion(self):
+        contenido = self.jpeg()
+        pk = self.crear(contenido)
+        mitad = len(contenido) // 2
+
+        primera = self.enviar(pk, contenido, 0, mitad - 1)
+        self.assertEqual(primera.status_code, 200, primera.content)
+        # Tipo y dimensiones de la cabecera, con media imagen
+        self.assertEqual(
+            {clave: primera.json()[clave] for clave in ('recibidos', 'completada', 'tipo', 'ancho', 'alto')},
+            {'recibidos': mitad, 'completada': False, 'tipo': 'image/jpeg', 'ancho': 1600, 'alto': 1200}
+        )
+
+        # Un bloque repetido o fuera de orden dice desde dónde seguir
+        repetido = self.enviar(pk, contenido, 0, mitad - 1)
+        self.assertEqual(repetido.status_code, 409)
+        self.assertEqual(repetido.json()['recibidos'], mitad)
+        self.assertEqual(self.client.get(reverse('subida-detail', kwargs={'pk': pk})).json()['recibidos'], mitad)
+
+        segunda = self.enviar(pk, contenido, mitad, len(contenido) - 1)
+        self.assertTrue(segunda.json()['completada'])
+        with open(SubidaImagen.objects.get(pk=pk).ruta, 'rb') as archivo:
+            self.assertEqual(archivo.read(), contenido)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(reverse('receta-imagen', kwargs={'pk': self.receta.pk}), {'subida': pk})
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.receta.refresh_from_db()
+        with Image.open(self.receta.imagen_principal.path) as imagen:
+            self.assertEqual(imagen.size, (800, 600))
+        self.assertFalse(SubidaImagen.objects.exists())
+        self.assertEqual(os.listdir(settings.SUBIDAS_DIR), [])
+
+    def test_reintento_mientras_llega_el_bloque(self):
+        contenido = self.jpeg()
+        pk = self.crear(contenido)
+        reintentos = []
+        test = self
+
+        class Flujo(BytesIO):
+            # Con el bloque a medio llegar, el cliente lo reenvía con otros bytes
+            def read(self, n=-1):
+                if not reintentos:
+                    reintentos.append(test.enviar(pk, bytes(len(contenido)), 0, len(contenido) - 1))
+                return super().read(n)
+
+        escribir_bloque(SubidaImagen.objects.get(pk=pk), Flujo(contenido), 0, len(contenido))
+        self.assertEqual(reintentos[0].status_code, 409)
+        subida = SubidaImagen.objects.get(pk=pk)
+        self.assertTrue(subida.completada)
+        self.assertIsNone(subida.escribiendo_hasta)
+        with open(subida.ruta, 'rb') as archivo:
+            self.assertEqual(archivo.read(), contenido)
+
+    def test_rechazo_temprano(self):
+        grande = self.client.post(reverse('subida-list'), {'tamano': settings.SUBIDA_MAX_BYTES + 1})
+        self.assertEqual(grande.status_code, 400)
+
+        # No es una imagen: se rechaza con el primer bloque, sin esperar al resto
+        contenido = os.urandom(2 * BYTES_CABECERA)
+        pk = self.crear(contenido, 'foto.jpg')
+        respuesta = self.enviar(pk, contenido, 0, BYTES_CABECERA - 1)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(SubidaImagen.objects.filter(pk=pk).exists())
+
+        contenido = self.jpeg()
+        pk = self.crear(contenido)
+        with override_settings(SUBIDA_MAX_PIXELES=1000 * 1000):
+            self.assertEqual(self.enviar(pk, contenido, 0, 1023).status_code, 400)
+        with override_settings(SUBIDA_MAX_BLOQUE=1024):
+            pk = self.crear(contenido)
+            self.assertEqual(self.enviar(pk, contenido, 0, 2047).status_code, 413)
+
+    def test_galeria_solo_del_autor(self):
+        contenido = self.jpeg(400, 300)
+        pk = self.crear(contenido)
+        self.enviar(pk, contenido, 0, len(contenido) - 1)
+        url = reverse('receta-imagen', kwargs={'pk': self.receta.pk})
+
+        otro = User.objects.create_user(username='otro', password='x')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.post(url, {'subida': pk, 'galeria': True}).status_code, 403)
+
+        self.client.force_login(self.autor)
+        respuesta = self.client.post(url, {'subida': pk, 'galeria': True, 'descripcion': 'Emplatado'})
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        imagen = ImagenReceta.objects.get(receta=self.receta)
+        self.assertEqual(imagen.descripcion, 'Emplatado')
+        self.assertEqual(imagen.imagen.size, len(contenido))
+        self.assertEqual(self.client.post(url, {'subida': pk}).status_code, 400)
+
+
+class RegistroVistasTests(TestCase):
+    """Eventos de vista en lote, agregados incrementales y poda de los antiguos"""
+
+    def setUp(self):
+        self.autor = User.objects.create_user(username='autor', password='x')
+        self.receta = Receta.objects.create(
+            titulo='Vista', descripcion='-', instrucciones='-', autor=self.autor,
+            tiempo_preparacion=10, publicada=True
+        )
+        # Un registro propio: el del proceso acumula vistas de otras pruebas
+        self.registro = RegistroVistas()
+        for modulo in ('views', 'async_views'):
+            parche = mock.patch(f'apps.recetas.{modulo}.registro_vistas', self.registro)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def eventos(self, *horas_atras):
+        ahora = timezone.now()
+        EventoVista.objects.bulk_create([
+            EventoVista(receta=self.receta, fecha=fecha, ingesta=fecha, origen='directo')
+            for fecha in (ahora - timedelta(hours=horas) for horas in horas_atras)
+        ])
+
+    def test_categoriza_el_referer(self):
+        casos = {
+            None: 'directo',
+            'https://testserver/recetas/': 'interno',
+            'https://www.google.es/search?q=tortilla': 'buscador',
+            'https://l.instagram.com/': 'social',
+            'https://t.co/abc': 'social',
+            'https://blog.example.com/receta': 'externo',
+        }
+        for referer, origen in casos.items():
+            self.assertEqual(categorizar_origen(referer, 'testserver'), origen, referer)
+
+    def test_vistas_se_insertan_en_lote(self):
+        self.client.force_login(self.autor)
+        self.client.get(f'/api/v1/recetas/{self.receta.pk}/', HTTP_REFERER='https://www.bing.com/')
+        self.client.get(f'/api/v1/async/recetas/{self.receta.pk}/')
+        self.assertFalse(EventoVista.objects.exists())
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(self.registro.volcar(), 2)
+        self.assertEqual([q['sql'].split()[0] for q in consultas].count('INSERT'), 1)
+        self.assertEqual(
+            sorted(EventoVista.objects.values_list('origen', 'usuario_id')),
+            [('buscador', self.autor.pk), ('directo', self.autor.pk)]
+        )
+
+    def test_agregado_incremental(self):
+        self.eventos(30, 1, 1, 0)
+        # El último evento está dentro del margen: queda para la siguiente pasada
+        self.assertEqual(agregar_vistas(lote=2, margen_segundos=600), 3)
+        self.assertEqual(sum(VistasHora.objects.values_list('vistas', flat=True)), 3)
+        self.assertEqual(VistasHora.objects.count(), 2)
+
+        self.eventos(1)
+        self.assertEqual(agregar_vistas(lote=2, margen_segundos=0), 2)
+        self.assertEqual(agregar_vistas(margen_segundos=0), 0)
+        self.assertEqual(sum(VistasDia.objects.values_list('vistas', flat=True)), 5)
+        hora = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        self.assertEqual(VistasHora.objects.get(hora=hora).vistas, 3)
+
+    def test_margen_desde_el_volcado(self):
+        # Una vista que esperó en memoria más que el margen entra con ids nuevos: hasta
+        # que pase el margen desde su volcado puede haber un INSERT anterior sin confirmar
+        self.registro._pendiente.append((self.receta.pk, None, timezone.now() - timedelta(hours=1), 'directo'))
+        self.registro.volcar()
+        self.assertEqual(agregar_vistas(margen_segundos=600), 0)
+        self.assertEqual(agregar_vistas(margen_segundos=0), 1)
+
+    def test_poda_solo_los_sumados(self):
+        self.eventos(24 * 40, 24 * 40, 1)
+        agregar_vistas(margen_segundos=0)
+        self.eventos(24 * 40)
+        self.assertEqual(podar_eventos(dias=30, lote=1), 2)
+        # El antiguo sin sumar se conserva hasta la próxima pasada
+        self.assertEqual(EventoVista.objects.count(), 2)
+        self.assertEqual(sum(VistasDia.objects.values_list('vistas', flat=True)), 3)
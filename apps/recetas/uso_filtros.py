@@ -0,0 +1,102 @@
+"""
+Registro de qué combinaciones de filtros y orden se usan en el listado de recetas.
+
+Cada petición solo suma en memoria; cada ``USO_FILTROS_VOLCADO_SEGUNDOS`` el proceso
+vuelca lo acumulado a ``UsoFiltro`` con un UPDATE por combinación, de modo que el
+registro no añade escrituras a cada petición y ``recomendar_indices`` puede leer el
+uso de todos los workers.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.http import urlencode
+
+from .filters import COLUMNAS_FILTRO
+from .models import UsoFiltro
+
+PARAMETROS_REGISTRADOS = set(COLUMNAS_FILTRO) | {'search'}
+
+
+def firma_consulta(params):
+    """
+    (firma, filtros, ordenacion, ejemplo) de una query string: solo cuentan los
+    filtros con valor, no sus valores, para agrupar consultas equivalentes
+    """
+    filtros = sorted(
+        nombre for nombre in PARAMETROS_REGISTRADOS if params.get(nombre, '') != ''
+    )
+    ordenacion = ','.join(
+        campo.strip() for campo in params.get('ordering', '').split(',') if campo.strip()
+    )
+    ejemplo = urlencode(
+        [(nombre, params.get(nombre)) for nombre in filtros]
+        + ([('ordering', ordenacion)] if ordenacion else [])
+    )[:500]
+    filtros = ','.join(filtros)
+    return f'{filtros}|{ordenacion}', filtros, ordenacion, ejemplo
+
+
+class RegistroUsoFiltros:
+    """Acumulador del proceso, seguro entre hilos"""
+
+    def __init__(self):
+        self._pendiente = {}
+        self._lock = threading.Lock()
+        self._ultimo_volcado = time.monotonic()
+
+    def registrar(self, params, latencia_ms):
+        firma, filtros, ordenacion, ejemplo = firma_consulta(params)
+        with self._lock:
+            entrada = self._pendiente.get(firma)
+            if entrada is None:
+                self._pendiente[firma] = {
+                    'filtros': filtros, 'ordenacion': ordenacion, 'ejemplo': ejemplo,
+                    'usos': 1, 'latencia_total_ms': latencia_ms, 'latencia_max_ms': latencia_ms,
+                }
+            else:
+                entrada['ejemplo'] = ejemplo
+                entrada['usos'] += 1
+                entrada['latencia_total_ms'] += latencia_ms
+                entrada['latencia_max_ms'] = max(entrada['latencia_max_ms'], latencia_ms)
+
+    def toca_volcar(self):
+        intervalo = getattr(settings, 'USO_FILTROS_VOLCADO_SEGUNDOS', 60)
+        return bool(self._pendiente) and time.monotonic() - self._ultimo_volcado >= intervalo
+
+    def volcar(self):
+        """Suma lo acumulado a ``UsoFiltro`` y vacía el acumulador"""
+        with self._lock:
+            pendiente, self._pendiente = self._pendiente, {}
+            self._ultimo_volcado = time.monotonic()
+
+        ahora = timezone.now()
+        for firma, datos in pendiente.items():
+            actualizados = UsoFiltro.objects.filter(firma=firma).update(
+                ejemplo=datos['ejemplo'],
+                usos=F('usos') + datos['usos'],
+                latencia_total_ms=F('latencia_total_ms') + datos['latencia_total_ms'],
+                latencia_max_ms=Greatest(F('latencia_max_ms'), datos['latencia_max_ms']),
+                ultima_vez=ahora,
+            )
+            if actualizados:
+                continue
+            try:
+                with transaction.atomic():
+                    UsoFiltro.objects.create(firma=firma, ultima_vez=ahora, **datos)
+            except IntegrityError:
+                # Otro proceso creó la fila entre el UPDATE y el INSERT: se pierde
+                # una muestra, aceptable para un registro estadístico
+                pass
+
+    def registrar_y_volcar(self, params, latencia_ms):
+        self.registrar(params, latencia_ms)
+        if self.toca_volcar():
+            self.volcar()
+
+
+registro_filtros = RegistroUsoFiltros()
@@ -1,21 +1,69 @@
-from rest_framework import viewsets, status, filters
+import time
+import uuid
+
+from rest_framework import mixins, viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Avg, Q
+from django.db.models import Avg, Case, Count, F, FloatField, Prefetch, Q, Sum, Value, When
+from django.db.models.functions import Cast
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from apps.core.renderers import MessagePackParser, MessagePackRenderer, msgpack
+from apps.usuarios.bajas import dar_de_baja_receta
 
 from .models import (
-    Categoria, Ingrediente, Receta, Rating, Favorito
+    Categoria, Ingrediente, Receta, RecetaIngrediente, Rating, Favorito, SubidaImagen
 )
 from .serializers import (
     CategoriaSerializer, IngredienteSerializer,
     RecetaListSerializer, RecetaDetailSerializer, RecetaCreateUpdateSerializer,
-    RatingSerializer, FavoritoSerializer, EstadisticasRecetaSerializer
+    RatingSerializer, FavoritoSerializer, FavoritosLoteSerializer, EstadisticasRecetaSerializer,
+    ListaComprasSerializer, RecetasLoteSerializer, ImagenRecetaSerializer,
+    SubidaImagenSerializer, AdjuntarImagenSerializer
 )
 from .filters import RecetaFilter
 from .permissions import IsOwnerOrReadOnly
+from .autocompletado import autocompletado
+from .cantidades import presentar
+from .favoritos import agregar_favoritos, quitar_favoritos
+from .feed import cursor_feed, leer_feed, parsear_cursor
+from .minhash import vecinos_de_receta
+from .recomendaciones import puntuaciones_recomendadas
+from .registro_vistas import registro_vistas
+from .subidas import SubidaRechazada, adjuntar, cancelar_subida, escribir_bloque, parsear_rango
+from .uso_filtros import registro_filtros
+
+# JSON y, para los clientes móviles, MessagePack (si msgpack está instalado)
+RENDERERS = [*api_settings.DEFAULT_RENDERER_CLASSES, *([MessagePackRenderer] if msgpack else [])]
+PARSERS = [*api_settings.DEFAULT_PARSER_CLASSES, *([MessagePackParser] if msgpack else [])]
+
+
+def prefetch_detalle():
+    """Lo que anida RecetaDetailSerializer (también en el detalle asíncrono)"""
+    return (
+        Prefetch(
+            'ingredientes_detalle',
+            queryset=RecetaIngrediente.objects.select_related('ingrediente')
+        ),
+        'imagenes_adicionales',
+        # Los de usuarios dados de baja dejan de verse antes de purgarlos
+        Prefetch('ratings', queryset=Rating.objects.select_related('usuario').filter(
+            usuario__fecha_baja__isnull=True
+        )),
+    )
+
+
+def parametro_limite(request, defecto=10, maximo=50):
+    """``?limite=`` acotado entre 1 y ``maximo``"""
+    try:
+        return min(max(int(request.query_params.get('limite', defecto)), 1), maximo)
+    except ValueError:
+        return defecto
 
 
 class CategoriaViewSet(viewsets.ModelViewSet):
@@ -27,6 +75,8 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     )
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['nombre', 'descripcion']
     ordering_fields = ['nombre', 'total_recetas']
@@ -37,9 +87,8 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         """Obtiene las recetas de una categoría específica"""
         categoria = self.get_object()
         recetas = Receta.objects.filter(
-            categoria=categoria, 
-            publicada=True
-        ).select_related('autor', 'categoria')
+            categoria=categoria
+        ).publicadas().select_related('autor', 'categoria').con_estadisticas(request.user)
         
         serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
         return Response(serializer.data)
@@ -52,6 +101,8 @@ class IngredienteViewSet(viewsets.ModelViewSet):
     queryset = Ingrediente.objects.all()
     serializer_class = IngredienteSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
     filter_backends = [filters.SearchFilter, filters.OrderingFilter, DjangoFilterBackend]
     search_fields = ['nombre']
     filterset_fields = ['categoria_ingrediente']
@@ -67,6 +118,12 @@ class IngredienteViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(ingredientes, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def autocompletar(self, request):
+        """Sugerencias por prefijo (sin acentos) desde el índice en memoria"""
+        limite = parametro_limite(request)
+        return Response(autocompletado.buscar(request.query_params.get('q', ''), limite))
 
 
 class RecetaViewSet(viewsets.ModelViewSet):
@@ -74,41 +131,50 @@ class RecetaViewSet(viewsets.ModelViewSet):
     ViewSet principal para gestionar recetas
     """
     permission_classes = [IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_class = RecetaFilter
     search_fields = ['titulo', 'descripcion', 'instrucciones']
     ordering_fields = [
-        'fecha_creacion', 'tiempo_preparacion', 'tiempo_coccion', 
+        'fecha_creacion', 'tiempo_preparacion', 'tiempo_coccion', 'tiempo_total',
         'dificultad', 'vistas', 'rating_promedio'
     ]
     ordering = ['-fecha_creacion']
     
+    # Acciones que serializan con RecetaListSerializer (o no serializan la receta)
+    # y no necesitan prefetch
+    acciones_listado = {
+        'list', 'destacadas', 'mas_vistas', 'mejor_valoradas',
+        'mis_recetas', 'buscar_por_ingredientes', 'similares', 'recomendadas',
+        'toggle_favorito', 'favorito', 'imagen'
+    }
+    
+    # Fichas de throttling por acción (1 si no aparece): las búsquedas y las
+    # consultas de muchas recetas cuestan más que un detalle
+    costes_throttle = {
+        'buscar_por_ingredientes': 5, 'lote': 3, 'similares': 2, 'recomendadas': 2
+    }
+    
+    def coste_throttle(self, request):
+        """Un listado con búsqueda de texto o por ingredientes cuesta como una búsqueda"""
+        if self.action == 'list' and {'search', 'ingredientes'} & request.query_params.keys():
+            return self.costes_throttle['buscar_por_ingredientes']
+        return self.costes_throttle.get(self.action, 1)
+    
     def get_queryset(self):
-        """Queryset optimizado con select_related y prefetch_related"""
+        """Queryset optimizado con select_related, prefetch_related y subconsultas"""
         queryset = Receta.objects.select_related(
             'autor', 'categoria'
-        ).prefetch_related(
-            'ingredientes_detalle__ingrediente',
-            'imagenes_adicionales',
-            'ratings',
-            'favoritos'
-        ).annotate(
-            rating_promedio=Avg('ratings__puntuacion'),
-            total_favoritos=Count('favoritos')
-        )
+        ).con_estadisticas(self.request.user)
         
-        # Filtrar por estado de publicación según el usuario
-        if self.request.user.is_authenticated:
-            # Los usuarios autenticados ven sus propias recetas (publicadas y borradores)
-            # y las recetas publicadas de otros
-            queryset = queryset.filter(
-                Q(publicada=True) | Q(autor=self.request.user)
-            )
-        else:
-            # Los usuarios anónimos solo ven recetas publicadas
-            queryset = queryset.filter(publicada=True)
+        # El detalle anida ingredientes, imágenes y ratings; los listados no
+        if self.action not in self.acciones_listado:
+            queryset = queryset.prefetch_related(*prefetch_detalle())
         
-        return queryset
+        # Los usuarios autenticados ven sus propias recetas (publicadas y borradores)
+        # y las recetas publicadas de otros; los anónimos solo las publicadas
+        return queryset.visibles_para(self.request.user)
     
     def get_serializer_class(self):
         """Usar diferentes serializers según la acción"""
@@ -119,27 +185,91 @@ class RecetaViewSet(viewsets.ModelViewSet):
         else:
             return RecetaDetailSerializer
     
+    def list(self, request, *args, **kwargs):
+        """Listado; registra la combinación de filtros usada y su latencia"""
+        inicio = time.perf_counter()
+        respuesta = super().list(request, *args, **kwargs)
+        registro_filtros.registrar_y_volcar(
+            request.query_params, (time.perf_counter() - inicio) * 1000
+        )
+        return respuesta
+    
     def retrieve(self, request, *args, **kwargs):
-        """Incrementar vistas al obtener el detalle"""
+        """Incrementar vistas al obtener el detalle y registrar la vista"""
         instance = self.get_object()
         instance.incrementar_vistas()
+        registro_vistas.registrar_y_volcar(instance.pk, request)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
+    def perform_destroy(self, instance):
+        """La oculta al momento; purgar_bajas borra después sus filas por lotes"""
+        dar_de_baja_receta(instance)
+    
+    # POST solo lee (listas largas de ids): no requiere autenticación
+    @action(detail=False, methods=['get', 'post'], permission_classes=[AllowAny])
+    def lote(self, request):
+        """
+        Detalle de varias recetas en el orden pedido con una consulta (más los
+        prefetch): GET ?ids=<id>,<id>,... o POST {"ids": [...]} para listas largas.
+        Cada id sin receta visible se devuelve con su error. No cuenta vistas.
+        """
+        if request.method == 'POST':
+            datos = request.data
+        else:
+            datos = {'ids': [pk.strip() for pk in request.query_params.get('ids', '').split(',') if pk.strip()]}
+        serializer = RecetasLoteSerializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+        
+        pedidos = []
+        for pk in serializer.validated_data['ids']:
+            try:
+                pedidos.append((pk, uuid.UUID(pk)))
+            except ValueError:
+                pedidos.append((pk, None))
+        recetas = {
+            receta.pk: receta
+            for receta in self.get_queryset().filter(pk__in={pk for _, pk in pedidos if pk is not None})
+        }
+        
+        resultados = []
+        for original, pk in pedidos:
+            if pk is None:
+                resultados.append({'id': original, 'error': 'id no válido'})
+            elif pk not in recetas:
+                # Igual que el detalle: los borradores ajenos no se distinguen de inexistentes
+                resultados.append({'id': original, 'error': 'no encontrada'})
+            else:
+                datos = self.get_serializer(recetas[pk]).data
+                resultados.append({'id': original, 'receta': datos})
+        return Response({'results': resultados})
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def toggle_favorito(self, request, pk=None):
-        """Agregar o quitar de favoritos"""
+        """
+        Agregar o quitar de favoritos. Un reintento invierte el estado otra vez:
+        los clientes nuevos deben usar PUT/DELETE sobre /favorito/
+        """
         receta = self.get_object()
-        favorito, created = Favorito.objects.get_or_create(
-            usuario=request.user,
-            receta=receta
-        )
-        
-        if not created:
-            favorito.delete()
+        if quitar_favoritos(request.user, [receta.pk]):
             return Response({'favorito': False, 'mensaje': 'Eliminado de favoritos'})
+        agregar_favoritos(request.user, [receta.pk])
+        return Response({'favorito': True, 'mensaje': 'Agregado a favoritos'})
+    
+    @action(detail=True, methods=['put', 'delete'], permission_classes=[IsAuthenticated])
+    def favorito(self, request, pk=None):
+        """PUT marca y DELETE quita la receta de favoritos; repetirlos no cambia nada"""
+        receta = self.get_object()
+        if request.method == 'PUT':
+            cambiado = bool(agregar_favoritos(request.user, [receta.pk]))
         else:
-            return Response({'favorito': True, 'mensaje': 'Agregado a favoritos'})
+            cambiado = bool(quitar_favoritos(request.user, [receta.pk]))
+        total = Receta.objects.filter(pk=receta.pk).values_list('total_favoritos', flat=True).get()
+        return Response({
+            'favorito': request.method == 'PUT',
+            'cambiado': cambiado,
+            'total_favoritos': total,
+        })
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def valorar(self, request, pk=None):
@@ -166,12 +296,39 @@ class RecetaViewSet(viewsets.ModelViewSet):
         serializer = RatingSerializer(rating)
         mensaje = 'Valoración creada' if created else 'Valoración actualizada'
         
+        # La anotación del queryset es anterior a la valoración; recalcular
+        rating_promedio = Rating.objects.filter(receta=receta, usuario__fecha_baja__isnull=True).aggregate(
+            promedio=Avg('puntuacion')
+        )['promedio']
+        
         return Response({
             'mensaje': mensaje,
             'rating': serializer.data,
-            'rating_promedio': receta.rating_promedio
+            'rating_promedio': rating_promedio
         })
     
+    @action(detail=True, methods=['post'])
+    def imagen(self, request, pk=None):
+        """
+        Adjunta una subida terminada (``/subidas/``) como imagen principal o, con
+        {"galeria": true}, a la galería de la receta. Solo el autor.
+        """
+        receta = self.get_object()
+        serializer = AdjuntarImagenSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        datos = serializer.validated_data
+        try:
+            resultado = adjuntar(
+                datos['subida'], receta, galeria=datos['galeria'],
+                descripcion=datos['descripcion'], orden=datos['orden']
+            )
+        except SubidaRechazada as error:
+            return Response({'detail': str(error)}, status=error.estado)
+        if datos['galeria']:
+            datos = ImagenRecetaSerializer(resultado, context={'request': request}).data
+            return Response(datos, status=status.HTTP_201_CREATED)
+        return Response(RecetaListSerializer(resultado, context={'request': request}).data)
+    
     @action(detail=False, methods=['get'])
     def destacadas(self, request):
         """Obtiene las recetas destacadas"""
@@ -190,7 +347,7 @@ class RecetaViewSet(viewsets.ModelViewSet):
     def mejor_valoradas(self, request):
         """Obtiene las recetas mejor valoradas"""
         recetas = self.get_queryset().filter(
-            ratings__isnull=False
+            rating_promedio__isnull=False
         ).order_by('-rating_promedio')[:10]
         serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
         return Response(serializer.data)
@@ -210,13 +367,50 @@ class RecetaViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Debe especificar al menos un ingrediente'})
         
         # Filtrar recetas que contengan todos los ingredientes especificados
-        recetas = self.get_queryset()
-        for ingrediente_nombre in ingredientes:
-            recetas = recetas.filter(
-                ingredientes_detalle__ingrediente__nombre__icontains=ingrediente_nombre.strip()
-            )
+        recetas = self.get_queryset().con_ingredientes(ingredientes)
         
-        recetas = recetas.distinct()
+        serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def similares(self, request, pk=None):
+        """
+        Recetas similares precalculadas por calcular_similares; las recetas nuevas,
+        sin favoritos ni valoraciones, por ingredientes y categoría (MinHash/LSH)
+        """
+        receta = self.get_object()
+        limite = parametro_limite(request)
+        recetas = list(self.get_queryset().filter(
+            similar_de__receta=receta
+        ).order_by('-similar_de__puntuacion')[:limite])
+        if not recetas:
+            similitudes = dict(vecinos_de_receta(
+                receta.pk, recetas=Receta.objects.visibles_para(request.user), limite=limite
+            ))
+            recetas = sorted(
+                self.get_queryset().filter(pk__in=similitudes),
+                key=lambda similar: -similitudes[similar.pk]
+            )
+        serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def recomendadas(self, request):
+        """
+        Recomendaciones para el usuario a partir de sus favoritos y valoraciones;
+        sin historial (o sin vecinos calculados), las más vistas
+        """
+        limite = parametro_limite(request, defecto=20)
+        puntuaciones = dict(puntuaciones_recomendadas(request.user, limite))
+        if puntuaciones:
+            recetas = sorted(
+                self.get_queryset().filter(pk__in=puntuaciones),
+                key=lambda receta: -puntuaciones[receta.pk]
+            )
+        else:
+            recetas = self.get_queryset().publicadas().exclude(
+                autor=request.user
+            ).order_by('-vistas')[:limite]
         serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
         return Response(serializer.data)
 
@@ -227,29 +421,106 @@ class RatingViewSet(viewsets.ModelViewSet):
     """
     serializer_class = RatingSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['puntuacion', 'receta']
     ordering = ['-fecha_creacion']
     
     def get_queryset(self):
-        """Solo mostrar ratings del usuario autenticado"""
-        return Rating.objects.filter(usuario=self.request.user)
+        """Solo mostrar ratings del usuario autenticado, de recetas que aún ve"""
+        return Rating.objects.filter(
+            usuario=self.request.user, receta__in=Receta.objects.visibles_para(self.request.user)
+        ).select_related('usuario')
 
 
-class FavoritoViewSet(viewsets.ModelViewSet):
+class FavoritoViewSet(
+    mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin, viewsets.GenericViewSet
+):
     """
-    ViewSet para gestionar favoritos
+    ViewSet para gestionar favoritos. Sin PUT/PATCH: un favorito no se edita, y
+    crear y borrar pasan por ``favoritos`` para mantener ``total_favoritos``
     """
     serializer_class = FavoritoSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
+    costes_throttle = {'lote': 3}
     filter_backends = [filters.OrderingFilter]
     ordering = ['-fecha_agregado']
     
     def get_queryset(self):
-        """Solo mostrar favoritos del usuario autenticado"""
-        return Favorito.objects.filter(usuario=self.request.user).select_related(
-            'receta__autor', 'receta__categoria'
+        """
+        Solo los favoritos del usuario autenticado cuyas recetas puede ver: no las
+        despublicadas, como las de los autores dados de baja
+        """
+        recetas = Receta.objects.select_related(
+            'autor', 'categoria'
+        ).con_estadisticas(self.request.user)
+        return Favorito.objects.filter(
+            usuario=self.request.user,
+            receta__in=Receta.objects.visibles_para(self.request.user),
+        ).prefetch_related(
+            Prefetch('receta', queryset=recetas)
         )
+    
+    def perform_destroy(self, instance):
+        quitar_favoritos(self.request.user, [instance.receta_id])
+    
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        """
+        Añade y quita muchos favoritos en una transacción:
+        {"agregar": [<id>, ...], "quitar": [<id>, ...]}. Idempotente; las recetas
+        que no existen o no son visibles se devuelven en ``desconocidas``.
+        """
+        serializer = FavoritosLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        agregar = set(serializer.validated_data['agregar'])
+        visibles = set(Receta.objects.visibles_para(request.user).filter(
+            pk__in=agregar
+        ).values_list('pk', flat=True))
+        with transaction.atomic():
+            agregadas = agregar_favoritos(request.user, visibles)
+            quitadas = quitar_favoritos(request.user, serializer.validated_data['quitar'])
+        return Response({
+            'agregadas': sorted(str(pk) for pk in agregadas),
+            'quitadas': sorted(str(pk) for pk in quitadas),
+            'desconocidas': sorted(str(pk) for pk in agregar - visibles),
+        })
+
+
+class SubidaImagenViewSet(
+    mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin, viewsets.GenericViewSet
+):
+    """
+    Subidas de imágenes por bloques del usuario (ver ``subidas``): POST crea una,
+    PUT con Content-Range envía cada bloque y GET dice desde qué byte seguir
+    """
+    serializer_class = SubidaImagenSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
+    
+    def get_queryset(self):
+        return SubidaImagen.objects.filter(usuario=self.request.user)
+    
+    def update(self, request, *args, **kwargs):
+        """Un bloque de bytes en el cuerpo; no pasa por los parsers"""
+        subida = self.get_object()
+        try:
+            inicio, longitud = parsear_rango(
+                request.headers.get('Content-Range'), request.headers.get('Content-Length'), subida
+            )
+            escribir_bloque(subida, request.stream, inicio, longitud)
+        except SubidaRechazada as error:
+            return Response({'detail': str(error), 'recibidos': subida.recibidos}, status=error.estado)
+        return Response(self.get_serializer(subida).data)
+    
+    def perform_destroy(self, instance):
+        cancelar_subida(instance)
 
 
 class EstadisticasViewSet(viewsets.ViewSet):
@@ -257,12 +528,14 @@ class EstadisticasViewSet(viewsets.ViewSet):
     ViewSet para estadísticas generales
     """
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
     
     @action(detail=False, methods=['get'])
     def generales(self, request):
         """Estadísticas generales de la plataforma"""
         data = {
-            'total_recetas': Receta.objects.filter(publicada=True).count(),
+            'total_recetas': Receta.objects.publicadas().count(),
             'total_usuarios': request.user.__class__.objects.count(),
             'total_categorias': Categoria.objects.filter(activa=True).count(),
             'total_ingredientes': Ingrediente.objects.count(),
@@ -274,10 +547,108 @@ class EstadisticasViewSet(viewsets.ViewSet):
         """Estadísticas del usuario autenticado"""
         usuario = request.user
         data = {
-            'mis_recetas': usuario.recetas.count(),
+            'mis_recetas': usuario.recetas.filter(fecha_baja__isnull=True).count(),
             'recetas_publicadas': usuario.recetas.filter(publicada=True).count(),
-            'recetas_borradores': usuario.recetas.filter(publicada=False).count(),
+            'recetas_borradores': usuario.recetas.filter(publicada=False, fecha_baja__isnull=True).count(),
             'total_favoritos': Favorito.objects.filter(usuario=usuario).count(),
             'ratings_dados': Rating.objects.filter(usuario=usuario).count(),
         }
         return Response(data)
+
+
+class FeedViewSet(viewsets.ViewSet):
+    """
+    Recetas recién publicadas por los autores que sigue el usuario, paginadas por
+    (fecha, id): ``?antes=<siguiente>`` pide la página anterior
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
+    
+    def list(self, request):
+        antes = request.query_params.get('antes')
+        if antes:
+            antes = parsear_cursor(antes)
+            if antes is None:
+                raise ValidationError({'antes': 'Cursor no válido'})
+        limite = parametro_limite(request, defecto=20)
+        recetas = leer_feed(
+            Receta.objects.select_related('autor', 'categoria').con_estadisticas(request.user),
+            request.user, antes=antes, limite=limite
+        )
+        serializer = RecetaListSerializer(recetas, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'siguiente': cursor_feed(recetas[-1]) if len(recetas) == limite else None,
+        })
+
+
+class ListaComprasViewSet(viewsets.ViewSet):
+    """
+    Lista de la compra de un plan de comidas: suma los ingredientes de varias
+    recetas escaladas a las porciones deseadas con una sola consulta agrupada
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = RENDERERS
+    parser_classes = PARSERS
+    costes_throttle = {'list': 3, 'create': 3}
+    
+    def list(self, request):
+        """GET ?recetas=<id>:<porciones>,<id>,... (sin porciones, las de la receta)"""
+        recetas = []
+        for elemento in request.query_params.get('recetas', '').split(','):
+            if elemento.strip():
+                pk, _, porciones = elemento.strip().partition(':')
+                recetas.append({'id': pk, **({'porciones': porciones} if porciones else {})})
+        return self.calcular(request, {'recetas': recetas})
+    
+    def create(self, request):
+        """POST {"recetas": [{"id": ..., "porciones": 4}, ...]}"""
+        return self.calcular(request, request.data)
+    
+    def calcular(self, request, datos):
+        serializer = ListaComprasSerializer(data=datos)
+        serializer.is_valid(raise_exception=True)
+        
+        # receta -> (veces con sus porciones originales, porciones pedidas);
+        # la misma receta varias veces en el plan se suma
+        plan = {}
+        for elemento in serializer.validated_data['recetas']:
+            completas, porciones = plan.get(elemento['id'], (0, 0))
+            if 'porciones' in elemento:
+                porciones += elemento['porciones']
+            else:
+                completas += 1
+            plan[elemento['id']] = (completas, porciones)
+        if not plan:
+            return Response({'ingredientes': []})
+        
+        # Factor de escala de cada receta, calculado en SQL con sus porciones
+        factor = Case(
+            *[
+                When(receta_id=pk, then=Value(float(completas)) + Value(float(porciones)) / F('receta__porciones'))
+                for pk, (completas, porciones) in plan.items()
+            ],
+            output_field=FloatField()
+        )
+        filas = RecetaIngrediente.objects.filter(
+            receta__in=Receta.objects.visibles_para(request.user).filter(pk__in=plan)
+        ).values(
+            'ingrediente_id', 'ingrediente__nombre', 'ingrediente__categoria_ingrediente', 'unidad'
+        ).annotate(
+            total=Sum(Cast('cantidad_valor', FloatField()) * factor),
+            recetas=Count('receta_id'),
+        ).order_by('ingrediente__categoria_ingrediente', 'ingrediente__nombre', 'unidad')
+        
+        ingredientes = []
+        for fila in filas:
+            cantidad, unidad = presentar(fila['total'], fila['unidad'] or None)
+            ingredientes.append({
+                'ingrediente_id': fila['ingrediente_id'],
+                'nombre': fila['ingrediente__nombre'],
+                'categoria_ingrediente': fila['ingrediente__categoria_ingrediente'],
+                'cantidad': cantidad,
+                'unidad': unidad,
+                'recetas': fila['recetas'],
+            })
+        return Response({'ingredientes': ingredientes})
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from .bajas import dar_de_baja
 from .models import Usuario, PerfilExtendido
 
 
@@ -27,7 +28,8 @@ class UsuarioAdmin(UserAdmin):
         'perfil_publico', 
         'is_active',
         'is_staff',
-        'fecha_creacion'
+        'fecha_creacion',
+        'fecha_baja'
     )
     
     # Campos de búsqueda
@@ -63,6 +65,20 @@ class UsuarioAdmin(UserAdmin):
             )
         }),
     )
+    
+    # Borrar desde el admin da de baja: purgar_bajas borra las filas por lotes
+    def get_deleted_objects(self, objs, request):
+        """Sin recorrer la cascada, que cargaría todo el contenido del usuario"""
+        objs = list(objs)
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+    
+    def delete_model(self, request, obj):
+        dar_de_baja(obj)
+    
+    def delete_queryset(self, request, queryset):
+        for usuario in queryset.filter(fecha_baja__isnull=True):
+            dar_de_baja(usuario)
 
 
 @admin.register(PerfilExtendido)
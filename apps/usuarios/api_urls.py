@@ -1,8 +1,12 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-# Por ahora vacío, aquí irán los ViewSets de usuarios
+from .views import CuentaViewSet, SeguimientoViewSet, TokenViewSet
+
 router = DefaultRouter()
+router.register(r'token', TokenViewSet, basename='token')
+router.register(r'cuenta', CuentaViewSet, basename='cuenta')
+router.register(r'seguimientos', SeguimientoViewSet, basename='seguimiento')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -0,0 +1,110 @@
+"""
+Autenticación por token con caché.
+
+``TokenAuthentication`` de DRF consulta ``Token`` + ``Usuario`` en cada petición.
+``CachedTokenAuthentication`` resuelve token -> usuario primero en un LRU del
+proceso (TTL de segundos) y después en la caché de Django (TTL más largo), y solo
+va a la base de datos si ambos fallan. Las entradas se invalidan al revocar o
+rotar el token y al guardar el usuario (cambio de contraseña, ``is_active``...).
+La invalidación solo llega a los demás procesos si la caché por defecto es
+compartida (Redis fuera de DEBUG); aun así, el LRU de otros procesos puede servir
+un valor obsoleto como mucho ``TOKEN_LRU_TTL`` segundos (0 lo desactiva).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+
+def clave_cache(key):
+    """No se guarda el token en claro como clave de caché"""
+    return 'auth_token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+class LRUConTTL:
+    """
+    Diccionario acotado, seguro entre hilos, cuyas entradas caducan tras ``ttl`` segundos
+    """
+
+    def __init__(self, tamano, ttl):
+        self.tamano = tamano
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, caduca = entrada
+            if caduca < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+lru_tokens = LRUConTTL(
+    tamano=getattr(settings, 'TOKEN_LRU_SIZE', 1024),
+    ttl=getattr(settings, 'TOKEN_LRU_TTL', 2),
+)
+
+
+def invalidar_token(key):
+    """Elimina un token de la caché compartida y del LRU de este proceso"""
+    clave = clave_cache(key)
+    lru_tokens.delete(clave)
+    cache.delete(clave)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    ``TokenAuthentication`` con caché de dos niveles para token -> (usuario, token)
+    """
+
+    def authenticate_credentials(self, key):
+        clave = clave_cache(key)
+        credenciales = lru_tokens.get(clave)
+        if credenciales is None:
+            credenciales = cache.get(clave)
+            if credenciales is None:
+                credenciales = self.credenciales_db(key)
+                cache.set(clave, credenciales, getattr(settings, 'TOKEN_CACHE_TTL', 60))
+            lru_tokens.set(clave, credenciales)
+
+        usuario, token = credenciales
+        if not usuario.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+        return credenciales
+
+    def credenciales_db(self, key):
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        return token.user, token
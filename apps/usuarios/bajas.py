@@ -0,0 +1,214 @@
+"""
+Baja de usuarios y de recetas sin borrar en cascada dentro de la petición.
+
+Borrar un usuario con muchas recetas hace que el collector de Django cargue en memoria
+sus recetas, ingredientes, imágenes, ratings, favoritos, entradas del feed... y las
+borre en una sola transacción que bloquea todas esas filas; una receta popular arrastra
+igual sus ratings, favoritos, copias en el feed de cada seguidor y vistas.
+``dar_de_baja`` solo marca ``fecha_baja``, desactiva la cuenta, borra sus tokens,
+descuenta sus favoritos y despublica sus recetas, así que todo desaparece al momento;
+``dar_de_baja_receta`` marca y despublica la receta. ``purgar_bajas`` y
+``purgar_recetas`` (cron) borran después las filas por lotes de ``BAJAS_LOTE``, de las
+tablas hijas hacia arriba, con DELETE ... WHERE pk IN (...) sin collector y una
+transacción corta por lote.
+
+Los DELETE en bruto no envían señales: los ajustes que hacen los receptores
+(``Receta.total_favoritos``, contadores de seguimientos, referencias de
+``ArchivoMedia``, caché de tokens y archivos temporales de las subidas) se hacen
+aquí, por lote.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import models, router, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from apps.core.archivos import ImagenCompartida, sumar_referencias
+from apps.recetas.models import PUBLICADA, Favorito, Receta, SubidaImagen
+from apps.recetas.subidas import borrar_archivos
+
+from .authentication import invalidar_token
+from .models import PerfilExtendido, Seguimiento
+
+User = get_user_model()
+
+
+def tamano_lote():
+    return getattr(settings, 'BAJAS_LOTE', 500)
+
+
+@transaction.atomic
+def dar_de_baja(usuario):
+    """Oculta la cuenta y su contenido; las filas se borran con ``purgar_bajas``"""
+    ahora = timezone.now()
+    if not User.objects.filter(pk=usuario.pk, fecha_baja__isnull=True).update(fecha_baja=ahora, is_active=False):
+        return
+    usuario.fecha_baja, usuario.is_active = ahora, False
+    Receta.objects.filter(PUBLICADA, autor=usuario).update(publicada=False)
+    # Sus favoritos dejan de contar ya (la purga no los vuelve a descontar), por lotes
+    recetas = list(Favorito.objects.filter(usuario=usuario).values_list('receta_id', flat=True))
+    lote = tamano_lote()
+    for inicio in range(0, len(recetas), lote):
+        _restar(Receta, 'total_favoritos', Counter(recetas[inicio:inicio + lote]))
+    # delete() del queryset invalida cada token en la caché
+    Token.objects.filter(user=usuario).delete()
+
+
+@transaction.atomic
+def dar_de_baja_receta(receta):
+    """Oculta la receta; sus filas se borran con ``purgar_recetas``"""
+    ahora = timezone.now()
+    Receta.objects.filter(pk=receta.pk, fecha_baja__isnull=True).update(fecha_baja=ahora, publicada=False)
+    receta.fecha_baja, receta.publicada = ahora, False
+
+
+def _restar(modelo, campo, conteos, clave='pk'):
+    """UPDATE campo = campo - n, uno por cada valor distinto de n"""
+    por_cantidad = defaultdict(list)
+    for valor, cantidad in conteos.items():
+        por_cantidad[cantidad].append(valor)
+    for cantidad, valores in por_cantidad.items():
+        # Nunca por debajo de 0, sin restar en SQL de una columna sin signo
+        modelo._base_manager.filter(**{f'{clave}__in': valores}).update(**{campo: Case(
+            When(**{f'{campo}__gte': cantidad}, then=F(campo) - cantidad),
+            default=Value(0),
+        )})
+
+
+def _descontar_favoritos(filas):
+    # Los de usuarios dados de baja se descontaron en dar_de_baja
+    filas = filas.filter(usuario__fecha_baja__isnull=True)
+    _restar(Receta, 'total_favoritos', Counter(filas.values_list('receta_id', flat=True)))
+
+
+def _descontar_seguimientos(filas):
+    seguidores, seguidos = Counter(), Counter()
+    for seguidor_id, seguido_id in filas.values_list('seguidor_id', 'seguido_id'):
+        seguidores[seguidor_id] += 1
+        seguidos[seguido_id] += 1
+    _restar(PerfilExtendido, 'total_siguiendo', seguidores, clave='usuario_id')
+    _restar(PerfilExtendido, 'total_seguidores', seguidos, clave='usuario_id')
+
+
+def _invalidar_tokens(filas):
+    for key in filas.values_list('pk', flat=True):
+        invalidar_token(key)
+
+
+def _borrar_subidas(filas):
+    pks = list(filas.values_list('pk', flat=True))
+    # Los archivos de SUBIDAS_DIR, cuando el lote ya está confirmado
+    transaction.on_commit(lambda: borrar_archivos(pks), using=filas.db)
+
+
+# Lo que harían los receptores de post_delete/pre_delete de cada modelo
+AJUSTES = {
+    Favorito: _descontar_favoritos,
+    Seguimiento: _descontar_seguimientos,
+    Token: _invalidar_tokens,
+    SubidaImagen: _borrar_subidas,
+}
+
+
+def _quitar_referencias(modelo, filas):
+    cambios = Counter()
+    for campo in modelo._meta.concrete_fields:
+        if isinstance(campo, ImagenCompartida):
+            cambios.update(nombre for nombre in filas.values_list(campo.attname, flat=True) if nombre)
+    if cambios:
+        sumar_referencias({nombre: -n for nombre, n in cambios.items()})
+
+
+def _dependientes(modelo):
+    # related_objects no incluye las relaciones con related_name='+' (EventoVista.usuario)
+    return [
+        relacion for relacion in modelo._meta.get_fields(include_hidden=True)
+        if relacion.auto_created and not relacion.concrete and not relacion.many_to_many
+        and relacion.on_delete is not models.DO_NOTHING
+    ]
+
+
+def _anular(modelo, campo, condicion, alias, lote):
+    """UPDATE campo = NULL por lotes"""
+    while True:
+        pks = list(modelo._base_manager.using(alias).filter(condicion).values_list('pk', flat=True)[:lote])
+        if not pks:
+            return
+        modelo._base_manager.using(alias).filter(pk__in=pks).update(**{campo: None})
+
+
+def purgar(modelo, condicion, lote, borradas):
+    """
+    Borra por lotes las filas de ``modelo`` que cumplen ``condicion``, cada lote tras
+    sus dependientes, y las cuenta por modelo en ``borradas``.
+    """
+    alias = router.db_for_write(modelo)
+    while True:
+        pks = list(modelo._base_manager.using(alias).filter(condicion).values_list('pk', flat=True)[:lote])
+        if not pks:
+            return
+        protegido = False
+        for relacion in _dependientes(modelo):
+            hijos = Q(**{f'{relacion.field.name}__in': pks})
+            if relacion.on_delete is models.CASCADE:
+                purgar(relacion.related_model, hijos, lote, borradas)
+            elif relacion.on_delete is models.SET_NULL:
+                _anular(relacion.related_model, relacion.field.name, hijos, alias, lote)
+            else:
+                protegido = True
+        filas = modelo._base_manager.using(alias).filter(pk__in=pks)
+        with transaction.atomic(using=alias):
+            if protegido:
+                # PROTECT, RESTRICT, SET_DEFAULT...: el collector aplica la regla
+                filas.delete()
+            else:
+                if modelo in AJUSTES:
+                    AJUSTES[modelo](filas)
+                _quitar_referencias(modelo, filas)
+                filas._raw_delete(alias)
+        borradas[modelo._meta.label] += len(pks)
+
+
+def purgar_usuario(usuario, lote=None):
+    """
+    Borra las filas que dependen del usuario y al final el propio usuario, que ya
+    no tiene nada que cargar en cascada. Devuelve las filas borradas por modelo.
+    """
+    lote = lote or tamano_lote()
+    borradas = Counter()
+    for relacion in _dependientes(User):
+        condicion = Q(**{relacion.field.name: usuario.pk})
+        if relacion.on_delete is models.CASCADE:
+            purgar(relacion.related_model, condicion, lote, borradas)
+        elif relacion.on_delete is models.SET_NULL:
+            # Las filas que sobreviven al usuario (sus vistas) quedan anónimas
+            _anular(relacion.related_model, relacion.field.name, condicion, router.db_for_write(User), lote)
+    # Lo que quede (PROTECT, RESTRICT...) lo resuelve el collector
+    usuario.delete()
+    borradas[User._meta.label] += 1
+    return borradas
+
+
+def purgar_recetas(lote=None, horas=0):
+    """Purga las recetas borradas hace más de ``horas``; devuelve las filas borradas por modelo"""
+    limite = timezone.now() - timedelta(hours=horas)
+    borradas = Counter()
+    purgar(Receta, Q(fecha_baja__lte=limite), lote or tamano_lote(), borradas)
+    return borradas
+
+
+def purgar_bajas(lote=None, horas=0, informar=None):
+    """Purga los usuarios dados de baja hace más de ``horas``; devuelve cuántos"""
+    limite = timezone.now() - timedelta(hours=horas)
+    purgados = 0
+    # Pocos usuarios: la lista no se lee mientras se borra
+    for usuario in list(User.objects.filter(fecha_baja__lte=limite).order_by('fecha_baja')):
+        borradas = purgar_usuario(usuario, lote)
+        purgados += 1
+        if informar:
+            informar(usuario, borradas)
+    return purgados
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, RequestFactory
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from apps.core.benchmark import guardar_resultados, medir
+from apps.usuarios.authentication import CachedTokenAuthentication, clave_cache, lru_tokens
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Coste de autenticar una petición con token: TokenAuthentication de DRF "
+        "frente a CachedTokenAuthentication (caché compartida y LRU del proceso)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ruta', default='/api/v1/categorias/')
+        parser.add_argument('--repeticiones', type=int, default=200)
+        parser.add_argument('--usuario', help="Usuario del token (por defecto el primero activo)")
+        parser.add_argument('--salida', default='benchmark_autenticacion.json')
+
+    def handle(self, *args, **options):
+        usuarios = User.objects.filter(is_active=True)
+        if options['usuario']:
+            usuarios = usuarios.filter(username=options['usuario'])
+        usuario = usuarios.order_by('pk').first()
+        if usuario is None:
+            raise CommandError("No hay usuarios; ejecuta primero generar_datos")
+
+        resultados = {}
+        # El token creado para la medición se revierte al terminar
+        with transaction.atomic():
+            token, _ = Token.objects.get_or_create(user=usuario)
+            cabecera = f'Token {token.key}'
+            factory = RequestFactory()
+
+            def autenticar(autenticador, antes=None):
+                def funcion():
+                    if antes:
+                        antes()
+                    request = Request(factory.get(options['ruta'], HTTP_AUTHORIZATION=cabecera))
+                    return autenticador.authenticate(request)
+                return funcion
+
+            def sin_lru():
+                lru_tokens.delete(clave_cache(token.key))
+
+            casos = {
+                'drf_token': autenticar(TokenAuthentication()),
+                'cache_compartida': autenticar(CachedTokenAuthentication(), antes=sin_lru),
+                'lru_proceso': autenticar(CachedTokenAuthentication()),
+            }
+            for nombre, funcion in casos.items():
+                resultados[nombre] = medir(funcion, repeticiones=options['repeticiones'])
+
+            # Petición completa con la configuración actual de REST_FRAMEWORK
+            cliente = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=cabecera)
+            resultados['peticion_completa'] = dict(
+                url=options['ruta'],
+                **medir(lambda: cliente.get(options['ruta']), repeticiones=options['repeticiones'])
+            )
+
+            transaction.set_rollback(True)
+
+        lru_tokens.delete(clave_cache(token.key))
+        cache.delete(clave_cache(token.key))
+
+        for nombre, medidas in resultados.items():
+            self.stdout.write(
+                f"{nombre:20} p50={medidas['p50_ms']:8.3f}ms p95={medidas['p95_ms']:8.3f}ms "
+                f"consultas={medidas['consultas']}"
+            )
+        guardar_resultados(options['salida'], resultados)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['salida']}"))
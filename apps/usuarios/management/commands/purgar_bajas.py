@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from apps.recetas.models import Receta
+from apps.usuarios.bajas import purgar_bajas, purgar_recetas
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra por lotes las recetas borradas y el contenido de los usuarios dados de "
+        "baja (recetas, ingredientes, imágenes, ratings, favoritos, feed...) y después "
+        "los usuarios"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=None,
+            help="Filas por lote y por transacción (BAJAS_LOTE)"
+        )
+        parser.add_argument(
+            '--horas', type=int, default=0,
+            help="Purgar solo las bajas y recetas borradas hace más de estas horas"
+        )
+
+    def handle(self, *args, **options):
+        de_recetas = purgar_recetas(options['lote'], options['horas'])
+        if options['verbosity'] >= 2 and de_recetas:
+            detalle = ', '.join(f"{modelo}: {n}" for modelo, n in sorted(de_recetas.items()))
+            self.stdout.write(f"Recetas borradas: {detalle}")
+
+        def informar(usuario, borradas):
+            if options['verbosity'] >= 2:
+                detalle = ', '.join(f"{modelo}: {n}" for modelo, n in sorted(borradas.items()))
+                self.stdout.write(f"{usuario.username}: {detalle}")
+
+        purgados = purgar_bajas(options['lote'], options['horas'], informar)
+        recetas = de_recetas[Receta._meta.label]
+        self.stdout.write(self.style.SUCCESS(f"{recetas} recetas y {purgados} usuarios purgados"))
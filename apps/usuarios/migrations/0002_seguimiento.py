@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-19 06:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Seguimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('seguido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seguidores', to=settings.AUTH_USER_MODEL)),
+                ('seguidor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='siguiendo', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Seguimiento',
+                'verbose_name_plural': 'Seguimientos',
+                'constraints': [models.CheckConstraint(condition=models.Q(('seguidor', models.F('seguido')), _negated=True), name='seguimiento_no_a_si_mismo')],
+                'unique_together': {('seguidor', 'seguido')},
+            },
+        ),
+    ]
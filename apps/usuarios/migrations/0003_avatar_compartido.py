@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:15
+
+import apps.core.archivos
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_seguimiento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usuario',
+            name='avatar',
+            field=apps.core.archivos.ImagenCompartida(blank=True, help_text='Foto de perfil', lado_maximo=300, null=True, upload_to='avatares/'),
+        ),
+    ]
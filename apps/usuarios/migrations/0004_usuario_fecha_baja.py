@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_avatar_compartido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='fecha_baja',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Fecha de la baja; sus filas se borran después en segundo plano', null=True),
+        ),
+    ]
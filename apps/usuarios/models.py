@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from PIL import Image
+
+from apps.core.archivos import ImagenCompartida
 
 
 class Usuario(AbstractUser):
@@ -16,8 +17,10 @@ class Usuario(AbstractUser):
         help_text="Cuéntanos un poco sobre ti y tu pasión por la cocina"
     )
     
-    avatar = models.ImageField(
+    # Reducido a 300 px al subirlo
+    avatar = ImagenCompartida(
         upload_to='avatares/', 
+        lado_maximo=300,
         blank=True, 
         null=True,
         help_text="Foto de perfil"
@@ -58,6 +61,14 @@ class Usuario(AbstractUser):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     
+    # Baja: la cuenta y su contenido se ocultan y purgar_bajas borra las filas por lotes
+    fecha_baja = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Fecha de la baja; sus filas se borran después en segundo plano"
+    )
+    
     class Meta:
         verbose_name = "Usuario"
         verbose_name_plural = "Usuarios"
@@ -68,20 +79,6 @@ class Usuario(AbstractUser):
     def get_nombre_completo(self):
         """Retorna el nombre completo del usuario"""
         return f"{self.first_name} {self.last_name}".strip()
-    
-    def save(self, *args, **kwargs):
-        """
-        Método personalizado para redimensionar avatar al guardar
-        """
-        super().save(*args, **kwargs)
-        
-        # Redimensionar avatar si existe
-        if self.avatar:
-            img = Image.open(self.avatar.path)
-            if img.height > 300 or img.width > 300:
-                output_size = (300, 300)
-                img.thumbnail(output_size)
-                img.save(self.avatar.path)
 
 
 class PerfilExtendido(models.Model):
@@ -116,3 +113,37 @@ class PerfilExtendido(models.Model):
         
     def __str__(self):
         return f"Perfil de {self.usuario.username}"
+
+
+class Seguimiento(models.Model):
+    """
+    Un usuario sigue a un autor. Los contadores de ``PerfilExtendido`` se mantienen
+    en ``seguimiento.seguir`` y ``seguimiento.dejar_de_seguir``.
+    """
+    seguidor = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='siguiendo'
+    )
+    
+    seguido = models.ForeignKey(
+        Usuario,
+        on_delete=models.CASCADE,
+        related_name='seguidores'
+    )
+    
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['seguidor', 'seguido']
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(seguidor=models.F('seguido')),
+                name='seguimiento_no_a_si_mismo'
+            ),
+        ]
+        verbose_name = "Seguimiento"
+        verbose_name_plural = "Seguimientos"
+    
+    def __str__(self):
+        return f"{self.seguidor_id} → {self.seguido_id}"
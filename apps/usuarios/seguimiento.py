@@ -0,0 +1,40 @@
+"""
+Alta y baja de seguimientos con los contadores de ``PerfilExtendido`` al día.
+
+Los contadores se ajustan desde las señales de ``Seguimiento`` (también cuando se borra
+un usuario y sus seguimientos caen en cascada) con UPDATE ... SET campo = campo ± 1 en
+la misma transacción que la fila, así que dos peticiones simultáneas no se pisan y leer
+los seguidores de un autor no necesita un COUNT.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import PerfilExtendido, Seguimiento
+
+
+def sumar_contadores(seguidor_id, seguido_id, delta):
+    if delta > 0:
+        # Los usuarios creados con bulk_create no tienen perfil todavía
+        PerfilExtendido.objects.bulk_create(
+            [PerfilExtendido(usuario_id=seguidor_id), PerfilExtendido(usuario_id=seguido_id)],
+            ignore_conflicts=True
+        )
+    PerfilExtendido.objects.filter(usuario_id=seguidor_id).update(total_siguiendo=F('total_siguiendo') + delta)
+    PerfilExtendido.objects.filter(usuario_id=seguido_id).update(total_seguidores=F('total_seguidores') + delta)
+
+
+def seguir(seguidor, seguido):
+    """Idempotente: True si se creó el seguimiento, False si ya existía"""
+    try:
+        with transaction.atomic():
+            Seguimiento.objects.create(seguidor=seguidor, seguido=seguido)
+    except IntegrityError:
+        return False
+    return True
+
+
+@transaction.atomic
+def dejar_de_seguir(seguidor, seguido):
+    """Idempotente: True si existía el seguimiento"""
+    borrados, _ = Seguimiento.objects.filter(seguidor=seguidor, seguido=seguido).delete()
+    return bool(borrados)
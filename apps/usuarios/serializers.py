@@ -0,0 +1,29 @@
+from rest_framework import serializers
+
+from .models import Seguimiento
+
+
+class SeguimientoSerializer(serializers.ModelSerializer):
+    """
+    Serializer para seguimientos entre usuarios
+    """
+    seguidor = serializers.CharField(source='seguidor.username', read_only=True)
+    seguido = serializers.CharField(source='seguido.username', read_only=True)
+    
+    class Meta:
+        model = Seguimiento
+        fields = ['seguidor_id', 'seguidor', 'seguido_id', 'seguido', 'fecha_creacion']
+        read_only_fields = fields
+
+
+class BajaCuentaSerializer(serializers.Serializer):
+    """
+    Confirmación de la baja con la contraseña: un token robado no basta para
+    borrar la cuenta
+    """
+    password = serializers.CharField(write_only=True, style={'input_type': 'password'})
+    
+    def validate_password(self, value):
+        if not self.context['request'].user.check_password(value):
+            raise serializers.ValidationError("Contraseña incorrecta")
+        return value
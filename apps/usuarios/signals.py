@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidar_token
+from .models import Seguimiento
+from .seguimiento import sumar_contadores
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token_eliminado(sender, instance, **kwargs):
+    """Logout, rotación o borrado del usuario (el token se borra en cascada)"""
+    invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidar_tokens_usuario(sender, instance, created, **kwargs):
+    """
+    Un cambio de contraseña, de ``is_active`` o de cualquier otro dato del usuario
+    invalida la copia cacheada que acompaña a su token
+    """
+    if created:
+        return
+    for key in Token.objects.filter(user=instance).values_list('key', flat=True):
+        invalidar_token(key)
+
+
+@receiver(post_save, sender=Seguimiento)
+def seguimiento_creado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        sumar_contadores(instance.seguidor_id, instance.seguido_id, 1)
+
+
+@receiver(post_delete, sender=Seguimiento)
+def seguimiento_borrado(sender, instance, **kwargs):
+    """Dejar de seguir o borrar cualquiera de los dos usuarios"""
+    sumar_contadores(instance.seguidor_id, instance.seguido_id, -1)
@@ -1,3 +1,338 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext as _
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+
+from apps.core.models import ArchivoMedia
+from apps.recetas.models import (
+    EntradaFeed, EventoVista, Favorito, ImagenReceta, Ingrediente, Rating, Receta, RecetaIngrediente,
+    SubidaImagen
+)
+from apps.recetas.subidas import crear_subida
+
+from .authentication import CachedTokenAuthentication, LRUConTTL, clave_cache, lru_tokens
+from .bajas import dar_de_baja, dar_de_baja_receta, purgar_bajas, purgar_recetas
+from .models import PerfilExtendido, Seguimiento
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token -> usuario desde caché y revocación explícita"""
+
+    def setUp(self):
+        cache.clear()
+        lru_tokens.clear()
+        self.usuario = User.objects.create_user('cocinero', password='secreto-123')
+        self.token = Token.objects.create(user=self.usuario)
+
+    def autenticar(self, key=None):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}')
+        return CachedTokenAuthentication().authenticate(Request(request))
+
+    def post(self, ruta, key=None, **datos):
+        cabeceras = {'HTTP_AUTHORIZATION': f'Token {key or self.token.key}'} if key != '' else {}
+        return self.client.post(f'/api/v1/usuarios/token/{ruta}', datos, **cabeceras)
+
+    def assertRechazado(self, respuesta, detalle):
+        # SessionAuthentication va primero y no define WWW-Authenticate: DRF responde 403
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertEqual(respuesta.json()['detail'], _(detalle))
+
+    def test_segunda_autenticacion_sin_consultas(self):
+        usuario, _ = self.autenticar()
+        self.assertEqual(usuario, self.usuario)
+        with self.assertNumQueries(0):
+            self.autenticar()
+        lru_tokens.clear()
+        with self.assertNumQueries(0):
+            self.autenticar()
+
+    def test_obtener_token(self):
+        respuesta = self.post('', key='', username='cocinero', password='secreto-123')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['token'], self.token.key)
+
+    def test_revocar_invalida_el_token(self):
+        self.autenticar()
+        self.assertEqual(self.post('revocar/').status_code, 204)
+        self.assertIsNone(cache.get(clave_cache(self.token.key)))
+        self.assertRechazado(self.post('revocar/'), 'Invalid token.')
+
+    def test_rotar_invalida_el_token_anterior(self):
+        self.autenticar()
+        respuesta = self.post('rotar/')
+        self.assertEqual(respuesta.status_code, 200)
+        nuevo = respuesta.json()['token']
+        self.assertNotEqual(nuevo, self.token.key)
+        self.assertRechazado(self.post('rotar/'), 'Invalid token.')
+        self.assertEqual(self.post('rotar/', key=nuevo).status_code, 200)
+
+    def test_cambio_de_contrasena_invalida_la_cache(self):
+        self.autenticar()
+        self.usuario.set_password('otra-clave-456')
+        self.usuario.save()
+        self.assertIsNone(cache.get(clave_cache(self.token.key)))
+        self.assertIsNone(lru_tokens.get(clave_cache(self.token.key)))
+
+    def test_usuario_desactivado_no_autentica(self):
+        self.autenticar()
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertRechazado(self.post('rotar/'), 'User inactive or deleted.')
+
+    def test_revocacion_vista_desde_otro_proceso(self):
+        key = self.token.key
+        self.autenticar()
+        en_otro_proceso = lru_tokens.get(clave_cache(key))
+        self.token.delete()
+        self.assertIsNone(cache.get(clave_cache(key)))
+        # El LRU del otro proceso lo sigue aceptando hasta que caduca (TOKEN_LRU_TTL)
+        lru_tokens.set(clave_cache(key), en_otro_proceso)
+        self.autenticar(key)
+        lru_tokens.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar(key)
+
+    def test_lru_desactivado(self):
+        lru = LRUConTTL(tamano=10, ttl=0)
+        lru.set('clave', 'valor')
+        self.assertIsNone(lru.get('clave'))
+
+
+class SeguimientoTests(TestCase):
+    """Seguir y dejar de seguir son idempotentes y mantienen los contadores"""
+
+    def setUp(self):
+        self.lector = User.objects.create_user('lector', password='x')
+        self.autora = User.objects.create_user('autora', password='x')
+        self.client.force_login(self.lector)
+        self.url = f'/api/v1/usuarios/seguimientos/{self.autora.pk}/'
+
+    def contadores(self):
+        perfiles = {p.usuario_id: p for p in PerfilExtendido.objects.all()}
+        return perfiles[self.lector.pk].total_siguiendo, perfiles[self.autora.pk].total_seguidores
+
+    def test_seguir_y_dejar_de_seguir_idempotentes(self):
+        self.assertTrue(self.client.put(self.url).json()['creado'])
+        self.assertFalse(self.client.put(self.url).json()['creado'])
+        self.assertEqual(self.contadores(), (1, 1))
+        self.assertEqual(self.client.get(self.url).json()['total_seguidores'], 1)
+
+        for _intento in range(2):
+            self.assertEqual(self.client.delete(self.url).status_code, 204)
+        self.assertEqual(self.contadores(), (0, 0))
+        self.assertFalse(Seguimiento.objects.exists())
+
+    def test_no_se_puede_seguir_a_si_mismo(self):
+        respuesta = self.client.put(f'/api/v1/usuarios/seguimientos/{self.lector.pk}/')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_borrar_seguidor_descuenta(self):
+        self.client.put(self.url)
+        self.lector.delete()
+        self.assertEqual(PerfilExtendido.objects.get(usuario=self.autora).total_seguidores, 0)
+
+
+class BajasTests(TestCase):
+    """La baja oculta el contenido al momento y la purga lo borra por lotes"""
+
+    def setUp(self):
+        self.autora = User.objects.create_user('autora', password='secreta')
+        self.lector = User.objects.create_user('lector', password='x')
+        self.ajena = Receta.objects.create(
+            titulo='Ajena', descripcion='-', instrucciones='-', autor=self.lector,
+            tiempo_preparacion=10, publicada=True
+        )
+        ingrediente = Ingrediente.objects.create(nombre='Sal')
+        self.recetas = []
+        for i in range(3):
+            receta = Receta.objects.create(
+                titulo=f'Propia {i}', descripcion='-', instrucciones='-', autor=self.autora,
+                tiempo_preparacion=10, publicada=True, imagen_principal='recetas/compartida.jpg'
+            )
+            RecetaIngrediente.objects.create(receta=receta, ingrediente=ingrediente, cantidad='1 g')
+            ImagenReceta.objects.create(receta=receta, imagen=f'recetas/galeria/{i}.jpg')
+            Rating.objects.create(usuario=self.lector, receta=receta, puntuacion=5)
+            Favorito.objects.create(usuario=self.lector, receta=receta)
+            self.recetas.append(receta)
+        Rating.objects.create(usuario=self.autora, receta=self.ajena, puntuacion=1)
+        Favorito.objects.create(usuario=self.autora, receta=self.ajena)
+        Receta.objects.filter(pk=self.ajena.pk).update(total_favoritos=1)
+        Seguimiento.objects.create(seguidor=self.lector, seguido=self.autora)
+        Seguimiento.objects.create(seguidor=self.autora, seguido=self.lector)
+        Token.objects.create(user=self.autora)
+        EventoVista.objects.create(receta=self.ajena, usuario=self.autora)
+
+    def test_baja_oculta_al_momento(self):
+        self.client.force_login(self.autora)
+        url = '/api/v1/usuarios/cuenta/baja/'
+        self.assertEqual(self.client.post(url, {'password': 'otra'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'password': 'secreta'}).status_code, 204)
+
+        self.autora.refresh_from_db()
+        self.assertFalse(self.autora.is_active)
+        self.assertIsNotNone(self.autora.fecha_baja)
+        self.assertFalse(Token.objects.filter(user=self.autora).exists())
+
+        self.client.force_login(self.lector)
+        titulos = [r['titulo'] for r in self.client.get('/api/v1/recetas/').json()['results']]
+        self.assertEqual(titulos, ['Ajena'])
+        for prefijo in ('/api/v1/', '/api/v1/async/'):
+            detalle = self.client.get(f'{prefijo}recetas/{self.ajena.pk}/').json()
+            self.assertEqual(detalle['ratings'], [], prefijo)
+        self.assertEqual(self.client.get('/api/v1/favoritos/').json()['count'], 0)
+        # Las filas siguen ahí hasta la purga
+        self.assertEqual(Receta.objects.filter(autor=self.autora).count(), 3)
+
+    def test_purga_por_lotes_sin_collector(self):
+        dar_de_baja(self.autora)
+        with mock.patch.object(Collector, 'collect', autospec=True, side_effect=Collector.collect) as collect:
+            self.assertEqual(purgar_bajas(lote=2), 1)
+        # Solo el borrado final del usuario, que ya no tiene dependientes
+        self.assertEqual(collect.call_count, 1)
+
+        self.assertFalse(User.objects.filter(pk=self.autora.pk).exists())
+        self.assertEqual(list(Receta.objects.all()), [self.ajena])
+        for modelo in (RecetaIngrediente, ImagenReceta, Rating, Favorito, EntradaFeed, Token):
+            self.assertFalse(modelo.objects.exists(), modelo)
+
+        # Los ajustes que harían las señales
+        self.ajena.refresh_from_db()
+        self.assertEqual(self.ajena.total_favoritos, 0)
+        perfil = PerfilExtendido.objects.get(usuario=self.lector)
+        self.assertEqual((perfil.total_seguidores, perfil.total_siguiendo), (0, 0))
+        self.assertFalse(Seguimiento.objects.exists())
+        self.assertEqual(set(ArchivoMedia.objects.values_list('referencias', flat=True)), {0})
+        # Sus vistas de recetas ajenas se conservan, anónimas
+        self.assertEqual(list(EventoVista.objects.values_list('usuario_id', flat=True)), [None])
+
+    def test_vistas_anonimizadas_por_lotes(self):
+        for _ in range(4):
+            EventoVista.objects.create(receta=self.ajena, usuario=self.autora)
+        dar_de_baja(self.autora)
+        tabla = EventoVista._meta.db_table
+        with CaptureQueriesContext(connection) as consultas:
+            purgar_bajas(lote=2)
+        updates = [q['sql'] for q in consultas if q['sql'].startswith(f'UPDATE "{tabla}"')]
+        # 5 vistas en lotes de 2 por pk; el UPDATE por usuario_id del collector ya no encuentra filas
+        por_lotes = [sql for sql in updates if f'"{tabla}"."id" IN (' in sql]
+        self.assertEqual(len(por_lotes), 3, updates)
+        self.assertLessEqual(len(updates), 4, updates)
+        self.assertEqual(EventoVista.objects.filter(usuario__isnull=True).count(), 5)
+
+    def test_purga_borra_los_archivos_de_las_subidas(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        with override_settings(SUBIDAS_DIR=directorio):
+            for _ in range(3):
+                crear_subida(self.autora, 10)
+            ajena = crear_subida(self.lector, 10)
+            dar_de_baja(self.autora)
+            with self.captureOnCommitCallbacks(execute=True):
+                purgar_bajas(lote=2)
+            self.assertEqual(os.listdir(directorio), [os.path.basename(ajena.ruta)])
+        self.assertEqual(list(SubidaImagen.objects.all()), [ajena])
+
+    def test_purga_respeta_la_espera(self):
+        dar_de_baja(self.autora)
+        self.assertEqual(purgar_bajas(horas=1), 0)
+        self.assertTrue(User.objects.filter(pk=self.autora.pk).exists())
+
+    def test_borrar_desde_el_admin_da_de_baja(self):
+        admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin)
+        url = f'/admin/usuarios/usuario/{self.autora.pk}/delete/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {'post': 'yes'})
+        self.autora.refresh_from_db()
+        self.assertIsNotNone(self.autora.fecha_baja)
+        self.assertFalse(Receta.objects.publicadas().filter(autor=self.autora).exists())
+
+    def test_sus_ratings_y_favoritos_dejan_de_contar(self):
+        otra = User.objects.create_user('otra', password='x')
+        Rating.objects.create(usuario=otra, receta=self.ajena, puntuacion=5)
+        Favorito.objects.create(usuario=otra, receta=self.ajena)
+        Receta.objects.filter(pk=self.ajena.pk).update(total_favoritos=2)
+        url = f'/api/v1/recetas/{self.ajena.pk}/'
+        self.assertEqual(self.client.get(url).json()['rating_promedio'], 3.0)
+
+        dar_de_baja(self.autora)
+        datos = self.client.get(url).json()
+        self.assertEqual((datos['rating_promedio'], datos['total_favoritos']), (5.0, 1))
+        # La purga no los descuenta otra vez
+        purgar_bajas()
+        self.assertEqual(self.client.get(url).json()['total_favoritos'], 1)
+
+
+class BajaRecetasTests(TestCase):
+    """Borrar una receta la oculta al momento y purgar_recetas borra sus filas por lotes"""
+
+    def setUp(self):
+        self.autora = User.objects.create_user('autora', password='x')
+        self.lector = User.objects.create_user('lector', password='x')
+        Seguimiento.objects.create(seguidor=self.lector, seguido=self.autora)
+        ingrediente = Ingrediente.objects.create(nombre='Sal')
+        self.recetas = []
+        for i in range(3):
+            # El reparto al feed de los seguidores espera al commit
+            with self.captureOnCommitCallbacks(execute=True):
+                receta = Receta.objects.create(
+                    titulo=f'Receta {i}', descripcion='-', instrucciones='-', autor=self.autora,
+                    tiempo_preparacion=10, publicada=True, imagen_principal='recetas/compartida.jpg'
+                )
+            RecetaIngrediente.objects.create(receta=receta, ingrediente=ingrediente, cantidad='1 g')
+            Rating.objects.create(usuario=self.lector, receta=receta, puntuacion=4)
+            Favorito.objects.create(usuario=self.lector, receta=receta)
+            EventoVista.objects.create(receta=receta, usuario=self.lector)
+            self.recetas.append(receta)
+        self.borrada = self.recetas[0]
+
+    def test_borrar_la_oculta_al_momento(self):
+        self.client.force_login(self.autora)
+        url = f'/api/v1/recetas/{self.borrada.pk}/'
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.borrada.refresh_from_db()
+        self.assertIsNotNone(self.borrada.fecha_baja)
+        # Ni siquiera su autora la ve como borrador
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(len(self.client.get('/api/v1/recetas/mis_recetas/').json()), 2)
+
+        self.client.force_login(self.lector)
+        self.assertEqual(self.client.get('/api/v1/favoritos/').json()['count'], 2)
+        self.assertEqual(self.client.get('/api/v1/ratings/').json()['count'], 2)
+        self.assertEqual(len(EntradaFeed.objects.filter(usuario=self.lector)), 3)
+        self.assertEqual(len(self.client.get('/api/v1/feed/').json()['results']), 2)
+
+    def test_purga_por_lotes_sin_collector(self):
+        dar_de_baja_receta(self.borrada)
+        dar_de_baja_receta(self.recetas[1])
+        with mock.patch.object(Collector, 'collect', autospec=True, side_effect=Collector.collect) as collect:
+            borradas = purgar_recetas(lote=1)
+        self.assertEqual(collect.call_count, 0)
+        self.assertEqual(borradas[Receta._meta.label], 2)
+        self.assertEqual(list(Receta.objects.all()), [self.recetas[2]])
+        for modelo in (RecetaIngrediente, Rating, Favorito, EntradaFeed, EventoVista):
+            self.assertEqual(list(modelo.objects.values_list('receta_id', flat=True)), [self.recetas[2].pk], modelo)
+        self.assertEqual(ArchivoMedia.objects.get(nombre='recetas/compartida.jpg').referencias, 1)
+
+    def test_borrar_desde_el_admin_da_de_baja(self):
+        admin = User.objects.create_superuser('admin', password='x')
+        self.client.force_login(admin)
+        url = f'/admin/recetas/receta/{self.borrada.pk}/delete/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.post(url, {'post': 'yes'})
+        self.borrada.refresh_from_db()
+        self.assertIsNotNone(self.borrada.fecha_baja)
+        self.assertEqual(Rating.objects.filter(receta=self.borrada).count(), 1)
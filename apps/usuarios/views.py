@@ -1,3 +1,122 @@
-from django.shortcuts import render
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets, status
+from rest_framework.authtoken.models import Token
+from rest_framework.authtoken.serializers import AuthTokenSerializer
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
 
-# Create your views here.
+from .bajas import dar_de_baja
+from .models import PerfilExtendido, Seguimiento
+from .seguimiento import dejar_de_seguir, seguir
+from .serializers import BajaCuentaSerializer, SeguimientoSerializer
+
+User = get_user_model()
+
+
+class TokenViewSet(viewsets.ViewSet):
+    """
+    Emisión, rotación y revocación del token de API del usuario.
+    Rotar o revocar borra el token anterior, lo que lo invalida también en la caché
+    de ``CachedTokenAuthentication``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [AllowAny()]
+        return super().get_permissions()
+
+    def create(self, request):
+        """Obtiene (o crea) el token con usuario y contraseña"""
+        serializer = AuthTokenSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        token, _ = Token.objects.get_or_create(user=serializer.validated_data['user'])
+        return Response({'token': token.key})
+
+    @action(detail=False, methods=['post'])
+    def rotar(self, request):
+        """Sustituye el token actual por uno nuevo"""
+        with transaction.atomic():
+            Token.objects.filter(user=request.user).delete()
+            token = Token.objects.create(user=request.user)
+        return Response({'token': token.key})
+
+    @action(detail=False, methods=['post'])
+    def revocar(self, request):
+        """Logout: elimina el token del usuario"""
+        # delete() del queryset envía post_delete por cada token borrado
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CuentaViewSet(viewsets.ViewSet):
+    """
+    Baja del usuario autenticado. La cuenta y sus recetas dejan de verse al momento;
+    sus filas se borran por lotes con ``purgar_bajas``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @action(detail=False, methods=['post'])
+    def baja(self, request):
+        serializer = BajaCuentaSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        dar_de_baja(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SeguimientoViewSet(viewsets.GenericViewSet):
+    """
+    Autores que sigue el usuario autenticado. PUT y DELETE sobre
+    /seguimientos/<usuario_id>/ son idempotentes: repetirlos no cambia nada.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = SeguimientoSerializer
+
+    def get_queryset(self):
+        return Seguimiento.objects.filter(
+            seguidor=self.request.user
+        ).select_related('seguidor', 'seguido').order_by('-fecha_creacion')
+
+    def autor(self, pk):
+        return get_object_or_404(User, pk=pk, is_active=True)
+
+    def list(self, request):
+        """Autores seguidos, del más reciente al más antiguo"""
+        pagina = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
+
+    def retrieve(self, request, pk=None):
+        """Si se sigue al autor y sus contadores (sin COUNT: PerfilExtendido)"""
+        autor = self.autor(pk)
+        perfil = PerfilExtendido.objects.filter(usuario=autor).first()
+        return Response({
+            'usuario_id': autor.pk,
+            'siguiendo': Seguimiento.objects.filter(seguidor=request.user, seguido=autor).exists(),
+            'total_seguidores': perfil.total_seguidores if perfil else 0,
+            'total_siguiendo': perfil.total_siguiendo if perfil else 0,
+        })
+
+    def update(self, request, pk=None):
+        """Seguir al autor"""
+        autor = self.autor(pk)
+        if autor.pk == request.user.pk:
+            return Response({'error': 'No puedes seguirte a ti mismo'}, status=status.HTTP_400_BAD_REQUEST)
+        creado = seguir(request.user, autor)
+        return Response({'siguiendo': True, 'creado': creado})
+
+    def destroy(self, request, pk=None):
+        """Dejar de seguir al autor"""
+        dejar_de_seguir(request.user, self.autor(pk))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'])
+    def seguidores(self, request):
+        """Usuarios que siguen al usuario autenticado"""
+        seguidores = Seguimiento.objects.filter(
+            seguido=request.user
+        ).select_related('seguidor', 'seguido').order_by('-fecha_creacion')
+        pagina = self.paginate_queryset(seguidores)
+        return self.get_paginated_response(self.get_serializer(pagina, many=True).data)
@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 
     # Aplicaciones de terceros
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'django_filters',
 
@@ -41,7 +42,10 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.CompresionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.core.middleware.ReplicaStickyMiddleware',
+    'apps.core.middleware.CabecerasCuotaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -74,7 +78,7 @@ WSGI_APPLICATION = 'quanticook.wsgi.application'
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.usuarios.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -86,7 +90,106 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
+    # orjson si está instalado; con la implementación de DRF si no
+    'DEFAULT_RENDERER_CLASSES': [
+        'apps.core.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'apps.core.renderers.JSONRapidoParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'apps.core.throttling.CubetaFichasThrottle',
+    ],
+    # Proxies delante de Django (nginx: 1). Los anónimos se identifican por la IP que
+    # añadió el último de ellos a X-Forwarded-For; con 0 por REMOTE_ADDR. Sin fijarlo,
+    # DRF usaría X-Forwarded-For tal cual lo manda el cliente
+    'NUM_PROXIES': config('THROTTLE_NUM_PROXIES', default=0, cast=int),
+    # Fichas por periodo de cada cubeta; las búsquedas caras gastan varias
+    'DEFAULT_THROTTLE_RATES': {
+        'lectura_anonimo': config('THROTTLE_LECTURA_ANONIMO', default='120/min'),
+        'lectura_usuario': config('THROTTLE_LECTURA_USUARIO', default='600/min'),
+        'escritura_anonimo': config('THROTTLE_ESCRITURA_ANONIMO', default='20/min'),
+        'escritura_usuario': config('THROTTLE_ESCRITURA_USUARIO', default='120/min'),
+    },
+}
+
+# Throttling: con varios procesos la caché 'throttle' debe ser compartida y con incr
+# atómico (Redis o memcached); si falla se usan cubetas del proceso durante
+# THROTTLE_REINTENTO_SEGUNDOS. La suite de pruebas lo desactiva (apps.core.test_runner)
+THROTTLE_ACTIVO = config('THROTTLE_ACTIVO', default=True, cast=bool)
+THROTTLE_CACHE = 'throttle'
+THROTTLE_REINTENTO_SEGUNDOS = config('THROTTLE_REINTENTO_SEGUNDOS', default=30, cast=int)
+THROTTLE_CACHE_BACKEND = config('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+
+# Caché por defecto: guarda las credenciales de los tokens (su revocación debe verse en
+# todos los procesos) y las lecturas fijadas a la principal de los clientes sin cookies,
+# así que fuera de DEBUG es Redis, compartida entre procesos. LocMemCache solo vale con
+# un único proceso
+CACHE_BACKEND = config(
+    'CACHE_BACKEND',
+    default='django.core.cache.backends.locmem.LocMemCache' if DEBUG
+    else 'django.core.cache.backends.redis.RedisCache',
+)
+CACHE_LOCATION = config('CACHE_LOCATION', default='' if DEBUG else 'redis://127.0.0.1:6379/0')
+
+# Caché aparte para el throttling: una clave por cliente y ámbito que no debe
+# desplazar al resto de entradas de la caché por defecto
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'throttle': {
+        'BACKEND': THROTTLE_CACHE_BACKEND,
+        'LOCATION': config('THROTTLE_CACHE_LOCATION', default='throttle'),
+    },
 }
+if THROTTLE_CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['throttle']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+TEST_RUNNER = 'apps.core.test_runner.TestRunner'
+
+# Compresión de respuestas (brotli si está instalado, si no gzip): tamaño mínimo en
+# bytes y calidad de brotli (0-11; las altas son demasiado lentas para respuestas dinámicas)
+COMPRESION_MIN_BYTES = config('COMPRESION_MIN_BYTES', default=1024, cast=int)
+COMPRESION_CALIDAD_BROTLI = config('COMPRESION_CALIDAD_BROTLI', default=4, cast=int)
+
+# Cada cuántos segundos vuelca cada proceso el uso de filtros del listado de recetas
+USO_FILTROS_VOLCADO_SEGUNDOS = config('USO_FILTROS_VOLCADO_SEGUNDOS', default=60, cast=int)
+
+# Registro de vistas del detalle de recetas: cada proceso inserta las acumuladas cada
+# VISTAS_VOLCADO_SEGUNDOS o al llegar a VISTAS_VOLCADO_MAX. agregar_vistas solo suma las
+# insertadas hace más de VISTAS_MARGEN_SEGUNDOS (mucho más que un INSERT) y borra los eventos
+# sumados con más de VISTAS_RETENCION_DIAS
+VISTAS_VOLCADO_SEGUNDOS = config('VISTAS_VOLCADO_SEGUNDOS', default=10, cast=int)
+VISTAS_VOLCADO_MAX = config('VISTAS_VOLCADO_MAX', default=1000, cast=int)
+VISTAS_MARGEN_SEGUNDOS = config('VISTAS_MARGEN_SEGUNDOS', default=120, cast=int)
+VISTAS_RETENCION_DIAS = config('VISTAS_RETENCION_DIAS', default=30, cast=int)
+
+# Máximo de recetas por petición a /recetas/lote/
+RECETAS_LOTE_MAX = config('RECETAS_LOTE_MAX', default=100, cast=int)
+
+# Similitud mínima de ingredientes (MinHash) para avisar de una receta duplicada al crearla
+RECETA_DUPLICADA_UMBRAL = config('RECETA_DUPLICADA_UMBRAL', default=0.8, cast=float)
+
+# Feed: autores con más seguidores que esto no se reparten al publicar (se leen al
+# pedir el feed); recetas recientes que se copian al timeline al empezar a seguir
+FEED_FANOUT_MAX_SEGUIDORES = config('FEED_FANOUT_MAX_SEGUIDORES', default=5000, cast=int)
+FEED_RELLENO_AL_SEGUIR = config('FEED_RELLENO_AL_SEGUIR', default=20, cast=int)
+
+# Edad máxima del índice de autocompletado de ingredientes de cada proceso
+AUTOCOMPLETAR_RECONSTRUCCION_SEGUNDOS = config('AUTOCOMPLETAR_RECONSTRUCCION_SEGUNDOS', default=600, cast=int)
+
+# Caché de autenticación por token: segundos en la caché por defecto y en el LRU de
+# cada proceso. Un token revocado deja de valer en todos los procesos cuando la caché
+# por defecto es compartida (CACHE_BACKEND), salvo TOKEN_LRU_TTL segundos en el LRU de
+# los demás procesos; 0 desactiva el LRU
+TOKEN_CACHE_TTL = config('TOKEN_CACHE_TTL', default=60, cast=int)
+TOKEN_LRU_TTL = config('TOKEN_LRU_TTL', default=2, cast=int)
+TOKEN_LRU_SIZE = config('TOKEN_LRU_SIZE', default=1024, cast=int)
 
 # Configuración CORS para desarrollo
 CORS_ALLOWED_ORIGINS = [
@@ -97,6 +200,9 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 # Database con MySQL
+# DB_ENGINE=sqlite permite ejecutar pruebas y benchmarks locales sin servidor MySQL
+DB_ENGINE = config('DB_ENGINE', default='mysql')
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.mysql',
@@ -107,10 +213,55 @@ DATABASES = {
         'PORT': config('DB_PORT', default='3306'),
         'OPTIONS': {
             'sql_mode': 'traditional',
-        }
+        },
+        # Conexiones persistentes por hilo, verificadas antes de reutilizarse
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Pool de conexiones acotado por proceso (0 = desactivado). Con el pool, Django
+# "cierra" la conexión al terminar cada petición y esta vuelve al pool.
+DB_POOL_SIZE = config('DB_POOL_SIZE', default=0, cast=int)
+if DB_POOL_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'apps.core.backends.sqlite3' if DB_ENGINE == 'sqlite' else 'apps.core.backends.mysql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'TAMANO': DB_POOL_SIZE,
+            'ESPERA': config('DB_POOL_TIMEOUT', default=5.0, cast=float),
+            'MAX_INACTIVIDAD': config('DB_POOL_MAX_IDLE', default=300.0, cast=float),
+        },
+    })
+
+# Réplicas de lectura: hosts MySQL (o rutas de archivo con DB_ENGINE=sqlite)
+# separados por comas. Cada una se registra como alias replica1, replica2, ...
+DATABASE_REPLICAS = []
+for numero, destino in enumerate(config('DB_REPLICAS', default='', cast=Csv()), start=1):
+    replica = dict(DATABASES['default'], POOL=dict(DATABASES['default'].get('POOL', {})))
+    replica['NAME' if DB_ENGINE == 'sqlite' else 'HOST'] = destino
+    DATABASES[f'replica{numero}'] = replica
+    DATABASE_REPLICAS.append(f'replica{numero}')
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['apps.core.db_router.ReplicaRouter']
+
+# Segundos que un cliente sigue leyendo de la principal tras escribir (cookie firmada
+# db_primaria; los clientes sin cookies necesitan una caché por defecto compartida)
+REPLICA_STICKY_SECONDS = config('REPLICA_STICKY_SECONDS', default=5, cast=int)
+# Segundos antes de volver a probar una réplica que no respondió
+REPLICA_REINTENTO_SEGUNDOS = config('REPLICA_REINTENTO_SEGUNDOS', default=30, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -150,6 +301,48 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Subidas con el hash de su contenido como nombre; estáticos con hash en el nombre
+# (manifiesto de collectstatic) salvo en desarrollo
+STORAGES = {
+    'default': {
+        'BACKEND': 'apps.core.storage.AlmacenamientoPorContenido',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+        ),
+    },
+}
+
+# Los de Django, calculando además el sha256 de cada archivo mientras llega
+# (deduplicación de subidas, apps.core.archivos)
+FILE_UPLOAD_HANDLERS = [
+    'apps.core.archivos.MemoriaConResumenUploadHandler',
+    'apps.core.archivos.TemporalConResumenUploadHandler',
+]
+
+# Quién envía los archivos de /media/ y /static/ tras autorizarlos Django: 'nginx'
+# (X-Accel-Redirect a SERVIDOR_ARCHIVOS_PREFIJO + media/ o static/), 'sendfile'
+# (X-Sendfile, Apache o lighttpd) o '' (el propio Django, solo para desarrollo)
+SERVIDOR_ARCHIVOS = config('SERVIDOR_ARCHIVOS', default='')
+SERVIDOR_ARCHIVOS_PREFIJO = config('SERVIDOR_ARCHIVOS_PREFIJO', default='/interno/')
+
+# Subidas de imágenes por bloques (/api/v1/subidas/): directorio de los archivos a
+# medio subir, tamaño máximo de la imagen y de cada bloque, píxeles máximos, horas
+# tras las que limpiar_subidas borra las que no se han terminado y segundos tras los
+# que un bloque que no termina de llegar deja de tener reservado su rango
+SUBIDAS_DIR = config('SUBIDAS_DIR', default=str(BASE_DIR / 'subidas'))
+SUBIDA_MAX_BYTES = config('SUBIDA_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+SUBIDA_MAX_BLOQUE = config('SUBIDA_MAX_BLOQUE', default=8 * 1024 * 1024, cast=int)
+SUBIDA_MAX_PIXELES = config('SUBIDA_MAX_PIXELES', default=40_000_000, cast=int)
+SUBIDA_CADUCIDAD_HORAS = config('SUBIDA_CADUCIDAD_HORAS', default=24, cast=int)
+SUBIDA_BLOQUE_SEGUNDOS = config('SUBIDA_BLOQUE_SEGUNDOS', default=300, cast=int)
+
+# Filas por lote (y por transacción) al borrar los usuarios dados de baja y las recetas
+# borradas con purgar_bajas
+BAJAS_LOTE = config('BAJAS_LOTE', default=500, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
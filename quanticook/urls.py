@@ -2,12 +2,14 @@
 URL configuration for quanticook project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.views.generic import RedirectView
 from rest_framework.documentation import include_docs_urls
 
+from apps.core.views import servir_estatico, servir_media
+
 urlpatterns = [
     # Página de inicio
     path('', include('apps.core.urls')),
@@ -19,6 +21,9 @@ urlpatterns = [
     path('api/v1/', include('apps.recetas.api_urls')),
     path('api/v1/usuarios/', include('apps.usuarios.api_urls')),
     
+    # Lecturas asíncronas para despliegues ASGI
+    path('api/v1/async/', include('apps.recetas.async_urls')),
+    
     # Autenticación de la API
     path('api-auth/', include('rest_framework.urls')),
     
@@ -26,7 +31,15 @@ urlpatterns = [
     # path('docs/', include_docs_urls(title='Quanticook API')),
 ]
 
-# Servir archivos media en desarrollo
+# Archivos subidos: Django comprueba el acceso y el servidor web envía los bytes
+# (SERVIDOR_ARCHIVOS); en desarrollo sin servidor configurado los envía Django
+urlpatterns += [
+    re_path(r'^%s(?P<ruta>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_media, name='media'),
+]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+else:
+    urlpatterns += [
+        re_path(r'^%s(?P<ruta>.+)$' % settings.STATIC_URL.lstrip('/'), servir_estatico, name='static'),
+    ]